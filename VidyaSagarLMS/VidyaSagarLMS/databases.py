@@ -0,0 +1,110 @@
+"""
+Database profiles, picked with the DB_PROFILE environment variable:
+
+    sqlite          (default) the project's SQLite file with Django's
+                    defaults (rollback journal, no busy wait beyond
+                    Python's 5 seconds); opening it changes nothing on disk
+    sqlite-wal      SQLite tuned for one writer and many readers: WAL
+                    journal, synchronous=NORMAL, a busy timeout, mmap reads,
+                    and IMMEDIATE transactions
+    postgres        PostgreSQL with persistent connections (CONN_MAX_AGE)
+                    that are health-checked before reuse
+    postgres-pool   PostgreSQL through psycopg's connection pool (needs
+                    psycopg[pool]); connections are returned to the pool
+                    after each request instead of being kept per thread
+
+WAL lets readers (the AJAX chat and presence polls) run while the socket
+consumers write, and IMMEDIATE takes the write lock when a transaction
+starts, so a busy writer waits out the busy timeout instead of failing
+with "database is locked" on a read-to-write upgrade. It is opt-in because
+journal_mode=WAL is stored in the database file (it stays on for any
+profile that opens the file later) and WAL keeps -wal/-shm files beside
+it; point SQLITE_PATH at a deployment copy rather than the checked-in
+db.sqlite3.
+
+PostgreSQL settings come from DB_NAME, DB_USER, DB_PASSWORD, DB_HOST and
+DB_PORT; the tuning knobs below from the environment variables named next
+to them.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+PROFILES = ('sqlite', 'sqlite-wal', 'postgres', 'postgres-pool')
+
+
+def env_int(environ, name, default):
+    value = environ.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ImproperlyConfigured(f'{name} must be an integer, got {value!r}.')
+
+
+def sqlite_pragmas(environ):
+    return {
+        'journal_mode': 'WAL',
+        # Durable across application crashes; only an OS crash can lose
+        # the last commits, never corrupt the file
+        'synchronous': 'NORMAL',
+        'mmap_size': env_int(environ, 'SQLITE_MMAP_SIZE', 128 * 1024 * 1024),
+    }
+
+
+def sqlite_profile(base_dir, environ, tuned=False):
+    database = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': environ.get('SQLITE_PATH') or base_dir / 'db.sqlite3',
+        # On disk rather than in memory: threaded tests (classroom/tests.py)
+        # need SQLite's normal lock waiting, which shared-cache memory
+        # databases do not do
+        'TEST': {'NAME': base_dir / 'test_db.sqlite3'},
+    }
+    if tuned:
+        database['OPTIONS'] = {
+            # Seconds a connection waits for the write lock (busy_timeout)
+            'timeout': env_int(environ, 'SQLITE_BUSY_TIMEOUT', 20),
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in sqlite_pragmas(environ).items()),
+        }
+    return database
+
+
+def postgres_profile(environ, pooled=False):
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': environ.get('DB_NAME', 'vidyasagar'),
+        'USER': environ.get('DB_USER', ''),
+        'PASSWORD': environ.get('DB_PASSWORD', ''),
+        'HOST': environ.get('DB_HOST', ''),
+        'PORT': environ.get('DB_PORT', ''),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    if pooled:
+        # The pool owns connection reuse; Django requires CONN_MAX_AGE = 0
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS']['pool'] = {
+            'min_size': env_int(environ, 'DB_POOL_MIN_SIZE', 2),
+            'max_size': env_int(environ, 'DB_POOL_MAX_SIZE', 10),
+            'timeout': env_int(environ, 'DB_POOL_TIMEOUT', 10),
+        }
+    else:
+        database['CONN_MAX_AGE'] = env_int(environ, 'DB_CONN_MAX_AGE', 60)
+    return database
+
+
+def database_profile(profile, base_dir, environ=None):
+    """The DATABASES['default'] dict for ``profile`` (one of PROFILES)."""
+    environ = os.environ if environ is None else environ
+    if profile == 'sqlite':
+        return sqlite_profile(base_dir, environ)
+    if profile == 'sqlite-wal':
+        return sqlite_profile(base_dir, environ, tuned=True)
+    if profile == 'postgres':
+        return postgres_profile(environ)
+    if profile == 'postgres-pool':
+        return postgres_profile(environ, pooled=True)
+    raise ImproperlyConfigured(f"Unknown DB_PROFILE {profile!r}; expected one of {', '.join(PROFILES)}.")
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+
+from .databases import database_profile
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -76,12 +78,11 @@ WSGI_APPLICATION = 'VidyaSagarLMS.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# DB_PROFILE picks plain SQLite (default), WAL-tuned SQLite, or PostgreSQL with
+# persistent or pooled connections (see databases.py)
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_profile(os.environ.get('DB_PROFILE', 'sqlite'), BASE_DIR),
 }
 
 
@@ -132,3 +133,93 @@ LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
 
 AUTH_USER_MODEL = 'accounts.CustomUser'
+
+# Channel layer for the classroom WebSocket consumer. In-memory only works
+# within one process; switch to channels_redis for several workers.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+
+# Live classroom roster (classroom/presence.py). Use
+# 'classroom.presence.CachePresenceStore' to share it between workers.
+CLASSROOM_PRESENCE = {
+    'BACKEND': 'classroom.presence.InMemoryPresenceStore',
+    'FLUSH_INTERVAL': 5,  # seconds between roster flushes to the database
+}
+
+# Classroom chat persistence (classroom/chat_journal.py). With WRITE_BEHIND
+# off every message is saved before it is broadcast.
+CLASSROOM_CHAT_JOURNAL = {
+    'WRITE_BEHIND': True,
+    'BATCH_SIZE': 50,
+    'FLUSH_INTERVAL': 0.5,  # seconds
+}
+
+# Classroom socket fan-out (classroom/fanout.py): participant/screen-share/
+# whiteboard-image updates are coalesced per TICK, and each connection may
+# send RATE messages per second with bursts up to BURST.
+CLASSROOM_FANOUT = {
+    'TICK': 0.075,  # seconds
+    'RATE': 20,
+    'BURST': 40,
+}
+
+# Calendar occurrences (calendar_app/recurrence.py): saved events are expanded
+# into EventOccurrence rows up to HORIZON_DAYS ahead; run
+# `manage.py materialize_occurrences` daily to keep open-ended series covered.
+CALENDAR_OCCURRENCES = {
+    'MATERIALIZE': True,
+    'HORIZON_DAYS': 730,
+}
+
+# Per-user agenda (classroom/agenda.py): upcoming sessions and event
+# occurrences up to HORIZON_DAYS ahead; run `manage.py rebuild_agenda` daily
+# to drop past entries and roll recurring events forward.
+AGENDA = {
+    'HORIZON_DAYS': 90,
+}
+
+# Cached FullCalendar feed (calendar_app/feed.py). The calendar version is
+# kept in this cache alias, so point it at a shared cache when running
+# several workers.
+CALENDAR_FEED = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 600,  # seconds
+}
+
+# Trainer/room double-booking checks (calendar_app/conflicts.py) in the
+# session, course schedule and event forms. Open-ended bookings (weekly
+# schedules, recurring events) are checked HORIZON_DAYS ahead.
+SCHEDULE_CONFLICTS = {
+    'VALIDATE': True,
+    'HORIZON_DAYS': 180,
+    'REPORT_MAX_DAYS': 366,
+}
+
+# Dashboard role counts, user tables and cached fragments (dashboard/stats.py,
+# dashboard/fragments.py). Role counts and fragments live in this alias and
+# are invalidated by model signals. The default locmem cache is per process;
+# with several workers use a cache they share, e.g.
+#
+#     CACHES['dashboard'] = {
+#         'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#         'LOCATION': BASE_DIR / 'cache' / 'dashboard',
+#     }
+#
+# or DatabaseCache (after ``manage.py createcachetable``), and set
+# 'CACHE_ALIAS': 'dashboard'.
+DASHBOARD = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,  # seconds
+    'PAGE_SIZE': 25,
+}
+
+# Versioned course outline snapshots (courses/outline.py), kept in this cache
+# alias and as JSON files under SNAPSHOT_DIR (one subdirectory per database).
+COURSE_OUTLINE = {
+    'CACHE_ALIAS': 'default',
+    'SNAPSHOT_DIR': BASE_DIR / 'var' / 'course_outlines',
+    'MAX_AGE': 0,  # seconds; 0 = browsers always revalidate (cheap 304s)
+}
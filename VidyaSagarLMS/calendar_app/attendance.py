@@ -0,0 +1,81 @@
+"""
+Bulk attendance writes for calendar events.
+
+An event's existing Attendance rows are loaded with one query, compared with
+what was submitted, and only new or changed rows are written, with one
+bulk_create and one bulk_update inside a transaction. Used by take_attendance
+and BulkAttendanceForm.
+"""
+from datetime import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Attendance
+
+ATTENDANCE_FIELDS = ['attended', 'check_in_time', 'check_out_time', 'remarks']
+BATCH_SIZE = 500
+
+
+def parse_datetime_local(value):
+    """
+    Value of an <input type="datetime-local"> in the current time zone, or
+    None. Aware, so it compares equal to the stored value on resubmission.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.strptime(value, '%Y-%m-%dT%H:%M')
+    except ValueError:
+        return None
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def records_by_student(event):
+    """{student_id: Attendance} for the event in one query."""
+    return {record.student_id: record for record in Attendance.objects.filter(event=event)}
+
+
+def entries_from_post(students, data):
+    """Per-student values from take_attendance's form fields."""
+    entries = {}
+    for student in students:
+        entries[student.id] = {
+            'attended': data.get(f'attended_{student.id}') == 'on',
+            'check_in_time': parse_datetime_local(data.get(f'check_in_{student.id}')),
+            'check_out_time': parse_datetime_local(data.get(f'check_out_{student.id}')),
+            'remarks': data.get(f'remarks_{student.id}', ''),
+        }
+    return entries
+
+
+def save_attendance(event, entries):
+    """
+    Apply ``{student_id: {field: value}}`` to the event's attendance. Fields
+    left out of an entry keep their stored (or default) value. Returns
+    ``(created, updated)`` counts.
+    """
+    with transaction.atomic():
+        existing = records_by_student(event)
+        to_create = []
+        to_update = []
+        changed_fields = set()
+        for student_id, values in entries.items():
+            record = existing.get(student_id)
+            if record is None:
+                to_create.append(Attendance(event=event, student_id=student_id, **values))
+                continue
+            changed = [field for field, value in values.items() if getattr(record, field) != value]
+            if changed:
+                for field in changed:
+                    setattr(record, field, values[field])
+                changed_fields.update(changed)
+                to_update.append(record)
+
+        if to_create:
+            Attendance.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        if to_update:
+            # Keep the model's field order so the UPDATE statement is stable
+            fields = [field for field in ATTENDANCE_FIELDS if field in changed_fields]
+            Attendance.objects.bulk_update(to_update, fields, batch_size=BATCH_SIZE)
+    return len(to_create), len(to_update)
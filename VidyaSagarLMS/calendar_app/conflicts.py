@@ -0,0 +1,405 @@
+"""
+Trainer and room double-booking checks.
+
+Everything that books a trainer or a room for part of a day becomes a Slot
+(one per day it occupies):
+
+    classroom   Classroom: schedule_days between start_date and end_date,
+                start_time-end_time (its trainer)
+    session     ClassroomSession: scheduled_date, scheduled_time plus
+                duration_minutes (the classroom's trainer)
+    schedule    active CourseSchedule: every day_of_week (trainer, room)
+    event       active CalendarEvent occurrence with a start and end time
+                (its trainers, room); holidays and all-day events book nobody
+
+A classroom's weekly slot, its sessions and their mirror events
+(classroom/scheduling.py) are one booking and never conflict with each
+other.
+
+ConflictIndex buckets slots by (resource, day), resource being
+('trainer', id) or ('room', name), and keeps every bucket sorted by start
+time with a running maximum of end times: whether a slot overlaps anything
+is one bisect, O(log n), and listing the overlaps costs one step each.
+Forms (validate()) load only the trainers and rooms they book, over the
+dates they book; recurring bookings are checked HORIZON_DAYS ahead.
+report() sweeps every bucket for the "all conflicts in a range" report.
+"""
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+
+from classroom.models import Classroom, ClassroomSession
+from .models import CalendarEvent, CourseSchedule
+from .recurrence import expand, occurrences_between, parse_weekdays
+from .reports import parse_date
+
+CustomUser = get_user_model()
+
+DEFAULT_CONFLICTS = {
+    'VALIDATE': True,  # reject double bookings in the forms
+    'HORIZON_DAYS': 180,  # how far ahead open-ended bookings are checked
+    'REPORT_MAX_DAYS': 366,
+}
+
+DAY_NUMBERS = {name: number for number, (name, _) in enumerate(CourseSchedule.DAY_CHOICES)}
+MINUTES_PER_DAY = 24 * 60
+
+# start and end are minutes since midnight; resources is a tuple of resource keys
+Slot = namedtuple('Slot', ['kind', 'pk', 'group', 'label', 'day', 'start', 'end', 'resources'])
+Conflict = namedtuple('Conflict', ['resource', 'day', 'first', 'second'])
+
+
+def conflict_settings():
+    return {**DEFAULT_CONFLICTS, **getattr(settings, 'SCHEDULE_CONFLICTS', {})}
+
+
+def horizon(start=None):
+    start = start or date.today()
+    return start, start + timedelta(days=conflict_settings()['HORIZON_DAYS'])
+
+
+def minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def room_key(room):
+    room = ' '.join((room or '').split()).lower()
+    return ('room', room) if room else None
+
+
+def resource_label(resource, trainer_names=None):
+    kind, value = resource
+    if kind == 'room':
+        return f'Room {value}'
+    return f"Trainer {(trainer_names or {}).get(value, value)}"
+
+
+def time_range(slot):
+    def hhmm(value):
+        return f'{value // 60:02d}:{value % 60:02d}'
+    return f'{hhmm(slot.start)}-{hhmm(slot.end)}'
+
+
+def booking(slot):
+    # A classroom's own slot, its sessions and their mirror events are one booking
+    return ('classroom', slot.group) if slot.group is not None else (slot.kind, slot.pk)
+
+
+def same_booking(a, b):
+    return (a.kind, a.pk) == (b.kind, b.pk) or (a.group is not None and a.group == b.group)
+
+
+def days_between(start, end, weekdays=None):
+    day = start
+    while day <= end:
+        if weekdays is None or day.weekday() in weekdays:
+            yield day
+        day += timedelta(days=1)
+
+
+def span(start_time, end_time=None, duration=None):
+    """(start, end) in minutes; bookings that run past midnight stop there."""
+    start = minutes(start_time)
+    end = start + duration if duration is not None else minutes(end_time)
+    return start, min(end, MINUTES_PER_DAY)
+
+
+# Slots of one booking. Each takes the row's fields as attributes, so model
+# instances (forms) and values() rows (loading) go through the same code.
+
+def classroom_slots(classroom, start, end):
+    first, last = max(start, classroom.start_date), min(end, classroom.end_date)
+    slot_start, slot_end = span(classroom.start_time, classroom.end_time)
+    if slot_end <= slot_start or not classroom.trainer_id:
+        return []
+    return [
+        Slot('classroom', classroom.pk, classroom.pk, classroom.classroom_name, day, slot_start, slot_end,
+             (('trainer', classroom.trainer_id),))
+        for day in days_between(first, last, parse_weekdays(classroom.schedule_days))
+    ]
+
+
+def session_slots(session, trainer_id, label):
+    slot_start, slot_end = span(session.scheduled_time, duration=session.duration_minutes)
+    if slot_end <= slot_start or not trainer_id:
+        return []
+    return [Slot('session', session.pk, session.classroom_id, label, session.scheduled_date, slot_start, slot_end,
+                 (('trainer', trainer_id),))]
+
+
+def schedule_slots(schedule, start, end):
+    slot_start, slot_end = span(schedule.start_time, schedule.end_time)
+    resources = tuple(key for key in (('trainer', schedule.trainer_id), room_key(schedule.room)) if key and key[1])
+    if slot_end <= slot_start or not resources:
+        return []
+    return [
+        Slot('schedule', schedule.pk, None, schedule.course_name, day, slot_start, slot_end, resources)
+        for day in days_between(start, end, {DAY_NUMBERS.get(schedule.day_of_week)})
+    ]
+
+
+def books_anyone(event):
+    return (event.event_type != 'holiday' and not event.all_day
+            and event.start_time is not None and event.end_time is not None)
+
+
+def event_slots(event, occurrences, trainer_ids, start, end, group=None):
+    """Slots of ``event`` for its (start_date, end_date) ``occurrences``, clipped to [start, end]."""
+    slot_start, slot_end = span(event.start_time, event.end_time)
+    resources = tuple(('trainer', trainer_id) for trainer_id in sorted(trainer_ids))
+    room = room_key(event.room)
+    if room:
+        resources += (room,)
+    if slot_end <= slot_start or not resources:
+        return []
+    return [
+        Slot('event', event.pk, group, event.title, day, slot_start, slot_end, resources)
+        for first, last in occurrences
+        for day in days_between(max(first, start), min(last, end))
+    ]
+
+
+# Loading
+
+def load_slots(start, end, trainers=None, rooms=None):
+    """
+    Every slot between ``start`` and ``end``, or with ``trainers`` (user ids)
+    and/or ``rooms`` (room_key()s) only the slots booking one of them.
+    """
+    everything = trainers is None and rooms is None
+    trainers, rooms = set(trainers or ()), set(rooms or ())
+
+    def by_trainer(field):
+        return Q() if everything else Q(**{f'{field}__in': trainers})
+
+    def by_room():
+        q = Q(pk__in=[])
+        for _, room in rooms:
+            q |= Q(room__iexact=room)
+        return q
+
+    slots = []
+    if everything or trainers:
+        classrooms = Classroom.objects.filter(
+            by_trainer('trainer_id'), start_date__lte=end, end_date__gte=start,
+        ).exclude(status='cancelled').values(
+            'pk', 'classroom_name', 'trainer_id', 'schedule_days', 'start_date', 'end_date', 'start_time', 'end_time',
+        )
+        for row in classrooms:
+            slots.extend(classroom_slots(SimpleNamespace(**row), start, end))
+
+        sessions = ClassroomSession.objects.filter(
+            by_trainer('classroom__trainer_id'), scheduled_date__range=(start, end),
+        ).exclude(classroom__status='cancelled').values(
+            'pk', 'classroom_id', 'scheduled_date', 'scheduled_time', 'duration_minutes',
+            trainer=F('classroom__trainer_id'), classroom_name=F('classroom__classroom_name'),
+            number=F('session__session_number'),
+        )
+        for row in sessions:
+            row = SimpleNamespace(**row)
+            slots.extend(session_slots(row, row.trainer, f'{row.classroom_name}: Session {row.number}'))
+
+    schedules = CourseSchedule.objects.filter(is_active=True)
+    if not everything:
+        schedules = schedules.filter(by_trainer('trainer_id') | by_room())
+    schedules = schedules.values(
+        'pk', 'course_name', 'trainer_id', 'day_of_week', 'start_time', 'end_time', 'room',
+    )
+    for row in schedules:
+        slots.extend(schedule_slots(SimpleNamespace(**row), start, end))
+
+    Trainers = CalendarEvent.trainers.through
+    events = CalendarEvent.objects.filter(
+        is_active=True, all_day=False, start_time__isnull=False, end_time__isnull=False,
+    ).exclude(event_type='holiday')
+    if not everything:
+        events = events.filter(
+            Q(pk__in=Trainers.objects.filter(customuser_id__in=trainers).values('calendarevent_id')) | by_room()
+        )
+    occurrences = defaultdict(list)
+    rows = {}
+    for occurrence in occurrences_between(events, start, end, values=(
+        'title', 'event_type', 'all_day', 'end_time', 'room', 'classroom_session__classroom_id',
+    )):
+        rows[occurrence.event.id] = occurrence.event
+        occurrences[occurrence.event.id].append((occurrence.start_date, occurrence.end_date))
+    event_trainers = defaultdict(set)
+    for event_id, trainer_id in Trainers.objects.filter(calendarevent_id__in=list(rows)).values_list(
+        'calendarevent_id', 'customuser_id',
+    ):
+        event_trainers[event_id].add(trainer_id)
+    for event_id, row in rows.items():
+        row.pk = event_id
+        slots.extend(event_slots(
+            row, occurrences[event_id], event_trainers[event_id], start, end,
+            group=row.classroom_session__classroom_id,
+        ))
+    return slots
+
+
+class ConflictIndex:
+    """Interval index of slots per (resource, day)."""
+
+    def __init__(self, slots=()):
+        self.buckets = defaultdict(list)
+        self.built = {}
+        for slot in slots:
+            self.add(slot)
+
+    def add(self, slot):
+        for resource in slot.resources:
+            key = (resource, slot.day)
+            self.buckets[key].append(slot)
+            self.built.pop(key, None)
+
+    def bucket(self, key):
+        if key not in self.built:
+            slots = sorted(self.buckets.get(key, ()), key=lambda slot: (slot.start, slot.end))
+            max_ends, running = [], -1
+            for slot in slots:
+                running = max(running, slot.end)
+                max_ends.append(running)
+            self.built[key] = ([slot.start for slot in slots], max_ends, slots)
+        return self.built[key]
+
+    def overlapping(self, slot, exclude=()):
+        """(resource, other slot) for every indexed slot overlapping ``slot``."""
+        for resource in slot.resources:
+            starts, max_ends, slots = self.bucket((resource, slot.day))
+            # Everything starting before slot.end; max_ends stops the walk
+            # back at the first prefix that ends before slot.start
+            index = bisect_left(starts, slot.end) - 1
+            while index >= 0 and max_ends[index] > slot.start:
+                other = slots[index]
+                if other.end > slot.start and not same_booking(slot, other) and (other.kind, other.pk) not in exclude:
+                    yield resource, other
+                index -= 1
+
+    def is_free(self, slot, exclude=()):
+        return next(self.overlapping(slot, exclude), None) is None
+
+    def conflicts(self):
+        """Every overlapping pair, once per resource and day, sorted by day."""
+        found = []
+        for key in sorted(self.buckets, key=lambda key: (key[1], key[0])):
+            resource, day = key
+            active, seen = [], set()
+            for slot in self.bucket(key)[2]:
+                active = [other for other in active if other.end > slot.start]
+                for other in active:
+                    pair = (booking(other), booking(slot))
+                    if not same_booking(other, slot) and pair not in seen:
+                        seen.add(pair)
+                        found.append(Conflict(resource, day, other, slot))
+                active.append(slot)
+        return found
+
+
+def find_conflicts(slots, exclude=()):
+    """[(slot, resource, existing slot)] for bookings overlapping any of ``slots``."""
+    if not slots:
+        return []
+    trainers = {value for slot in slots for kind, value in slot.resources if kind == 'trainer'}
+    rooms = {resource for slot in slots for resource in slot.resources if resource[0] == 'room'}
+    index = ConflictIndex(load_slots(
+        min(slot.day for slot in slots), max(slot.day for slot in slots), trainers=trainers, rooms=rooms,
+    ))
+    found, seen = [], set()
+    for slot in slots:
+        for resource, other in index.overlapping(slot, exclude):
+            key = (resource, other.day, booking(other))
+            if key not in seen:
+                seen.add(key)
+                found.append((slot, resource, other))
+    return found
+
+
+def check_session(session):
+    """Validate a ClassroomSession's slot (its classroom must be set)."""
+    classroom = session.classroom
+    slots = session_slots(session, classroom.trainer_id, f'{classroom.classroom_name}: {session.session}')
+    validate(slots, exclude={('session', session.pk)})
+
+
+def check_schedule(schedule):
+    """Validate an active CourseSchedule's weekly slot over the horizon."""
+    if schedule.is_active:
+        validate(schedule_slots(schedule, *horizon()), exclude={('schedule', schedule.pk)})
+
+
+def check_event(event, trainer_ids):
+    """Validate ``event`` (saved or not) as booking ``trainer_ids`` and its room."""
+    if not books_anyone(event):
+        return
+    if event.is_recurring:
+        start, end = horizon(max(event.start_date, date.today()))
+        if event.recurrence_end_date:
+            end = min(end, event.recurrence_end_date)
+    else:
+        start, end = event.start_date, max(event.end_date or event.start_date, event.start_date)
+    if end < start:
+        return
+    group = None
+    if event.pk:
+        # A scheduling.py mirror belongs to its classroom's booking
+        group = ClassroomSession.objects.filter(calendar_event_id=event.pk).values_list('classroom_id', flat=True).first()
+    validate(event_slots(event, expand(event, start, end), trainer_ids, start, end, group=group),
+             exclude={('event', event.pk)})
+
+
+def report(start, end):
+    """Every conflict between ``start`` and ``end``."""
+    return ConflictIndex(load_slots(start, end)).conflicts()
+
+
+def report_range(params):
+    """(start, end) from a QueryDict: today and 30 days on by default, at most REPORT_MAX_DAYS."""
+    start = parse_date(params.get('start_date')) or date.today()
+    end = parse_date(params.get('end_date')) or start + timedelta(days=30)
+    end = max(start, min(end, start + timedelta(days=conflict_settings()['REPORT_MAX_DAYS'])))
+    return start, end
+
+
+def report_rows(found):
+    """Conflicts as dicts for templates and JSON."""
+    names = trainer_names(conflict.resource for conflict in found)
+    return [
+        {
+            'resource': resource_label(conflict.resource, names),
+            'day': conflict.day,
+            'first': {'kind': conflict.first.kind, 'id': conflict.first.pk, 'label': conflict.first.label,
+                      'time': time_range(conflict.first)},
+            'second': {'kind': conflict.second.kind, 'id': conflict.second.pk, 'label': conflict.second.label,
+                       'time': time_range(conflict.second)},
+        }
+        for conflict in found
+    ]
+
+
+def trainer_names(resources):
+    ids = {value for kind, value in resources if kind == 'trainer'}
+    return dict(CustomUser.objects.filter(pk__in=ids).values_list('pk', 'username'))
+
+
+def validate(slots, exclude=(), limit=3):
+    """Raise ValidationError listing the first ``limit`` double bookings of ``slots``."""
+    if not conflict_settings()['VALIDATE']:
+        return
+    found = find_conflicts(slots, exclude)
+    if not found:
+        return
+    names = trainer_names(resource for _, resource, _ in found)
+    messages = [
+        f'{resource_label(resource, names)} is already booked on {other.day:%a %d %b %Y} '
+        f'{time_range(other)} ({other.label}).'
+        for _, resource, other in found[:limit]
+    ]
+    if len(found) > limit:
+        messages.append(f'... and {len(found) - limit} more.')
+    raise ValidationError(messages, code='schedule_conflict')
@@ -0,0 +1,125 @@
+"""
+Cached FullCalendar feed (calendar_events_json).
+
+Every change to events, their trainers/students or categories bumps a
+calendar-wide version number (signals.py). Feed responses are cached per
+(version, visibility scope, window), and the ETag/Last-Modified headers are
+derived from the version alone, so an unchanged calendar answers
+conditional requests with 304 without touching the database.
+
+The version lives in CALENDAR_FEED['CACHE_ALIAS']; with several workers
+that must be a shared cache for a bump to reach all of them.
+"""
+import json
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .grid import visible_events
+from .models import CalendarEvent
+from .recurrence import occurrences_between
+
+DEFAULT_FEED = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 600,
+}
+
+VERSION_KEY = 'calendar:version'
+MODIFIED_KEY = 'calendar:modified'
+
+EVENT_TYPES = dict(CalendarEvent.EVENT_TYPE_CHOICES)
+FEED_VALUES = ('title', 'end_time', 'all_day', 'description', 'location', 'event_type', 'category__color')
+
+
+def feed_settings():
+    return {**DEFAULT_FEED, **getattr(settings, 'CALENDAR_FEED', {})}
+
+
+def feed_cache():
+    return caches[feed_settings()['CACHE_ALIAS']]
+
+
+def calendar_version():
+    cache = feed_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        cache.add(MODIFIED_KEY, timezone.now(), None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    cache = feed_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+    cache.set(MODIFIED_KEY, timezone.now(), None)
+
+
+def last_modified():
+    modified = feed_cache().get(MODIFIED_KEY)
+    if modified is None:
+        calendar_version()
+        modified = feed_cache().get(MODIFIED_KEY)
+    return modified
+
+
+def feed_scope(user):
+    # Students and trainers see their own events; everyone else sees all of them
+    if user.role in ('student', 'trainer'):
+        return f'{user.role}:{user.pk}'
+    return 'all'
+
+
+def feed_window(request):
+    try:
+        start_date = datetime.strptime(request.GET.get('start'), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.GET.get('end'), '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        start_date = date.today()
+        end_date = start_date + timedelta(days=30)
+    return start_date, end_date
+
+
+def feed_etag(request, *args, **kwargs):
+    start_date, end_date = feed_window(request)
+    return f'{calendar_version()}-{feed_scope(request.user)}-{start_date}-{end_date}'
+
+
+def feed_last_modified(request, *args, **kwargs):
+    return last_modified()
+
+
+def serialize(user, start_date, end_date):
+    """One FullCalendar entry per occurrence in the window."""
+    events_data = []
+    for event, occurrence_start, occurrence_end in occurrences_between(
+        visible_events(user), start_date, end_date, values=FEED_VALUES
+    ):
+        events_data.append({
+            'id': event.id,
+            'title': event.title,
+            'start': f"{occurrence_start}T{event.start_time}" if event.start_time else str(occurrence_start),
+            'end': f"{occurrence_end}T{event.end_time}" if event.end_time else str(occurrence_end),
+            'allDay': event.all_day,
+            'color': event.category__color or '#007bff',
+            'description': event.description,
+            'location': event.location,
+            'type': EVENT_TYPES.get(event.event_type, event.event_type),
+        })
+    return json.dumps(events_data)
+
+
+def feed_json(user, start_date, end_date):
+    """Serialized feed for the user's scope and window, cached until the calendar changes."""
+    cache = feed_cache()
+    key = f'calendar:feed:{calendar_version()}:{feed_scope(user)}:{start_date}:{end_date}'
+    body = cache.get(key)
+    if body is None:
+        body = serialize(user, start_date, end_date)
+        cache.set(key, body, feed_settings()['TIMEOUT'])
+    return body
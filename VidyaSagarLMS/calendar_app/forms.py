@@ -1,5 +1,8 @@
 from django import forms
+from django.forms.models import construct_instance
 from .models import CalendarEvent, EventCategory, CourseSchedule, Attendance
+from .attendance import save_attendance
+from . import conflicts
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -19,18 +22,31 @@ class CalendarEventForm(forms.ModelForm):
             'title', 'description', 'event_type', 'category',
             'start_date', 'end_date', 'start_time', 'end_time', 'all_day',
             'location', 'room', 'trainers', 'students',
-            'is_recurring', 'recurrence_pattern', 'recurrence_end_date'
+            'is_recurring', 'recurrence_pattern', 'recurrence_interval', 'recurrence_weekdays',
+            'recurrence_end_date', 'recurrence_count', 'recurrence_exceptions'
         ]
         widgets = {
             'start_date': forms.DateInput(attrs={'type': 'date'}),
             'end_date': forms.DateInput(attrs={'type': 'date'}),
             'start_time': forms.TimeInput(attrs={'type': 'time'}),
             'end_time': forms.TimeInput(attrs={'type': 'time'}),
+            'recurrence_pattern': forms.Select(choices=[('', '---------'), ('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')]),
+            'recurrence_weekdays': forms.TextInput(attrs={'placeholder': 'Mon, Wed, Fri'}),
             'recurrence_end_date': forms.DateInput(attrs={'type': 'date'}),
+            'recurrence_exceptions': forms.TextInput(attrs={'placeholder': '2025-01-26, 2025-08-15'}),
             'description': forms.Textarea(attrs={'rows': 3}),
             'trainers': forms.SelectMultiple(attrs={'class': 'select2'}),
             'students': forms.SelectMultiple(attrs={'class': 'select2'}),
         }
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        if not self.errors:
+            # Trainers and the room must be free at every occurrence
+            trainers = cleaned_data.get('trainers')
+            event = construct_instance(self, self.instance)
+            conflicts.check_event(event, [trainer.pk for trainer in trainers] if trainers else [])
+        return cleaned_data
 
 class CourseScheduleForm(forms.ModelForm):
     class Meta:
@@ -40,6 +56,12 @@ class CourseScheduleForm(forms.ModelForm):
             'start_time': forms.TimeInput(attrs={'type': 'time'}),
             'end_time': forms.TimeInput(attrs={'type': 'time'}),
         }
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        if not self.errors:
+            conflicts.check_schedule(construct_instance(self, self.instance))
+        return cleaned_data
 
 class AttendanceForm(forms.ModelForm):
     class Meta:
@@ -64,4 +86,13 @@ class BulkAttendanceForm(forms.Form):
                 label=student.username,
                 required=False,
                 initial=True
-            )
\ No newline at end of file
+            )
+    
+    def save(self):
+        """Record attendance for every student field in one bulk write"""
+        entries = {
+            int(name[len('student_'):]): {'attended': value}
+            for name, value in self.cleaned_data.items()
+            if name.startswith('student_')
+        }
+        return save_attendance(self.cleaned_data['event'], entries)
\ No newline at end of file
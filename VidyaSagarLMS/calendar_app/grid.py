@@ -0,0 +1,102 @@
+"""
+Calendar windows shared by the month, day and JSON views.
+
+Events for a window are fetched once (occurrences_between, with the category
+joined in) and bucketed by day with interval arithmetic, so building a month
+grid is O(occurrences + days) rather than O(days x events). The stats tiles
+come from a single conditional aggregate.
+"""
+import calendar
+from datetime import date, timedelta
+
+from django.db.models import Count, Q
+
+from .models import CalendarEvent
+from .recurrence import occurrences_between, window_q
+
+# Stats tile -> event_type
+COUNTED_TYPES = {
+    'classes': 'class',
+    'meetings': 'meeting',
+    'exams': 'exam',
+    'holidays': 'holiday',
+}
+
+
+def visible_events(user):
+    """Active events the user may see on their calendar."""
+    events = CalendarEvent.objects.filter(is_active=True)
+    if user.role == 'student':
+        events = events.filter(students=user)
+    elif user.role == 'trainer':
+        events = events.filter(trainers=user)
+    return events
+
+
+def bucket_by_day(occurrences, start, end):
+    """{date: [event, ...]} for every day of [start, end] an occurrence covers."""
+    buckets = {}
+    seen = set()
+    for occurrence in occurrences:
+        day = max(occurrence.start_date, start)
+        last = min(occurrence.end_date, end)
+        while day <= last:
+            # Overlapping occurrences of one event show once per day
+            if (day, occurrence.event.pk) not in seen:
+                seen.add((day, occurrence.event.pk))
+                buckets.setdefault(day, []).append(occurrence.event)
+            day += timedelta(days=1)
+    return buckets
+
+
+def event_counts(events):
+    """Total and per-type counts in one query."""
+    return events.aggregate(
+        total=Count('pk'),
+        **{key: Count('pk', filter=Q(event_type=event_type)) for key, event_type in COUNTED_TYPES.items()}
+    )
+
+
+def day_events(user, day):
+    """Events on one day, ordered by start time."""
+    return bucket_by_day(occurrences_between(visible_events(user), day, day), day, day).get(day, [])
+
+
+def month_grid(user, year, month, today=None):
+    """
+    Weeks of day cells for calendar.html plus the month's events and stats.
+    Cells outside the month are blank, as calendar.monthcalendar gives them.
+    """
+    today = today or date.today()
+    first_day = date(year, month, 1)
+    last_day = date(year, month, calendar.monthrange(year, month)[1])
+    visible = visible_events(user)
+
+    occurrences = occurrences_between(visible, first_day, last_day)
+    by_day = bucket_by_day(occurrences, first_day, last_day)
+
+    weeks = []
+    for week in calendar.monthcalendar(year, month):
+        cells = []
+        for day in week:
+            if day == 0:
+                cells.append({'date': None, 'day': '', 'events': [], 'is_today': False, 'is_current_month': False})
+                continue
+            day_date = date(year, month, day)
+            cells.append({
+                'date': day_date,
+                'day': day,
+                'events': by_day.get(day_date, []),
+                'is_today': day_date == today,
+                'is_current_month': True,
+            })
+        weeks.append(cells)
+
+    # Each event once, in order of its first occurrence this month
+    events = list({occurrence.event.pk: occurrence.event for occurrence in occurrences}.values())
+
+    return {
+        'weeks': weeks,
+        'events': events,
+        'event_counts': event_counts(visible.filter(window_q(first_day, last_day))),
+    }
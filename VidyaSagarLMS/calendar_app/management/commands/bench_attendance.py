@@ -0,0 +1,125 @@
+"""
+Query count and latency of saving and loading attendance for one event.
+
+For each class size, posts take_attendance's form data twice (first save
+creates every row, second changes some of them) and loads the records the
+way the GET does, once with the old per-student loop and once with
+calendar_app.attendance:
+
+    python manage.py bench_attendance --students 50 200 1000
+"""
+import json
+import random
+import time
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+
+from calendar_app.attendance import entries_from_post, parse_datetime_local, records_by_student, save_attendance
+from calendar_app.models import Attendance, CalendarEvent
+from classroom.management.commands._benchutils import benchmark_database
+
+CustomUser = get_user_model()
+
+
+def legacy_save(event, students, data):
+    """take_attendance's POST loop before attendance.py."""
+    for student in students:
+        Attendance.objects.update_or_create(
+            event=event,
+            student=student,
+            defaults={
+                'attended': data.get(f'attended_{student.id}') == 'on',
+                'check_in_time': parse_datetime_local(data.get(f'check_in_{student.id}')),
+                'check_out_time': parse_datetime_local(data.get(f'check_out_{student.id}')),
+                'remarks': data.get(f'remarks_{student.id}', ''),
+            }
+        )
+
+
+def legacy_load(event, students):
+    records = {}
+    for student in students:
+        try:
+            records[student.id] = Attendance.objects.get(event=event, student=student)
+        except Attendance.DoesNotExist:
+            records[student.id] = None
+    return records
+
+
+def form_data(students, rng, absent_share):
+    data = {}
+    for student in students:
+        data[f'attended_{student.id}'] = 'off' if rng.random() < absent_share else 'on'
+        data[f'check_in_{student.id}'] = f'{date.today()}T09:00'
+        data[f'check_out_{student.id}'] = f'{date.today()}T10:00'
+        data[f'remarks_{student.id}'] = ''
+    return data
+
+
+def measure(func):
+    reset_queries()
+    with CaptureQueriesContext(connection) as captured:
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+    return {'queries': len(captured), 'ms': round(elapsed * 1000, 2)}
+
+
+def create_event(label, size, trainer):
+    CustomUser.objects.bulk_create([
+        CustomUser(username=f'{label}-student-{i}', role='student') for i in range(size)
+    ])
+    students = list(CustomUser.objects.filter(username__startswith=f'{label}-student-').order_by('pk'))
+    event = CalendarEvent.objects.create(title=label, event_type='class', start_date=date.today(), created_by=trainer)
+    event.students.set(students)
+    return event, students
+
+
+class Command(BaseCommand):
+    help = 'Benchmark take_attendance saves and loads: per-student queries vs bulk service.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, nargs='+', default=[50, 200, 1000])
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--in-memory', action='store_true', help='use an in-memory SQLite test database')
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        results = []
+        with benchmark_database(on_disk=not options['in_memory']):
+            trainer = CustomUser.objects.create(username='bench-attendance-trainer', role='trainer')
+            for size in options['students']:
+                row = {'students': size}
+                for mode in ('legacy', 'bulk'):
+                    event, students = create_event(f'{mode}{size}', size, trainer)
+                    first = form_data(students, rng, 0.1)
+                    second = form_data(students, rng, 0.3)
+                    if mode == 'legacy':
+                        row[mode] = {
+                            'first_save': measure(lambda: legacy_save(event, students, first)),
+                            'second_save': measure(lambda: legacy_save(event, students, second)),
+                            'load': measure(lambda: legacy_load(event, students)),
+                        }
+                    else:
+                        row[mode] = {
+                            'first_save': measure(lambda: save_attendance(event, entries_from_post(students, first))),
+                            'second_save': measure(lambda: save_attendance(event, entries_from_post(students, second))),
+                            'load': measure(lambda: records_by_student(event)),
+                        }
+                results.append(row)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for row in results:
+            for mode in ('legacy', 'bulk'):
+                parts = '  '.join(
+                    f"{step} {row[mode][step]['queries']} q / {row[mode][step]['ms']:.1f} ms"
+                    for step in ('first_save', 'second_save', 'load')
+                )
+                self.stdout.write(f"{row['students']:>5} students {mode:>6}: {parts}")
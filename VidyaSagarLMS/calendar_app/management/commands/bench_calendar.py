@@ -0,0 +1,172 @@
+"""
+Month view query count and wall time with many events.
+
+Creates N events (a share of them recurring) in a throwaway database and
+builds the current month the way calendar_view used to (every day tested
+against every event, five COUNT queries) and with grid.month_grid, both
+expanding on the fly and from materialized occurrences:
+
+    python manage.py bench_calendar --events 10000
+"""
+import calendar
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from calendar_app.grid import month_grid, visible_events
+from calendar_app.models import CalendarEvent, EventCategory
+from calendar_app.recurrence import materialize, occurrence_settings
+from classroom.management.commands._benchutils import benchmark_database
+
+CustomUser = get_user_model()
+
+
+def legacy_month(user, year, month):
+    """calendar_view's month computation before grid.py, kept for comparison."""
+    events = CalendarEvent.objects.filter(
+        Q(start_date__year=year, start_date__month=month) |
+        Q(end_date__year=year, end_date__month=month) |
+        (Q(is_recurring=True) & Q(start_date__lte=date(year, month, 1)))
+    ).filter(is_active=True)
+    weeks = []
+    for week in calendar.monthcalendar(year, month):
+        cells = []
+        for day in week:
+            if day == 0:
+                cells.append([])
+                continue
+            day_date = date(year, month, day)
+            day_events = []
+            for event in events:
+                if event.start_date == day_date:
+                    day_events.append(event)
+                elif event.end_date and event.start_date <= day_date <= event.end_date:
+                    day_events.append(event)
+                elif event.is_recurring and event.start_date <= day_date:
+                    if event.recurrence_pattern == 'daily':
+                        day_events.append(event)
+                    elif event.recurrence_pattern == 'weekly' and event.start_date.weekday() == day_date.weekday():
+                        day_events.append(event)
+                    elif event.recurrence_pattern == 'monthly' and event.start_date.day == day:
+                        day_events.append(event)
+            # The template reads the category of every event it shows
+            for event in day_events[:3]:
+                event.category
+            cells.append(day_events)
+        weeks.append(cells)
+    counts = {
+        'total': events.count(),
+        'classes': events.filter(event_type='class').count(),
+        'meetings': events.filter(event_type='meeting').count(),
+        'exams': events.filter(event_type='exam').count(),
+        'holidays': events.filter(event_type='holiday').count(),
+    }
+    return weeks, counts
+
+
+def grid_month(user, year, month):
+    grid = month_grid(user, year, month)
+    for week in grid['weeks']:
+        for cell in week:
+            for event in cell['events'][:3]:
+                event.category
+    return grid
+
+
+def create_events(count, recurring_share, seed):
+    rng = random.Random(seed)
+    today = date.today()
+    admin = CustomUser.objects.create(username='bench-calendar-admin', role='admin')
+    categories = [EventCategory.objects.create(name=f'Category {i}') for i in range(5)]
+    types = [choice for choice, _ in CalendarEvent.EVENT_TYPE_CHOICES]
+    events = []
+    for i in range(count):
+        start = today + timedelta(days=rng.randint(-365, 365))
+        event = CalendarEvent(
+            title=f'Event {i}', event_type=rng.choice(types), category=rng.choice(categories),
+            start_date=start, end_date=start + timedelta(days=rng.choice([0, 0, 0, 1, 2])),
+            created_by=admin,
+        )
+        if rng.random() < recurring_share:
+            event.is_recurring = True
+            event.recurrence_pattern = rng.choice(['daily', 'weekly', 'weekly', 'monthly'])
+            event.end_date = start
+            if event.recurrence_pattern == 'weekly' and rng.random() < 0.5:
+                event.recurrence_weekdays = 'Mon, Wed, Fri'
+            if rng.random() < 0.7:
+                event.recurrence_end_date = start + timedelta(days=rng.randint(14, 120))
+        events.append(event)
+    CalendarEvent.objects.bulk_create(events, batch_size=1000)
+    return admin
+
+
+def measure(func, repeat):
+    samples = []
+    queries = 0
+    for _ in range(repeat):
+        reset_queries()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+        queries = len(captured)
+    samples.sort()
+    return {'queries': queries, 'median_ms': round(samples[len(samples) // 2] * 1000, 2),
+            'min_ms': round(samples[0] * 1000, 2)}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the calendar month view: legacy nested loop vs grid.month_grid.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=10000)
+        parser.add_argument('--recurring-share', type=float, default=0.1)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--in-memory', action='store_true', help='use an in-memory SQLite test database')
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        today = date.today()
+        results = {}
+        with benchmark_database(on_disk=not options['in_memory']):
+            user = create_events(options['events'], options['recurring_share'], options['seed'])
+            month_events = visible_events(user).count()
+
+            results['legacy'] = measure(lambda: legacy_month(user, today.year, today.month), options['repeat'])
+
+            expanded = {**occurrence_settings(), 'MATERIALIZE': False}
+            with override_settings(CALENDAR_OCCURRENCES=expanded):
+                results['grid_expanded'] = measure(lambda: grid_month(user, today.year, today.month), options['repeat'])
+
+            started = time.perf_counter()
+            rows = sum(materialize(event) for event in CalendarEvent.objects.iterator(chunk_size=1000))
+            materialize_seconds = time.perf_counter() - started
+            results['grid_materialized'] = measure(lambda: grid_month(user, today.year, today.month), options['repeat'])
+
+        report = {
+            'events': options['events'],
+            'active_events': month_events,
+            'recurring_share': options['recurring_share'],
+            'occurrence_rows': rows,
+            'materialize_seconds': round(materialize_seconds, 2),
+            'month': results,
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(
+            f"{options['events']} events, {rows} materialized occurrence rows ({materialize_seconds:.1f} s to build)"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:>18}: {result['queries']:>4} queries  median {result['median_ms']:.1f} ms  "
+                f"min {result['min_ms']:.1f} ms"
+            )
@@ -0,0 +1,39 @@
+"""
+Rebuild EventOccurrence rows for calendar events.
+
+Saving an event already rewrites its occurrences; run this once after
+enabling materialization and daily afterwards so open-ended series stay
+covered HORIZON_DAYS ahead:
+
+    python manage.py materialize_occurrences
+    python manage.py materialize_occurrences --all --horizon-days 365
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from calendar_app.models import CalendarEvent
+from calendar_app.recurrence import materialize, occurrence_settings
+
+
+class Command(BaseCommand):
+    help = 'Materialize calendar event occurrences up to the configured horizon.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizon-days', type=int, help='defaults to CALENDAR_OCCURRENCES["HORIZON_DAYS"]')
+        parser.add_argument('--all', action='store_true',
+                            help='rebuild every event, not only those not covered up to the horizon')
+
+    def handle(self, *args, **options):
+        horizon = options['horizon_days'] or occurrence_settings()['HORIZON_DAYS']
+        through = date.today() + timedelta(days=horizon)
+
+        events = CalendarEvent.objects.all()
+        if not options['all']:
+            events = events.exclude(occurrences_until__gte=through)
+
+        count = rows = 0
+        for event in events.iterator(chunk_size=500):
+            rows += materialize(event, through)
+            count += 1
+        self.stdout.write(f'Materialized {rows} occurrence rows for {count} events through {through}.')
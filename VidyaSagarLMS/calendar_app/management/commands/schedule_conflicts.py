@@ -0,0 +1,46 @@
+"""
+List trainer and room double bookings (calendar_app/conflicts.py):
+
+    python manage.py schedule_conflicts
+    python manage.py schedule_conflicts --start-date 2025-01-01 --end-date 2025-06-30 --json
+"""
+import json
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from calendar_app import conflicts
+from calendar_app.reports import parse_date
+
+
+class Command(BaseCommand):
+    help = 'Report trainers and rooms booked twice at the same time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help='YYYY-MM-DD, default today')
+        parser.add_argument('--end-date', help='YYYY-MM-DD, default 30 days after the start')
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        start = parse_date(options['start_date']) if options['start_date'] else date.today()
+        end = parse_date(options['end_date']) if options['end_date'] else start and start + timedelta(days=30)
+        if start is None or end is None or end < start:
+            raise CommandError('Give --start-date and --end-date as YYYY-MM-DD, the end not before the start.')
+
+        started = time.perf_counter()
+        index = conflicts.ConflictIndex(conflicts.load_slots(start, end))
+        rows = conflicts.report_rows(index.conflicts())
+        elapsed = time.perf_counter() - started
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'start_date': start, 'end_date': end, 'seconds': round(elapsed, 3), 'conflicts': rows,
+            }, indent=2, default=str))
+        else:
+            for row in rows:
+                self.stdout.write(
+                    f"{row['day']}  {row['resource']}: {row['first']['label']} ({row['first']['time']}) "
+                    f"/ {row['second']['label']} ({row['second']['time']})"
+                )
+            self.stdout.write(f'{len(rows)} conflicts from {start} to {end} ({elapsed:.2f}s).')
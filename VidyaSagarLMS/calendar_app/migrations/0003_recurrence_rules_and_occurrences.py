@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_app', '0002_alter_attendance_student'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarevent',
+            name='occurrences_until',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='recurrence_count',
+            field=models.PositiveIntegerField(blank=True, help_text='Stop after this many occurrences', null=True),
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='recurrence_exceptions',
+            field=models.TextField(blank=True, help_text='Skipped dates, e.g., 2025-01-26, 2025-08-15'),
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='recurrence_interval',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Every N days/weeks/months'),
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='recurrence_weekdays',
+            field=models.CharField(blank=True, help_text='Weekly only, e.g., Mon, Wed, Fri', max_length=50),
+        ),
+        migrations.CreateModel(
+            name='EventOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='calendar_app.calendarevent')),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['date'], name='occurrence_day_idx')],
+                'unique_together': {('event', 'date', 'start_date')},
+            },
+        ),
+    ]
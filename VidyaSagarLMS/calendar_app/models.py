@@ -47,10 +47,16 @@ class CalendarEvent(models.Model):
     trainers = models.ManyToManyField(User, related_name='trainer_events', blank=True, limit_choices_to={'role': 'trainer'})
     students = models.ManyToManyField(User, related_name='student_events', blank=True, limit_choices_to={'role': 'student'})
     
-    # Recurrence
+    # Recurrence (expanded by recurrence.py)
     is_recurring = models.BooleanField(default=False)
     recurrence_pattern = models.CharField(max_length=50, blank=True)  # 'daily', 'weekly', 'monthly'
     recurrence_end_date = models.DateField(null=True, blank=True)
+    recurrence_interval = models.PositiveSmallIntegerField(default=1, help_text="Every N days/weeks/months")
+    recurrence_weekdays = models.CharField(max_length=50, blank=True, help_text="Weekly only, e.g., Mon, Wed, Fri")
+    recurrence_count = models.PositiveIntegerField(null=True, blank=True, help_text="Stop after this many occurrences")
+    recurrence_exceptions = models.TextField(blank=True, help_text="Skipped dates, e.g., 2025-01-26, 2025-08-15")
+    # Last date covered by the EventOccurrence rows (None: not materialized)
+    occurrences_until = models.DateField(null=True, blank=True, editable=False)
     
     # Status
     is_active = models.BooleanField(default=True)
@@ -73,6 +79,27 @@ class CalendarEvent(models.Model):
         today = timezone.now().date()
         return self.start_date == today
 
+class EventOccurrence(models.Model):
+    """
+    One day covered by a materialized occurrence of a CalendarEvent (see
+    recurrence.py). Multi-day occurrences get a row per day, so a date
+    window is a plain range scan on ``date``.
+    """
+    event = models.ForeignKey(CalendarEvent, on_delete=models.CASCADE, related_name='occurrences')
+    date = models.DateField()
+    start_date = models.DateField()
+    end_date = models.DateField()
+    
+    class Meta:
+        ordering = ['date']
+        unique_together = ['event', 'date', 'start_date']
+        indexes = [
+            models.Index(fields=['date'], name='occurrence_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event.title} - {self.date}"
+
 class CourseSchedule(models.Model):
     DAY_CHOICES = (
         ('monday', 'Monday'),
@@ -0,0 +1,224 @@
+"""
+Recurrence rules for CalendarEvent.
+
+A recurring event repeats ``recurrence_pattern`` ('daily', 'weekly' or
+'monthly') every ``recurrence_interval`` periods, optionally on
+``recurrence_weekdays`` (weekly), until ``recurrence_end_date`` and/or for
+``recurrence_count`` occurrences, skipping ``recurrence_exceptions``. As in
+RRULE, skipped dates still count towards ``recurrence_count`` and monthly
+events skip months without their day (the 31st, 30 February).
+
+expand() walks straight to the first occurrence of a date window instead of
+testing every day against every event. With CALENDAR_OCCURRENCES['MATERIALIZE']
+on, occurrences up to HORIZON_DAYS ahead are also stored in EventOccurrence
+whenever an event is saved, and occurrences_between() reads those with a
+range scan.
+"""
+import calendar
+import re
+from collections import namedtuple
+from types import SimpleNamespace
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .models import CalendarEvent, EventOccurrence
+
+DEFAULT_OCCURRENCES = {
+    'MATERIALIZE': True,
+    'HORIZON_DAYS': 730,
+}
+
+PATTERNS = ('daily', 'weekly', 'monthly')
+WEEKDAYS = {'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6}
+
+Occurrence = namedtuple('Occurrence', ['event', 'start_date', 'end_date'])
+
+# What expand() and the ordering in occurrences_between() read from an event
+RULE_FIELDS = (
+    'id', 'start_date', 'end_date', 'start_time', 'is_recurring', 'recurrence_pattern',
+    'recurrence_interval', 'recurrence_weekdays', 'recurrence_end_date', 'recurrence_count',
+    'recurrence_exceptions',
+)
+
+
+def occurrence_settings():
+    return {**DEFAULT_OCCURRENCES, **getattr(settings, 'CALENDAR_OCCURRENCES', {})}
+
+
+def parse_weekdays(value):
+    """'Mon, Wed, Fri' (or 'monday wednesday') -> {0, 2, 4}"""
+    days = set()
+    for name in re.split(r'[\s,;]+', value or ''):
+        day = WEEKDAYS.get(name[:3].lower())
+        if day is not None:
+            days.add(day)
+    return days
+
+
+def parse_exceptions(value):
+    dates = set()
+    for token in re.split(r'[\s,;]+', value or ''):
+        try:
+            dates.add(date.fromisoformat(token))
+        except ValueError:
+            continue
+    return dates
+
+
+def pattern_of(event):
+    pattern = (event.recurrence_pattern or '').strip().lower()
+    return pattern if event.is_recurring and pattern in PATTERNS else None
+
+
+def span_of(event):
+    if event.end_date and event.end_date > event.start_date:
+        return timedelta(days=(event.end_date - event.start_date).days)
+    return timedelta(0)
+
+
+def _candidates(event, pattern, from_date):
+    """(index, start) pairs of the unbounded series, from the period containing from_date on."""
+    start = event.start_date
+    interval = max(1, event.recurrence_interval or 1)
+
+    if pattern == 'daily':
+        n = max(0, -(-(from_date - start).days // interval))
+        while True:
+            yield n, start + timedelta(days=n * interval)
+            n += 1
+
+    elif pattern == 'weekly':
+        days = sorted(parse_weekdays(event.recurrence_weekdays) or {start.weekday()})
+        first_week = [day for day in days if day >= start.weekday()]
+        week_zero = start - timedelta(days=start.weekday())
+        period = max(0, (from_date - week_zero).days // (7 * interval))
+        index = 0 if period == 0 else len(first_week) + (period - 1) * len(days)
+        while True:
+            week = week_zero + timedelta(weeks=period * interval)
+            for day in (first_week if period == 0 else days):
+                yield index, week + timedelta(days=day)
+                index += 1
+            period += 1
+
+    elif pattern == 'monthly':
+        # Months without the day are skipped and not counted, so walk from the start
+        n = index = 0
+        while True:
+            year, month = divmod(start.month - 1 + n * interval, 12)
+            year += start.year
+            if start.day <= calendar.monthrange(year, month + 1)[1]:
+                yield index, date(year, month + 1, start.day)
+                index += 1
+            n += 1
+
+
+def occurrence_starts(event, from_date):
+    """Start dates of the event's occurrences on or after from_date, exceptions included."""
+    pattern = pattern_of(event)
+    if pattern is None:
+        if event.start_date >= from_date:
+            yield event.start_date
+        return
+
+    until = event.recurrence_end_date
+    count = event.recurrence_count
+    for index, day in _candidates(event, pattern, from_date):
+        if (until and day > until) or (count is not None and index >= count):
+            return
+        if day >= from_date:
+            yield day
+
+
+def expand(event, window_start, window_end):
+    """(start, end) of every occurrence overlapping [window_start, window_end]."""
+    span = span_of(event)
+    exceptions = parse_exceptions(event.recurrence_exceptions) if pattern_of(event) else set()
+    occurrences = []
+    for day in occurrence_starts(event, window_start - span):
+        if day > window_end:
+            break
+        if day not in exceptions:
+            occurrences.append((day, day + span))
+    return occurrences
+
+
+def window_q(start, end):
+    """Events that can have an occurrence overlapping [start, end], honouring recurrence_end_date."""
+    single = Q(is_recurring=False, start_date__lte=end) & (
+        Q(end_date__gte=start) | Q(end_date__isnull=True, start_date__gte=start)
+    )
+    recurring = Q(is_recurring=True, start_date__lte=end) & (
+        Q(recurrence_end_date__isnull=True) | Q(recurrence_end_date__gte=start)
+    )
+    return single | recurring
+
+
+def materialize(event, through=None):
+    """Rewrite the event's EventOccurrence rows up to ``through`` (default: HORIZON_DAYS from today)."""
+    if through is None:
+        through = date.today() + timedelta(days=occurrence_settings()['HORIZON_DAYS'])
+
+    rows = []
+    complete = True
+    if event.is_active:
+        span = span_of(event)
+        exceptions = parse_exceptions(event.recurrence_exceptions) if pattern_of(event) else set()
+        for start in occurrence_starts(event, event.start_date):
+            if start > through:
+                complete = False
+                break
+            if start in exceptions:
+                continue
+            # One row per covered day
+            rows.extend(
+                EventOccurrence(event=event, date=start + timedelta(days=offset), start_date=start, end_date=start + span)
+                for offset in range(span.days + 1)
+            )
+
+    # A finished series is covered for any window; an open one only up to ``through``
+    covered = date.max if complete else through
+    with transaction.atomic():
+        EventOccurrence.objects.filter(event=event).delete()
+        EventOccurrence.objects.bulk_create(rows, batch_size=500)
+        CalendarEvent.objects.filter(pk=event.pk).update(occurrences_until=covered)
+    event.occurrences_until = covered
+    return len(rows)
+
+
+def occurrences_between(events, start, end, values=None):
+    """
+    Occurrences of ``events`` (a CalendarEvent queryset) overlapping
+    [start, end], ordered by date and start time. Materialized events are
+    read from EventOccurrence; the rest are expanded here.
+
+    Events are model instances with their category, or with ``values`` (extra
+    field names or lookups) lightweight rows loaded with values(), e.g.
+    ``row.title``, ``row.category__color``.
+    """
+    def load(queryset):
+        if values is None:
+            return queryset.select_related('category')
+        return [SimpleNamespace(**row) for row in queryset.values(*RULE_FIELDS, *values)]
+
+    occurrences = []
+    if occurrence_settings()['MATERIALIZE']:
+        # Exists rather than IN so the planner drives from the date index
+        stored = EventOccurrence.objects.filter(
+            Exists(events.filter(pk=OuterRef('event_id'), occurrences_until__gte=end)),
+            date__range=(start, end)
+        )
+        # Day rows folded back into occurrences; each event loaded once
+        rows = list(stored.values_list('event_id', 'start_date', 'end_date').order_by().distinct())
+        if rows:
+            by_id = {event.id: event for event in load(CalendarEvent.objects.filter(pk__in=stored.values('event_id')))}
+            occurrences = [Occurrence(by_id[event_id], s, e) for event_id, s, e in rows]
+        events = events.exclude(occurrences_until__gte=end)
+
+    for event in load(events.filter(window_q(start, end))):
+        occurrences.extend(Occurrence(event, s, e) for s, e in expand(event, start, end))
+
+    occurrences.sort(key=lambda o: (o.start_date, o.event.start_time or time.min, o.event.id))
+    return occurrences
@@ -0,0 +1,133 @@
+"""
+Attendance report queries (attendance_report and its CSV/JSONL export).
+
+Every event row carries its enrolled and present counts as annotations, so a
+page of the report is one query and the footer totals one more, however many
+events match. The counts are correlated subqueries on the through table and
+on Attendance rather than Count() over both joins: joining students and
+attendance together multiplies an event's rows (students x attendance) before
+DISTINCT can collapse them.
+
+The export walks the same queryset with .iterator(), so memory stays flat
+whatever the date range.
+"""
+import csv
+import json
+from datetime import datetime
+
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Attendance, CalendarEvent
+
+PAGE_SIZE = 50
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = [
+    'id', 'title', 'event_type', 'start_date', 'start_time', 'end_time', 'location',
+    'total_students', 'attended', 'absent', 'percentage',
+]
+
+
+def _count(queryset, event_field):
+    """COUNT(*) of a queryset filtered on ``event_field=OuterRef('pk')``, 0 when empty."""
+    counted = queryset.order_by().values(event_field).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def parse_date(value):
+    """A YYYY-MM-DD query parameter, or None."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def report_filters(params):
+    """Report filters from a QueryDict; unparseable dates are ignored."""
+    return {
+        'event_type': params.get('event_type', 'class'),
+        'start_date': parse_date(params.get('start_date')),
+        'end_date': parse_date(params.get('end_date')),
+    }
+
+
+def report_events(event_type='class', start_date=None, end_date=None):
+    """Active events in the range, annotated with total_students and attended."""
+    events = CalendarEvent.objects.filter(is_active=True)
+    if event_type != 'all':
+        events = events.filter(event_type=event_type)
+    if start_date:
+        events = events.filter(start_date__gte=start_date)
+    if end_date:
+        events = events.filter(start_date__lte=end_date)
+
+    enrolled = CalendarEvent.students.through.objects.filter(calendarevent=OuterRef('pk'))
+    present = Attendance.objects.filter(event=OuterRef('pk'), attended=True)
+    return events.annotate(
+        total_students=_count(enrolled, 'calendarevent'),
+        attended=_count(present, 'event'),
+    ).order_by('start_date', 'start_time', 'pk')
+
+
+def percentage(attended, total_students):
+    return round(attended / total_students * 100, 1) if total_students else 0
+
+
+def report_rows(events):
+    """Template rows for a page of report_events()."""
+    return [
+        {
+            'event': event,
+            'total_students': event.total_students,
+            'attended': event.attended,
+            'absent': event.total_students - event.attended,
+            'percentage': percentage(event.attended, event.total_students),
+        }
+        for event in events
+    ]
+
+
+def report_totals(events):
+    """Footer totals for every event matching the filters, in one query."""
+    # Aliases must differ from the annotations they sum
+    totals = events.order_by().aggregate(
+        total_events=Count('pk'),
+        enrolled_sum=Coalesce(Sum('total_students'), 0),
+        total_present=Coalesce(Sum('attended'), 0),
+    )
+    totals['total_students'] = totals.pop('enrolled_sum')
+    totals['total_absent'] = totals['total_students'] - totals['total_present']
+    totals['overall_percentage'] = percentage(totals['total_present'], totals['total_students'])
+    return totals
+
+
+def export_records(events):
+    """One dict per event, streamed from the database in chunks."""
+    rows = events.values(
+        'id', 'title', 'event_type', 'start_date', 'start_time', 'end_time', 'location',
+        'total_students', 'attended',
+    )
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        row['absent'] = row['total_students'] - row['attended']
+        row['percentage'] = percentage(row['attended'], row['total_students'])
+        yield row
+
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(events):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in export_records(events):
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+def stream_jsonl(events):
+    for row in export_records(events):
+        yield json.dumps(row, default=str) + '\n'
@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from .feed import bump_version
+from .models import CalendarEvent, EventCategory
+from .recurrence import materialize, occurrence_settings
+
+
+@receiver(post_save, sender=CalendarEvent)
+def calendar_event_saved(sender, instance, raw=False, **kwargs):
+    # Keep the occurrence table in step with the event's dates and rule
+    if raw or not occurrence_settings()['MATERIALIZE']:
+        return
+    materialize(instance)
+
+
+@receiver(post_save, sender=CalendarEvent)
+@receiver(post_delete, sender=CalendarEvent)
+@receiver(post_save, sender=EventCategory)
+@receiver(post_delete, sender=EventCategory)
+@receiver(m2m_changed, sender=CalendarEvent.trainers.through)
+@receiver(m2m_changed, sender=CalendarEvent.students.through)
+def calendar_changed(sender, action=None, **kwargs):
+    # Invalidates cached feeds and their ETags (feed.py)
+    if action is not None and not action.startswith('post_'):
+        return
+    transaction.on_commit(bump_version)
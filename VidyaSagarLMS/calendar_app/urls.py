@@ -14,7 +14,9 @@ urlpatterns = [
     
     path('categories/', views.manage_categories, name='manage_categories'),
     path('schedules/', views.course_schedules, name='course_schedules'),
+    path('schedules/conflicts/', views.schedule_conflicts, name='schedule_conflicts'),
     
     path('attendance/<int:event_id>/', views.take_attendance, name='take_attendance'),
     path('attendance/report/', views.attendance_report, name='attendance_report'),
+    path('attendance/report/export/', views.attendance_report_export, name='attendance_report_export'),
 ]
\ No newline at end of file
@@ -1,13 +1,20 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
-from django.http import JsonResponse
+from django.core.paginator import Paginator
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.db.models import Q
 from datetime import date, datetime, time, timedelta
 from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from .models import CalendarEvent, EventCategory, CourseSchedule, Attendance
 from .forms import CalendarEventForm, EventCategoryForm, CourseScheduleForm, AttendanceForm, BulkAttendanceForm
+from . import conflicts, feed, reports
+from .attendance import entries_from_post, records_by_student, save_attendance
+from .grid import day_events, month_grid
 from accounts.models import CustomUser
+from classroom import agenda
 import calendar
 
 @login_required
@@ -33,78 +40,13 @@ def calendar_view(request):
     next_month = month + 1 if month < 12 else 1
     next_year = year if month < 12 else year + 1
     
-    # Get events for the month
-    events = CalendarEvent.objects.filter(
-        Q(start_date__year=year, start_date__month=month) |
-        Q(end_date__year=year, end_date__month=month) |
-        (Q(is_recurring=True) & Q(start_date__lte=date(year, month, 1)))
-    ).filter(is_active=True)
-    
-    # Filter events based on user role
-    if user.role == 'student':
-        events = events.filter(students=user)
-    elif user.role == 'trainer':
-        events = events.filter(trainers=user)
-    
-    # Generate proper month calendar grid
-    cal = calendar.monthcalendar(year, month)
-    month_calendar = []
-    
-    # Get month name and year for display
+    # Events fetched once and bucketed by day (grid.py)
+    grid = month_grid(user, year, month, today)
     month_name_full = date(year, month, 1).strftime('%B')
     
-    for week_num, week in enumerate(cal):
-        week_days = []
-        for day in week:
-            if day == 0:
-                # Empty day (from previous/next month)
-                week_days.append({
-                    'date': None,
-                    'day': '',
-                    'events': [],
-                    'is_today': False,
-                    'is_current_month': False
-                })
-            else:
-                day_date = date(year, month, day)
-                day_events = []
-                
-                # Find events for this day
-                for event in events:
-                    if event.start_date == day_date:
-                        day_events.append(event)
-                    elif event.end_date and event.start_date <= day_date <= event.end_date:
-                        day_events.append(event)
-                    elif event.is_recurring and event.start_date <= day_date:
-                        # Simple recurrence check (for demo - implement proper recurrence logic)
-                        if event.recurrence_pattern == 'daily':
-                            day_events.append(event)
-                        elif event.recurrence_pattern == 'weekly' and event.start_date.weekday() == day_date.weekday():
-                            day_events.append(event)
-                        elif event.recurrence_pattern == 'monthly' and event.start_date.day == day:
-                            day_events.append(event)
-                
-                week_days.append({
-                    'date': day_date,
-                    'day': day,
-                    'events': day_events,
-                    'is_today': day_date == today,
-                    'is_current_month': True
-                })
-        month_calendar.append(week_days)
-    
-    # Get event counts for statistics
-    event_counts = {
-        'total': events.count(),
-        'classes': events.filter(event_type='class').count(),
-        'meetings': events.filter(event_type='meeting').count(),
-        'exams': events.filter(event_type='exam').count(),
-        'holidays': events.filter(event_type='holiday').count(),
-    }
-    
     context = {
         'user': user,
-        'events': events,
+        'events': grid['events'],
         'current_year': year,
         'current_month': month,
         'current_month_name': month_name_full,
@@ -113,54 +55,24 @@ def calendar_view(request):
         'next_year': next_year,
         'next_month': next_month,
         'today': today,
-        'month_calendar': month_calendar,
-        'event_counts': event_counts,
+        'month_calendar': grid['weeks'],
+        'event_counts': grid['event_counts'],
         'weekdays': ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'],
     }
+    if user.role in ('student', 'trainer'):
+        # Next 7 days from the user's materialized agenda (classroom/agenda.py)
+        context['agenda'] = agenda.upcoming(user, limit=10, days=7)
     
     return render(request, 'calendar_app/calendar.html', context)
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=feed.feed_etag, last_modified_func=feed.feed_last_modified)
 def calendar_events_json(request):
     """API endpoint for calendar events (FullCalendar integration)"""
-    start = request.GET.get('start')
-    end = request.GET.get('end')
-    
-    try:
-        start_date = datetime.strptime(start, '%Y-%m-%d').date()
-        end_date = datetime.strptime(end, '%Y-%m-%d').date()
-    except (ValueError, TypeError):
-        start_date = date.today()
-        end_date = start_date + timedelta(days=30)
-    
-    events = CalendarEvent.objects.filter(
-        Q(start_date__range=[start_date, end_date]) |
-        Q(end_date__range=[start_date, end_date]) |
-        (Q(is_recurring=True) & Q(start_date__lte=end_date))
-    ).filter(is_active=True)
-    
-    # Filter based on user role
-    user = request.user
-    if user.role == 'student':
-        events = events.filter(students=user)
-    elif user.role == 'trainer':
-        events = events.filter(trainers=user)
-    
-    events_data = []
-    for event in events:
-        events_data.append({
-            'id': event.id,
-            'title': event.title,
-            'start': f"{event.start_date}T{event.start_time}" if event.start_time else str(event.start_date),
-            'end': f"{event.end_date or event.start_date}T{event.end_time}" if event.end_time else str(event.end_date or event.start_date),
-            'allDay': event.all_day,
-            'color': event.category.color if event.category else '#007bff',
-            'description': event.description,
-            'location': event.location,
-            'type': event.get_event_type_display(),
-        })
-    
-    return JsonResponse(events_data, safe=False)
+    # Cached per scope and window until the calendar changes (feed.py)
+    start_date, end_date = feed.feed_window(request)
+    return HttpResponse(feed.feed_json(request.user, start_date, end_date), content_type='application/json')
 
 @login_required
 def day_view(request, year=None, month=None, day=None):
@@ -176,19 +88,8 @@ def day_view(request, year=None, month=None, day=None):
     else:
         view_date = today
     
-    # Get events for the day
-    events = CalendarEvent.objects.filter(
-        Q(start_date=view_date) |
-        Q(end_date=view_date) |
-        (Q(start_date__lte=view_date) & Q(end_date__gte=view_date)) |
-        (Q(is_recurring=True) & Q(start_date__lte=view_date))
-    ).filter(is_active=True)
-    
-    # Filter based on user role
-    if user.role == 'student':
-        events = events.filter(students=user)
-    elif user.role == 'trainer':
-        events = events.filter(trainers=user)
+    # Get events for the day (already ordered by start time)
+    events = day_events(user, view_date)
     
     # Get previous and next day
     prev_day = view_date - timedelta(days=1)
@@ -196,7 +97,7 @@ def day_view(request, year=None, month=None, day=None):
     
     context = {
         'user': user,
-        'events': events.order_by('start_time'),
+        'events': events,
         'view_date': view_date,
         'prev_day': prev_day,
         'next_day': next_day,
@@ -368,50 +269,12 @@ def take_attendance(request, event_id):
     students = event.students.all()
     
     if request.method == 'POST':
-        for student in students:
-            attended = request.POST.get(f'attended_{student.id}') == 'on'
-            check_in = request.POST.get(f'check_in_{student.id}')
-            check_out = request.POST.get(f'check_out_{student.id}')
-            remarks = request.POST.get(f'remarks_{student.id}', '')
-            
-            # Parse datetime strings
-            check_in_time = None
-            check_out_time = None
-            
-            if check_in:
-                try:
-                    check_in_time = datetime.strptime(check_in, '%Y-%m-%dT%H:%M')
-                except ValueError:
-                    pass
-            
-            if check_out:
-                try:
-                    check_out_time = datetime.strptime(check_out, '%Y-%m-%dT%H:%M')
-                except ValueError:
-                    pass
-            
-            # Update or create attendance record
-            attendance, created = Attendance.objects.update_or_create(
-                event=event,
-                student=student,
-                defaults={
-                    'attended': attended,
-                    'check_in_time': check_in_time,
-                    'check_out_time': check_out_time,
-                    'remarks': remarks,
-                }
-            )
-        
+        # One read and at most one bulk insert + one bulk update (attendance.py)
+        save_attendance(event, entries_from_post(students, request.POST))
         return redirect('event_detail', event_id=event_id)
     
     # Get existing attendance records
-    attendance_records = {}
-    for student in students:
-        try:
-            record = Attendance.objects.get(event=event, student=student)
-            attendance_records[student.id] = record
-        except Attendance.DoesNotExist:
-            attendance_records[student.id] = None
+    attendance_records = records_by_student(event)
     
     context = {
         'event': event,
@@ -422,6 +285,26 @@ def take_attendance(request, event_id):
     
     return render(request, 'calendar_app/take_attendance.html', context)
 
+@login_required
+def schedule_conflicts(request):
+    """Trainer and room double bookings in a date range"""
+    if request.user.role not in ['manager', 'admin', 'superadmin']:
+        return redirect('calendar')
+    
+    start, end = conflicts.report_range(request.GET)
+    rows = conflicts.report_rows(conflicts.report(start, end))
+    page_obj = Paginator(rows, reports.PAGE_SIZE).get_page(request.GET.get('page'))
+    
+    context = {
+        'conflicts': page_obj,
+        'page_obj': page_obj,
+        'total_conflicts': len(rows),
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+    }
+    
+    return render(request, 'calendar_app/schedule_conflicts.html', context)
+
 @login_required
 def attendance_report(request):
     """Attendance report for managers and admins"""
@@ -431,47 +314,42 @@ def attendance_report(request):
         return redirect('calendar')
     
     # Filter parameters
-    event_type = request.GET.get('event_type', 'class')
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
+    filters = reports.report_filters(request.GET)
+    events = reports.report_events(**filters)
     
-    events = CalendarEvent.objects.filter(event_type='class', is_active=True)
-    
-    if start_date:
-        try:
-            events = events.filter(start_date__gte=start_date)
-        except ValueError:
-            pass
-    
-    if end_date:
-        try:
-            events = events.filter(start_date__lte=end_date)
-        except ValueError:
-            pass
-    
-    # Calculate attendance statistics
-    total_events = events.count()
-    attendance_data = []
-    
-    for event in events:
-        total_students = event.students.count()
-        attended = Attendance.objects.filter(event=event, attended=True).count()
-        percentage = (attended / total_students * 100) if total_students > 0 else 0
-        
-        attendance_data.append({
-            'event': event,
-            'total_students': total_students,
-            'attended': attended,
-            'percentage': round(percentage, 1),
-        })
+    # One query for the page (counts are annotations) and one for the totals
+    page_obj = Paginator(events, reports.PAGE_SIZE).get_page(request.GET.get('page'))
+    totals = reports.report_totals(events)
     
     context = {
-        'attendance_data': attendance_data,
-        'total_events': total_events,
-        'event_type': event_type,
-        'start_date': start_date,
-        'end_date': end_date,
+        'attendance_data': reports.report_rows(page_obj),
+        'page_obj': page_obj,
+        'total_events': totals['total_events'],
+        'total_students': totals['total_students'],
+        'total_present': totals['total_present'],
+        'total_absent': totals['total_absent'],
+        'overall_percentage': totals['overall_percentage'],
+        'event_type': filters['event_type'],
+        'start_date': filters['start_date'].isoformat() if filters['start_date'] else '',
+        'end_date': filters['end_date'].isoformat() if filters['end_date'] else '',
         'today': date.today().isoformat(),
     }
     
-    return render(request, 'calendar_app/attendance_report.html', context)
\ No newline at end of file
+    return render(request, 'calendar_app/attendance_report.html', context)
+
+
+@login_required
+def attendance_report_export(request):
+    """Attendance report as CSV (default) or JSON Lines, streamed"""
+    if request.user.role not in ['manager', 'admin', 'superadmin']:
+        return redirect('calendar')
+    
+    events = reports.report_events(**reports.report_filters(request.GET))
+    if request.GET.get('format') == 'jsonl':
+        response = StreamingHttpResponse(reports.stream_jsonl(events), content_type='application/x-ndjson')
+        extension = 'jsonl'
+    else:
+        response = StreamingHttpResponse(reports.stream_csv(events), content_type='text/csv')
+        extension = 'csv'
+    response['Content-Disposition'] = f'attachment; filename="attendance_report_{date.today().isoformat()}.{extension}"'
+    return response
\ No newline at end of file
@@ -0,0 +1,228 @@
+# classroom/agenda.py
+"""
+Materialized per-user agenda: what is next for each trainer and student.
+
+AgendaEntry holds one row per user per upcoming item:
+
+    session   an incomplete ClassroomSession, for the classroom's trainer and
+              its students (dropped and completed enrollments left out)
+    event     an occurrence of an active CalendarEvent, for its trainers and
+              students, through HORIZON_DAYS ahead. Mirror events made by
+              scheduling.py are skipped; their session is already there.
+
+Nothing dated before today is written, so the table stays the size of what
+is still ahead. upcoming() and current_session() read it with one range scan
+on (user, start) instead of joining through enrollments and participants.
+
+The signals in signals.py rewrite the entries of each session, event or
+enrollment as it changes, inside the same transaction. Bulk writers
+(scheduling.py, enrollment.py) call sync_classrooms() themselves. migrate
+fills the table when it is empty (signals.fill_agenda_after_migrate).
+`manage.py rebuild_agenda` rebuilds everything and drops past entries; run
+it daily so recurring events roll forward past the horizon.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from calendar_app.models import CalendarEvent
+from calendar_app.recurrence import occurrences_between, window_q
+from .models import AgendaEntry, ClassroomEnrollment, ClassroomSession
+
+DEFAULT_AGENDA = {
+    'HORIZON_DAYS': 90,
+}
+
+BATCH_SIZE = 500
+INACTIVE_ENROLLMENTS = ('dropped', 'completed')
+EVENT_VALUES = ('title', 'end_time', 'all_day')
+# Entries are written as plain tuples of these columns (see insert())
+COLUMNS = ('user_id', 'start', 'end', 'source_type', 'source_id', 'classroom_id', 'title')
+
+
+def agenda_settings():
+    return {**DEFAULT_AGENDA, **getattr(settings, 'AGENDA', {})}
+
+
+def at(day, clock):
+    return timezone.make_aware(datetime.combine(day, clock))
+
+
+def database():
+    # The connection itself, not the django.db.connection proxy: a lookup per value adds up
+    return connections[router.db_for_write(AgendaEntry)]
+
+
+def insert(entries):
+    """
+    INSERT ``entries`` (tuples of COLUMNS, datetimes already adapted) with
+    one executemany(). bulk_create() would build and prepare a model
+    instance per user per item, which at tens of thousands of rows costs
+    seconds.
+    """
+    if not entries:
+        return
+    connection = database()
+    quote = connection.ops.quote_name
+    meta = AgendaEntry._meta
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(meta.db_table), ', '.join(quote(meta.get_field(name).column) for name in COLUMNS),
+        ', '.join(['%s'] * len(COLUMNS)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, entries)
+
+
+def chunks(values):
+    values = list(values)
+    for index in range(0, len(values), BATCH_SIZE):
+        yield values[index:index + BATCH_SIZE]
+
+
+def session_entries(session_ids, user_ids=None):
+    """Entries for the incomplete sessions among ``session_ids`` from today on."""
+    adapt = database().ops.adapt_datetimefield_value
+    entries = []
+    for ids in chunks(session_ids):
+        rows = list(ClassroomSession.objects.filter(
+            pk__in=ids, is_completed=False, scheduled_date__gte=timezone.localdate(),
+        ).values_list(
+            'pk', 'classroom_id', 'scheduled_date', 'scheduled_time', 'duration_minutes',
+            'classroom__classroom_name', 'classroom__trainer_id', 'session__session_number',
+        ))
+        people = {}
+        for classroom_id, student_id in ClassroomEnrollment.objects.filter(
+            classroom_id__in={row[1] for row in rows},
+        ).exclude(status__in=INACTIVE_ENROLLMENTS).values_list('classroom_id', 'student_id'):
+            people.setdefault(classroom_id, []).append(student_id)
+        for pk, classroom_id, day, clock, duration, name, trainer_id, number in rows:
+            start = at(day, clock)
+            start, end = adapt(start), adapt(start + timedelta(minutes=duration))
+            title = f'{name}: Session {number}'
+            entries.extend(
+                (user_id, start, end, 'session', pk, classroom_id, title)
+                for user_id in [trainer_id, *people.get(classroom_id, [])]
+                if user_id is not None and (user_ids is None or user_id in user_ids)
+            )
+    return entries
+
+
+def event_entries(event_ids, user_ids=None):
+    """Entries for occurrences of the events among ``event_ids`` from today through the horizon."""
+    adapt = database().ops.adapt_datetimefield_value
+    today = timezone.localdate()
+    until = today + timedelta(days=agenda_settings()['HORIZON_DAYS'])
+    entries = []
+    for ids in chunks(event_ids):
+        events = CalendarEvent.objects.filter(pk__in=ids, is_active=True, classroom_session__isnull=True)
+        people = {}
+        for through, field in ((CalendarEvent.trainers.through, 'customuser_id'),
+                               (CalendarEvent.students.through, 'customuser_id')):
+            for event_id, user_id in through.objects.filter(
+                calendarevent_id__in=events.values('pk'),
+            ).values_list('calendarevent_id', field):
+                people.setdefault(event_id, set()).add(user_id)
+        if not people:
+            continue
+        for event, first, last in occurrences_between(events.filter(pk__in=people), today, until, values=EVENT_VALUES):
+            if event.all_day or event.start_time is None:
+                start, end = at(first, time.min), at(last + timedelta(days=1), time.min)
+            else:
+                start = at(first, event.start_time)
+                end = at(last, event.end_time) if event.end_time else at(last + timedelta(days=1), time.min)
+            start, end = adapt(start), adapt(max(start, end))
+            entries.extend(
+                (user_id, start, end, 'event', event.id, None, event.title)
+                for user_id in people[event.id] if user_ids is None or user_id in user_ids
+            )
+    return entries
+
+
+def remove(source_type, source_ids, user_ids=None):
+    for ids in chunks(source_ids):
+        entries = AgendaEntry.objects.filter(source_type=source_type, source_id__in=ids)
+        if user_ids is not None:
+            entries = entries.filter(user_id__in=user_ids)
+        entries.delete()
+
+
+def sync(source_type, source_ids, user_ids=None):
+    """Rewrite the entries of ``source_ids`` (only ``user_ids``' when given)."""
+    source_ids = list(source_ids)
+    if not source_ids or (user_ids is not None and not user_ids):
+        return 0
+    build = session_entries if source_type == 'session' else event_entries
+    with transaction.atomic():
+        remove(source_type, source_ids, user_ids)
+        entries = build(source_ids, user_ids)
+        insert(entries)
+    return len(entries)
+
+
+def sync_sessions(session_ids, user_ids=None):
+    return sync('session', session_ids, user_ids)
+
+
+def sync_events(event_ids, user_ids=None):
+    return sync('event', event_ids, user_ids)
+
+
+def sync_classrooms(classroom_ids, user_ids=None):
+    """Rewrite the session entries of whole classrooms, e.g. after a bulk write."""
+    session_ids = ClassroomSession.objects.filter(classroom_id__in=list(classroom_ids)).values_list('pk', flat=True)
+    return sync_sessions(session_ids, user_ids)
+
+
+def sync_student(student_id):
+    """Rewrite a student's session entries from their enrollments, e.g. after one changes."""
+    classroom_ids = ClassroomEnrollment.objects.filter(student_id=student_id).values_list('classroom_id', flat=True)
+    session_ids = ClassroomSession.objects.filter(classroom_id__in=classroom_ids).values_list('pk', flat=True)
+    with transaction.atomic():
+        AgendaEntry.objects.filter(user_id=student_id, source_type='session').delete()
+        entries = session_entries(session_ids, {student_id})
+        insert(entries)
+    return len(entries)
+
+
+def rebuild():
+    """Rewrite the whole table. Returns {source type: entries written}."""
+    today = timezone.localdate()
+    until = today + timedelta(days=agenda_settings()['HORIZON_DAYS'])
+    with transaction.atomic():
+        AgendaEntry.objects.all().delete()
+        counts = {}
+        for source_type, build, ids in (
+            ('session', session_entries, ClassroomSession.objects.filter(
+                is_completed=False, scheduled_date__gte=today,
+            ).values_list('pk', flat=True)),
+            ('event', event_entries, CalendarEvent.objects.filter(window_q(today, until), is_active=True)
+             .values_list('pk', flat=True)),
+        ):
+            entries = build(ids)
+            insert(entries)
+            counts[source_type] = len(entries)
+    return counts
+
+
+def upcoming(user, limit=5, source_type=None, days=None):
+    """The user's next ``limit`` entries starting from now (within ``days`` when given)."""
+    now = timezone.now()
+    entries = AgendaEntry.objects.filter(user=user, start__gte=now)
+    if days is not None:
+        entries = entries.filter(start__lt=now + timedelta(days=days))
+    if source_type:
+        entries = entries.filter(source_type=source_type)
+    return entries.order_by('start')[:limit]
+
+
+def current_session(user, classroom):
+    """The user's session in ``classroom`` that started today and is not completed, if any."""
+    entry = AgendaEntry.objects.filter(
+        user=user, start__range=(at(timezone.localdate(), time.min), timezone.now()),
+        source_type='session', classroom=classroom,
+    ).order_by('start').first()
+    if entry is None:
+        return None
+    return ClassroomSession.objects.filter(pk=entry.source_id).first()
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ClassroomConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'classroom'
+    
+    def ready(self):
+        from . import signals
+        
+        post_migrate.connect(signals.fill_agenda_after_migrate, sender=self)
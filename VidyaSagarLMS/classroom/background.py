@@ -0,0 +1,28 @@
+# classroom/background.py
+import asyncio
+import logging
+
+from channels.db import database_sync_to_async
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+async def _run_periodically(interval, func):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await database_sync_to_async(func)()
+        except Exception:
+            # The loop outlives one bad tick; presence re-marks its rows
+            # dirty and the chat journal requeues, so the next tick retries
+            logger.exception('Periodic task %s failed', getattr(func, '__qualname__', func))
+
+
+def start_periodic(name, interval, func):
+    """Run a sync, DB-touching ``func`` every ``interval`` seconds, once per event loop."""
+    loop = asyncio.get_running_loop()
+    task = _tasks.get((loop, name))
+    if task is None or task.done():
+        _tasks[(loop, name)] = loop.create_task(_run_periodically(interval, func))
@@ -0,0 +1,196 @@
+# classroom/chat_journal.py
+"""
+Write-behind journal for classroom chat.
+
+The socket consumer appends each message here, which stamps it with the
+meeting's next sequence number under the journal lock, and then broadcasts
+it with that number. Pending messages are saved in append order with
+bulk_create when a batch fills up, on a short timer, when a socket
+disconnects and when the meeting ends. The sequence is stored with the row,
+so stored messages keep the order they were sent in (by sequence, and by
+id within a worker).
+
+A flush that fails on a transient database error ("database is locked")
+puts the unsaved messages back at the head of the queue for the next tick.
+Only a row the database rejects outright (e.g. its user was deleted) is
+dropped, and it is logged.
+
+ChatMessage.timestamp is auto_now_add, so stored timestamps are the flush
+time (at most FLUSH_INTERVAL late).
+
+Chat long-polls (views.wait_chat_messages) wait on watch() instead of
+querying on a timer: every commit of new messages, from a flush here or a
+ChatMessage save (signals.py), calls notify() for the room, which wakes the
+waiters registered in this process.
+"""
+import asyncio
+import itertools
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Max
+
+from .background import start_periodic
+from .models import ChatMessage
+
+DEFAULT_CHAT_JOURNAL = {
+    'WRITE_BEHIND': True,
+    'BATCH_SIZE': 50,
+    'FLUSH_INTERVAL': 0.5,
+}
+
+
+def journal_settings():
+    return {**DEFAULT_CHAT_JOURNAL, **getattr(settings, 'CLASSROOM_CHAT_JOURNAL', {})}
+
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = []
+_sequences = {}
+# virtual_classroom_id -> {(event loop, asyncio.Event)} of waiting long-polls
+_waiters = {}
+
+
+def seed_sequence(meeting_id, virtual_classroom_id):
+    """Start a meeting's sequence after its stored messages; no-op once seeded."""
+    key = str(meeting_id)
+    with _lock:
+        if key in _sequences:
+            return
+    start = ChatMessage.objects.filter(
+        virtual_classroom_id=virtual_classroom_id
+    ).aggregate(last=Max('sequence'))['last'] or 0
+    with _lock:
+        _sequences.setdefault(key, itertools.count(start + 1))
+
+
+def _next(key):
+    return next(_sequences.setdefault(key, itertools.count(1)))
+
+
+def next_sequence(meeting_id):
+    with _lock:
+        return _next(str(meeting_id))
+
+
+def append(meeting_id, virtual_classroom_id, user_id, message):
+    """
+    Queue a message under the meeting's next sequence number. Returns
+    (sequence, True once a full batch is waiting).
+    """
+    key = str(meeting_id)
+    with _lock:
+        sequence = _next(key)
+        _pending.append((key, ChatMessage(
+            virtual_classroom_id=virtual_classroom_id,
+            user_id=user_id,
+            message=message,
+            sequence=sequence
+        )))
+        return sequence, len(_pending) >= journal_settings()['BATCH_SIZE']
+
+
+def pending_count(meeting_id=None):
+    with _lock:
+        if meeting_id is None:
+            return len(_pending)
+        return sum(1 for key, _ in _pending if key == str(meeting_id))
+
+
+def _requeue(items):
+    # Back at the head: they are older than anything appended meanwhile
+    global _pending
+    with _lock:
+        _pending = items + _pending
+
+
+def flush(meeting_id=None):
+    """
+    Save pending messages (all, or one meeting's) with a single bulk_create.
+    Returns the number saved; unsaved messages stay queued after a
+    transient error.
+    """
+    global _pending
+    with _lock:
+        if meeting_id is None:
+            batch, _pending = _pending, []
+        else:
+            key = str(meeting_id)
+            batch = [item for item in _pending if item[0] == key]
+            _pending = [item for item in _pending if item[0] != key]
+    if not batch:
+        return 0
+    try:
+        with transaction.atomic():
+            ChatMessage.objects.bulk_create([msg for _, msg in batch])
+        # bulk_create sends no post_save; the row-by-row path below does
+        rooms = {msg.virtual_classroom_id for _, msg in batch}
+        transaction.on_commit(lambda: notify(*rooms))
+        return len(batch)
+    except IntegrityError:
+        # A row the database rejects: save the rest one at a time, in order
+        pass
+    except DatabaseError:
+        logger.warning('Chat flush failed; %d messages stay queued', len(batch), exc_info=True)
+        _requeue(batch)
+        return 0
+    saved = 0
+    for index, (_, msg) in enumerate(batch):
+        try:
+            with transaction.atomic():
+                msg.save()
+            saved += 1
+        except IntegrityError:
+            logger.exception('Dropping chat message %r that the database rejected', msg.message[:50])
+        except DatabaseError:
+            logger.warning('Chat flush failed; %d messages stay queued', len(batch) - index, exc_info=True)
+            _requeue(batch[index:])
+            break
+    return saved
+
+
+def end_meeting(meeting_id):
+    flush(meeting_id)
+    with _lock:
+        _sequences.pop(str(meeting_id), None)
+
+
+@contextmanager
+def watch(virtual_classroom_id):
+    """
+    Register the running event loop for the room's next notify(). Yields an
+    asyncio.Event that is set when messages are committed; clear it before
+    each check of the database so no wake-up is lost in between.
+    """
+    waiter = (asyncio.get_running_loop(), asyncio.Event())
+    with _lock:
+        _waiters.setdefault(virtual_classroom_id, set()).add(waiter)
+    try:
+        yield waiter[1]
+    finally:
+        with _lock:
+            room = _waiters.get(virtual_classroom_id)
+            room.discard(waiter)
+            if not room:
+                del _waiters[virtual_classroom_id]
+
+
+def notify(*virtual_classroom_ids):
+    """Wake this process's long-polls on the rooms; callable from any thread."""
+    with _lock:
+        waiters = [waiter for room in virtual_classroom_ids for waiter in _waiters.get(room, ())]
+    for loop, event in waiters:
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            # Its loop has closed; the waiter goes with it
+            pass
+
+
+def start_flusher():
+    start_periodic('chat_journal', journal_settings()['FLUSH_INTERVAL'], flush)
@@ -1,43 +1,95 @@
 # classroom/consumers.py
-import json
+import asyncio
+import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
-from .models import VirtualClassroom, ClassroomParticipant, ChatMessage
+from django.core.exceptions import ValidationError
+from .models import VirtualClassroom, ClassroomParticipant, ChatMessage, Whiteboard
+from . import chat_journal, fanout, presence, wire, whiteboard as whiteboard_log
 
 CustomUser = get_user_model()
+logger = logging.getLogger(__name__)
 
 class ClassroomConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.meeting_id = self.scope['url_route']['kwargs']['meeting_id']
         self.room_group_name = f'classroom_{self.meeting_id}'
         
+        # Resolve the meeting once; handlers read it from connection state
+        self.meeting = await self.load_meeting_state()
+        if self.meeting is None:
+            await self.close()
+            return
+        
         # Join room group
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
         
-        await self.accept()
+        # Roster changes and chat are flushed to the database in the background
+        presence.start_flusher()
+        chat_journal.start_flusher()
+        
+        # Inbound rate limit for this connection
+        self.inbound = fanout.inbound_bucket()
+        fanout.room_joined(self.meeting_id)
+        
+        # Early flushes started by a full chat batch, awaited on disconnect
+        self.flush_tasks = set()
+        
+        # JSON text unless the client asks for binary frames
+        self.encoding, subprotocol = wire.negotiate(self.scope.get('subprotocols'))
+        await self.accept(subprotocol=subprotocol)
     
     async def disconnect(self, close_code):
+        if getattr(self, 'meeting', None) is None:
+            return
+        
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
         
+        # The last socket out drops the room's scheduler
+        fanout.room_left(self.meeting_id)
+        
         # Update participant status
         await self.update_participant_status(False)
+        
+        # Let early flushes finish (their failures are logged by
+        # flush_done), then don't leave this socket's chat waiting for
+        # the next timer tick
+        if self.flush_tasks:
+            await asyncio.gather(*self.flush_tasks, return_exceptions=True)
+        await database_sync_to_async(chat_journal.flush)(self.meeting_id)
+    
+    def flush_done(self, task):
+        self.flush_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error('Early chat flush failed', exc_info=task.exception())
     
-    async def receive(self, text_data):
-        data = json.loads(text_data)
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = wire.decode(text_data, bytes_data)
+        except ValueError:
+            return
+        
+        fanout.count(self.meeting_id, 'received')
+        if not self.inbound.allow():
+            fanout.count(self.meeting_id, 'dropped')
+            return
+        
         message_type = data.get('type')
         
         if message_type == 'join':
             await self.handle_join(data)
         elif message_type == 'chat_message':
             await self.handle_chat_message(data)
+        elif message_type == 'whiteboard_op':
+            await self.handle_whiteboard_op(data)
         elif message_type == 'whiteboard_update':
             await self.handle_whiteboard_update(data)
         elif message_type == 'participant_update':
@@ -53,142 +105,217 @@ class ClassroomConsumer(AsyncWebsocketConsumer):
         await self.update_participant_status(True)
         
         # Send join notification to others
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'participant_joined',
-                'user_id': user_id,
-                'username': username
-            }
-        )
+        await self.broadcast_event({
+            'type': 'participant_joined',
+            'user_id': user_id,
+            'username': username
+        })
     
     async def handle_chat_message(self, data):
-        # Save chat message
-        await self.save_chat_message(data)
+        if not self.meeting['chat_enabled']:
+            return
+        
+        if chat_journal.journal_settings()['WRITE_BEHIND']:
+            # Queued (and numbered) before the broadcast, so the stored
+            # order is the send order; persisted in batches by chat_journal
+            sequence, batch_full = chat_journal.append(
+                self.meeting_id,
+                self.meeting['virtual_classroom_id'],
+                self.chat_user_id(data),
+                data['message']
+            )
+            if batch_full:
+                task = asyncio.ensure_future(database_sync_to_async(chat_journal.flush)())
+                self.flush_tasks.add(task)
+                task.add_done_callback(self.flush_done)
+        else:
+            # Save chat message before anyone sees it
+            sequence = await self.save_chat_message(data)
+            if sequence is None:
+                return
         
         # Broadcast to all participants
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'chat_message',
-                'message': data['message'],
-                'user_id': data['user_id'],
-                'username': data['username']
-            }
-        )
+        await self.broadcast_event({
+            'type': 'chat_message',
+            'sequence': sequence,
+            'message': data['message'],
+            'user_id': data['user_id'],
+            'username': data['username']
+        })
+    
+    async def handle_whiteboard_op(self, data):
+        # One stroke/shape; only the trainer draws
+        if not self.meeting['whiteboard_enabled'] or not self.is_trainer():
+            return
+        
+        op = whiteboard_log.normalize_operation(data.get('op'))
+        if op is None:
+            return
+        
+        sequence, wants_image = await self.save_whiteboard_op(op)
+        await self.broadcast_event({
+            'type': 'whiteboard_op',
+            'sequence': sequence,
+            'op': op,
+            'user_id': self.scope['user'].id
+        })
+        
+        # The snapshot is too big to keep folding; the trainer's canvas
+        # replaces it (whiteboard.rebase_on_image)
+        if wants_image:
+            await self.send_payload({'type': 'whiteboard_image_request', 'sequence': sequence})
     
     async def handle_whiteboard_update(self, data):
-        # Broadcast whiteboard update
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'whiteboard_update',
-                'data': data['data'],
-                'user_id': data['user_id']
-            }
-        )
+        if not self.meeting['whiteboard_enabled']:
+            return
+        
+        # Only the latest canvas image per tick is broadcast
+        self.schedule_event({
+            'type': 'whiteboard_update',
+            'data': data['data'],
+            'user_id': data['user_id']
+        })
     
     async def handle_participant_update(self, data):
         # Update participant status in database
         await self.update_participant_in_db(data)
         
-        # Broadcast update
+        # Coalesced with this user's other toggles in the same tick
+        self.schedule_event({
+            'type': 'participant_update',
+            'user_id': data['user_id'],
+            **{k: v for k, v in data.items() if k not in ['type', 'user_id']}
+        })
+    
+    async def handle_screen_share(self, data):
+        if not self.meeting['screen_sharing_enabled']:
+            return
+        
+        self.schedule_event({
+            'type': 'screen_share',
+            'user_id': data['user_id'],
+            **{k: v for k, v in data.items() if k not in ['type', 'user_id']}
+        })
+    
+    async def broadcast_event(self, payload):
+        # Encoded once here rather than once per recipient
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                'type': 'participant_update',
-                'user_id': data['user_id'],
-                **{k: v for k, v in data.items() if k not in ['type', 'user_id']}
-            }
+            {'type': 'broadcast', **wire.encode_event(payload)}
         )
     
-    # Handler methods for different message types
-    async def chat_message(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'chat_message',
-            'message': event['message'],
-            'user_id': event['user_id'],
-            'username': event['username']
-        }))
+    def schedule_event(self, payload):
+        # State-type events go out through the room's scheduler (fanout.py)
+        fanout.get_scheduler(self.meeting_id, self.channel_layer, self.room_group_name).submit(payload)
     
-    async def whiteboard_update(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'whiteboard_update',
-            'data': event['data'],
-            'user_id': event['user_id']
-        }))
+    async def send_payload(self, payload):
+        if self.encoding == 'msgpack':
+            await self.send(bytes_data=wire.encode_event(payload)['msgpack'])
+        else:
+            await self.send(text_data=wire.encode_json(payload))
     
-    async def participant_update(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'participant_update',
-            **event
-        }))
+    # Handler methods for different message types
+    async def broadcast(self, event):
+        if self.encoding == 'msgpack' and 'msgpack' in event:
+            await self.send(bytes_data=event['msgpack'])
+        else:
+            await self.send(text_data=event['json'])
     
-    async def participant_joined(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'participant_joined',
-            'user_id': event['user_id'],
-            'username': event['username']
-        }))
+    async def meeting_changed(self, event):
+        # Sent by signals.py when the meeting or its classroom is saved
+        meeting = await self.load_meeting_state()
+        if meeting is None:
+            await self.close()
+            return
+        self.meeting = meeting
+        await self.send_payload({
+            'type': 'meeting_changed',
+            'status': meeting['status'],
+            'chat_enabled': meeting['chat_enabled'],
+            'whiteboard_enabled': meeting['whiteboard_enabled'],
+            'screen_sharing_enabled': meeting['screen_sharing_enabled'],
+        })
     
-    async def participant_left(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'participant_left',
-            'user_id': event['user_id']
-        }))
+    # Presence operations (in-memory roster, see presence.py)
+    async def update_participant_status(self, is_present):
+        user = self.scope.get('user')
+        if not user or not user.is_authenticated:
+            return False
+        
+        if is_present:
+            # Only the first join in a room loads the roster from the database
+            state = await database_sync_to_async(presence.join)(self.meeting_id, user, self.meeting)
+        else:
+            state = await database_sync_to_async(presence.leave)(self.meeting_id, user.id)
+        return state is not None
     
     # Database operations
     @database_sync_to_async
-    def update_participant_status(self, is_present):
+    def load_meeting_state(self):
         try:
-            user = CustomUser.objects.get(id=self.scope['user'].id)
-            virtual_classroom = VirtualClassroom.objects.get(meeting_id=self.meeting_id)
-            
-            participant, created = ClassroomParticipant.objects.get_or_create(
-                virtual_classroom=virtual_classroom,
-                user=user
+            virtual_classroom = VirtualClassroom.objects.select_related('classroom').get(
+                meeting_id=self.meeting_id
             )
-            
-            participant.is_present = is_present
-            participant.save()
-            return True
-        except:
-            return False
+        except (VirtualClassroom.DoesNotExist, ValidationError):
+            return None
+        
+        user = self.scope.get('user')
+        participant = None
+        if user and user.is_authenticated:
+            participant = ClassroomParticipant.objects.filter(
+                virtual_classroom=virtual_classroom,
+                user_id=user.id
+            ).values('id', 'role').first()
+        
+        chat_journal.seed_sequence(self.meeting_id, virtual_classroom.pk)
+        
+        return {
+            'virtual_classroom_id': virtual_classroom.pk,
+            'classroom_id': virtual_classroom.classroom_id,
+            'trainer_id': virtual_classroom.classroom.trainer_id,
+            'status': virtual_classroom.status,
+            'participant_id': participant['id'] if participant else None,
+            'participant_role': participant['role'] if participant else None,
+            'chat_enabled': virtual_classroom.chat_enabled,
+            'whiteboard_enabled': virtual_classroom.whiteboard_enabled,
+            'screen_sharing_enabled': virtual_classroom.screen_sharing_enabled,
+        }
+    
+    def is_trainer(self):
+        user = self.scope.get('user')
+        return bool(user and user.is_authenticated and user.id == self.meeting['trainer_id'])
+    
+    def chat_user_id(self, data):
+        user = self.scope.get('user')
+        return user.id if user and user.is_authenticated else data['user_id']
     
     @database_sync_to_async
     def save_chat_message(self, data):
+        # Single INSERT: the meeting and user ids come from connection state.
+        # Numbered here, in the one sync thread, so sequence and id agree.
         try:
-            user = CustomUser.objects.get(id=data['user_id'])
-            virtual_classroom = VirtualClassroom.objects.get(meeting_id=self.meeting_id)
-            
-            ChatMessage.objects.create(
-                virtual_classroom=virtual_classroom,
-                user=user,
-                message=data['message']
-            )
-            return True
+            return ChatMessage.objects.create(
+                virtual_classroom_id=self.meeting['virtual_classroom_id'],
+                user_id=self.chat_user_id(data),
+                message=data['message'],
+                sequence=chat_journal.next_sequence(self.meeting_id)
+            ).sequence
         except:
-            return False
+            return None
     
     @database_sync_to_async
-    def update_participant_in_db(self, data):
-        try:
-            user = CustomUser.objects.get(id=data['user_id'])
-            virtual_classroom = VirtualClassroom.objects.get(meeting_id=self.meeting_id)
-            
-            participant = ClassroomParticipant.objects.get(
-                virtual_classroom=virtual_classroom,
-                user=user
+    def save_whiteboard_op(self, op):
+        if self.meeting.get('whiteboard_id') is None:
+            whiteboard, _ = Whiteboard.objects.get_or_create(
+                virtual_classroom_id=self.meeting['virtual_classroom_id']
             )
-            
-            if 'raise_hand' in data:
-                participant.raise_hand = data['raise_hand']
-            if 'is_muted' in data:
-                participant.is_muted = data['is_muted']
-            if 'video_enabled' in data:
-                participant.video_enabled = data['video_enabled']
-            
-            participant.save()
-            return True
-        except:
-            return False
\ No newline at end of file
+            self.meeting['whiteboard_id'] = whiteboard.pk
+        return whiteboard_log.append_operation(self.meeting['whiteboard_id'], self.scope['user'].id, op)
+    
+    async def update_participant_in_db(self, data):
+        # Kept in memory; the presence flusher writes it back in batches
+        user = self.scope.get('user')
+        if not user or not user.is_authenticated:
+            return False
+        state = await database_sync_to_async(presence.update)(self.meeting_id, user.id, data)
+        return state is not None
@@ -0,0 +1,79 @@
+# classroom/counters.py
+"""
+Denormalized counters for classroom lists and seat checks.
+
+Classroom.enrolled_count and Classroom.session_count move by one with each
+enrollment or session saved or deleted (F() updates, so concurrent writers
+never lose an increment). Batch.student_count is distinct students across
+the batch's classrooms, which a delta cannot express, so it is recounted
+with one UPDATE ... SET = (subquery) whenever an enrollment changes.
+
+The signal handlers run in the transaction of the row that changed
+(ClassroomEnrollment/ClassroomSession.save() and Collector.delete() are
+atomic). Writes that skip signals (bulk_create, queryset.update(), raw SQL),
+and the rare batch recount that races a concurrent enrollment in the same
+batch, are corrected by `manage.py reconcile_counters`.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Batch, Classroom, ClassroomEnrollment, ClassroomSession
+
+
+def _count(queryset, group_field, field='pk', distinct=False):
+    """COUNT of a queryset correlated on ``group_field=OuterRef('pk')``, 0 when empty."""
+    counted = queryset.order_by().values(group_field).annotate(n=Count(field, distinct=distinct)).values('n')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def enrolled_subquery():
+    return _count(ClassroomEnrollment.objects.filter(classroom=OuterRef('pk')), 'classroom')
+
+
+def sessions_subquery():
+    return _count(ClassroomSession.objects.filter(classroom=OuterRef('pk')), 'classroom')
+
+
+def batch_students_subquery():
+    return _count(
+        ClassroomEnrollment.objects.filter(classroom__batch=OuterRef('pk')), 'classroom__batch', 'student', distinct=True
+    )
+
+
+def bump(classroom_id, field, delta):
+    return Classroom.objects.filter(pk=classroom_id).update(**{field: F(field) + delta})
+
+
+def recount_batches(batches):
+    """Recount student_count for a Batch queryset in one UPDATE."""
+    return batches.update(student_count=batch_students_subquery())
+
+
+def recount_batch_of(classroom_ids):
+    return recount_batches(Batch.objects.filter(classrooms__in=classroom_ids))
+
+
+def enrollment_changed(classroom_id, delta):
+    bump(classroom_id, 'enrolled_count', delta)
+    recount_batch_of([classroom_id])
+
+
+def session_changed(classroom_id, delta):
+    bump(classroom_id, 'session_count', delta)
+
+
+def recount_classrooms(classrooms):
+    """Recount enrolled_count and session_count for a Classroom queryset in one UPDATE."""
+    return classrooms.update(enrolled_count=enrolled_subquery(), session_count=sessions_subquery())
+
+
+def drifted_classrooms(classrooms=None):
+    classrooms = Classroom.objects.all() if classrooms is None else classrooms
+    return classrooms.alias(
+        actual_enrolled=enrolled_subquery(), actual_sessions=sessions_subquery(),
+    ).filter(~Q(enrolled_count=F('actual_enrolled')) | ~Q(session_count=F('actual_sessions')))
+
+
+def drifted_batches(batches=None):
+    batches = Batch.objects.all() if batches is None else batches
+    return batches.alias(actual_students=batch_students_subquery()).exclude(student_count=F('actual_students'))
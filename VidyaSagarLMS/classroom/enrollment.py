@@ -0,0 +1,193 @@
+# classroom/enrollment.py
+"""
+Enrollment with atomic seat reservation.
+
+A seat is taken by one conditional UPDATE on Classroom.enrolled_count
+(``... WHERE enrolled_count + n <= max_students``) before the enrollment row
+is written, in the same transaction. The database serializes those UPDATEs
+on the classroom row, so two managers enrolling at once can never overbook:
+the loser's UPDATE matches no row and it gets ClassroomFull. The UPDATE is
+the transaction's first statement, which on SQLite takes the write lock up
+front instead of failing on a read-to-write upgrade.
+
+bulk_enroll does the same for a whole list (or CSV) of students: one
+reservation, one bulk_create, and one batch recount, all in one transaction.
+It also refreshes the new students' agendas and the affected dashboard
+fragments, which bulk_create's missing signals would otherwise leave stale.
+"""
+import csv
+import io
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from dashboard import fragments
+from . import agenda, counters, rollups
+from .models import Classroom, ClassroomEnrollment
+
+CustomUser = get_user_model()
+
+BATCH_SIZE = 500
+
+# CSV columns that identify a student, in the order they are tried
+CSV_COLUMNS = ('id', 'username', 'email')
+
+
+class EnrollmentError(Exception):
+    pass
+
+
+class ClassroomFull(EnrollmentError):
+    def __init__(self, classroom, requested, available):
+        self.requested = requested
+        self.available = available
+        super().__init__(
+            f'{classroom} has {available} free seat{"s" if available != 1 else ""}, '
+            f'{requested} requested.'
+        )
+
+
+class AlreadyEnrolled(EnrollmentError):
+    pass
+
+
+def reserve_seats(classroom, count):
+    """Take ``count`` seats if that many are free. Returns whether it did."""
+    if count <= 0:
+        return True
+    return bool(Classroom.objects.filter(
+        pk=classroom.pk, enrolled_count__lte=F('max_students') - count,
+    ).update(enrolled_count=F('enrolled_count') + count))
+
+
+def free_seats(classroom):
+    row = Classroom.objects.filter(pk=classroom.pk).values('max_students', 'enrolled_count').get()
+    return max(row['max_students'] - row['enrolled_count'], 0)
+
+
+def enroll_student(classroom, student, **fields):
+    """
+    Enroll one student, taking a seat atomically. ``fields`` are extra
+    ClassroomEnrollment values (status, grade, comments).
+    """
+    with transaction.atomic():
+        if not reserve_seats(classroom, 1):
+            raise ClassroomFull(classroom, 1, free_seats(classroom))
+        enrollment = ClassroomEnrollment(classroom=classroom, student=student, **fields)
+        # The seat is already counted; signals only recount the batch
+        enrollment._seat_reserved = True
+        try:
+            with transaction.atomic():
+                enrollment.save()
+        except IntegrityError:
+            raise AlreadyEnrolled(f'{student} is already enrolled in {classroom}.')
+    return enrollment
+
+
+def resolve_students(identifiers):
+    """
+    Map student ids, usernames or emails to users. Returns
+    ``(students, unknown)``; one query per kind of identifier present.
+    """
+    identifiers = [str(value).strip() for value in identifiers if str(value).strip()]
+    ids = [value for value in identifiers if value.isdigit()]
+    emails = [value for value in identifiers if '@' in value]
+    usernames = [value for value in identifiers if value not in ids and value not in emails]
+
+    students = CustomUser.objects.filter(role='student')
+    found = {}
+    if ids:
+        found.update({str(user.pk): user for user in students.filter(pk__in=ids)})
+    if usernames:
+        found.update({user.username: user for user in students.filter(username__in=usernames)})
+    if emails:
+        found.update({user.email: user for user in students.filter(email__in=emails)})
+
+    resolved = {}
+    unknown = []
+    for value in identifiers:
+        user = found.get(value)
+        if user is None:
+            unknown.append(value)
+        else:
+            resolved.setdefault(user.pk, user)
+    return list(resolved.values()), unknown
+
+
+def identifiers_from_csv(file):
+    """
+    Student identifiers from an uploaded CSV: the first of the id/username/
+    email columns present, or the first column when there is no header.
+    Raises EnrollmentError when the file is not UTF-8 text CSV.
+    """
+    content = file.read()
+    try:
+        if isinstance(content, bytes):
+            content = content.decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(content)))
+    except (UnicodeDecodeError, csv.Error):
+        raise EnrollmentError('The CSV file could not be read; save it as UTF-8 CSV and try again.')
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    for column in CSV_COLUMNS:
+        if column in header:
+            index = header.index(column)
+            return [row[index] for row in rows[1:] if len(row) > index]
+    return [row[0] for row in rows if row]
+
+
+def bulk_enroll(classroom, students, partial=False, **fields):
+    """
+    Enroll many students in one transaction. Students already in the
+    classroom are skipped. When there are not enough seats, raises
+    ClassroomFull, or with ``partial`` enrolls as many as fit, in the order
+    given.
+
+    Returns ``{'enrolled': [...], 'already_enrolled': [...], 'over_capacity': [...]}``
+    (lists of users).
+    """
+    students = list({student.pk: student for student in students}.values())
+    enrolled_ids = set(ClassroomEnrollment.objects.filter(
+        classroom=classroom, student__in=students,
+    ).values_list('student_id', flat=True))
+    result = {
+        'enrolled': [],
+        'already_enrolled': [student for student in students if student.pk in enrolled_ids],
+        'over_capacity': [],
+    }
+    candidates = [student for student in students if student.pk not in enrolled_ids]
+    if not candidates:
+        return result
+
+    with transaction.atomic():
+        take = len(candidates)
+        while not reserve_seats(classroom, take):
+            available = free_seats(classroom)
+            if not partial:
+                raise ClassroomFull(classroom, len(candidates), available)
+            take = min(take, available)
+        result['enrolled'] = candidates[:take]
+        result['over_capacity'] = candidates[take:]
+        if not take:
+            return result
+
+        enrollments = [
+            ClassroomEnrollment(classroom=classroom, student=student, **fields)
+            for student in result['enrolled']
+        ]
+        rollups.seed_enrollments(classroom.pk, enrollments)
+        try:
+            with transaction.atomic():
+                ClassroomEnrollment.objects.bulk_create(enrollments, batch_size=BATCH_SIZE)
+        except IntegrityError:
+            # Someone enrolled one of these students since the check above
+            raise AlreadyEnrolled(f'Some of these students were enrolled in {classroom} concurrently; retry.')
+        counters.recount_batch_of([classroom.pk])
+        # bulk_create sends no signals; refresh the agendas and dashboards here
+        agenda.sync_classrooms([classroom.pk], {student.pk for student in result['enrolled']})
+        fragments.touch_on_commit(fragments.classroom_scopes(
+            classroom.trainer_id, [student.pk for student in result['enrolled']],
+        ))
+    return result
@@ -0,0 +1,160 @@
+# classroom/fanout.py
+"""
+Outbound scheduling and inbound rate limiting for classroom sockets.
+
+State-type events (mute/hand/video toggles, screen-share state, full
+whiteboard images) only matter in their latest form. Instead of
+broadcasting each one, the consumer hands it to the room's scheduler: the
+first event in a quiet room goes out at once, and anything arriving during
+the following TICK is coalesced per user (fields merged, latest wins) and
+sent together at the end of it. Fan-out is then bounded by
+room size x tick rate, not by how fast clients send.
+
+Every connection also gets a token bucket for inbound messages; messages
+over the limit are dropped. Per-meeting counters are available from stats().
+"""
+import asyncio
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from . import wire
+
+DEFAULT_FANOUT = {
+    'TICK': 0.075,
+    'RATE': 20,
+    'BURST': 40,
+}
+
+# Events where only the latest state per user matters
+COALESCED_TYPES = {'participant_update', 'screen_share', 'whiteboard_update'}
+# Of those, events carrying a whole value replace the pending one instead of merging
+REPLACED_TYPES = {'whiteboard_update'}
+
+
+def fanout_settings():
+    return {**DEFAULT_FANOUT, **getattr(settings, 'CLASSROOM_FANOUT', {})}
+
+
+class TokenBucket:
+    """Allow ``rate`` events per second on average, with bursts up to ``burst``."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def allow(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+def inbound_bucket():
+    config = fanout_settings()
+    return TokenBucket(config['RATE'], config['BURST'])
+
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def count(meeting_id, name, amount=1):
+    with _stats_lock:
+        _stats.setdefault(str(meeting_id), Counter())[name] += amount
+
+
+def stats(meeting_id=None):
+    """Counters (received, dropped, coalesced, broadcast) for one meeting or all of them."""
+    with _stats_lock:
+        if meeting_id is not None:
+            return dict(_stats.get(str(meeting_id), {}))
+        return {key: dict(counter) for key, counter in _stats.items()}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class RoomScheduler:
+    def __init__(self, meeting_id, channel_layer, group_name, tick):
+        self.meeting_id = meeting_id
+        self.channel_layer = channel_layer
+        self.group_name = group_name
+        self.tick = tick
+        self.pending = {}
+        self.task = None
+
+    def submit(self, payload):
+        key = (payload['type'], payload.get('user_id'))
+        current = self.pending.get(key)
+        if current is None:
+            self.pending[key] = dict(payload)
+        else:
+            count(self.meeting_id, 'coalesced')
+            if payload['type'] in REPLACED_TYPES:
+                self.pending[key] = dict(payload)
+            else:
+                current.update(payload)
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.drain())
+
+    async def drain(self):
+        # Send what is pending, then hold off one tick before the next batch
+        while self.pending:
+            batch, self.pending = self.pending, {}
+            for payload in batch.values():
+                await self.channel_layer.group_send(
+                    self.group_name,
+                    {'type': 'broadcast', **wire.encode_event(payload)}
+                )
+            count(self.meeting_id, 'broadcast', len(batch))
+            await asyncio.sleep(self.tick)
+
+
+_schedulers = {}
+# (event loop, meeting) -> sockets of this process in the room
+_members = Counter()
+
+
+def get_scheduler(meeting_id, channel_layer, group_name):
+    """The room's scheduler for the running event loop."""
+    key = (asyncio.get_running_loop(), str(meeting_id))
+    scheduler = _schedulers.get(key)
+    if scheduler is None:
+        scheduler = _schedulers[key] = RoomScheduler(
+            meeting_id, channel_layer, group_name, fanout_settings()['TICK']
+        )
+    return scheduler
+
+
+def room_joined(meeting_id):
+    _members[(asyncio.get_running_loop(), str(meeting_id))] += 1
+
+
+def room_left(meeting_id):
+    """A socket left; the last one out of a room drops its scheduler."""
+    key = (asyncio.get_running_loop(), str(meeting_id))
+    _members[key] -= 1
+    if _members[key] <= 0:
+        del _members[key]
+        # A drain already running keeps its own reference and finishes the batch
+        _schedulers.pop(key, None)
+
+
+def end_meeting(meeting_id):
+    """Forget the meeting's schedulers and counters in every event loop."""
+    meeting_id = str(meeting_id)
+    for key in [key for key in list(_schedulers) if key[1] == meeting_id]:
+        _schedulers.pop(key, None)
+    with _stats_lock:
+        _stats.pop(meeting_id, None)
@@ -1,8 +1,16 @@
 # classroom/forms.py
+import re
+
 from django import forms
 from django.contrib.auth import get_user_model
+from django.forms.models import construct_instance
+from calendar_app import conflicts
+from calendar_app.recurrence import parse_weekdays
+from courses import outline
 from courses.models import Course, Module, Session
 from .models import Batch, BreakoutRoom, Classroom, ClassroomEnrollment, ClassroomSession, Attendance, VirtualClassroom, ChatMessage
+from .enrollment import EnrollmentError, identifiers_from_csv
+from .scheduling import schedule_classroom
 
 CustomUser = get_user_model()
 
@@ -43,15 +51,29 @@ class ClassroomForm(forms.ModelForm):
         required=False,
         widget=forms.Select(attrs={'class': 'form-control'})
     )
+    generate_schedule = forms.BooleanField(
+        required=False,
+        help_text="Schedule the course's sessions on the class days, skipping holidays. "
+                  "Completed sessions and sessions with attendance stay where they are."
+    )
+    add_to_calendar = forms.BooleanField(
+        required=False,
+        help_text="Also put the scheduled sessions on the trainer's and students' calendars."
+    )
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop('user', None)
+        self.schedule_result = None
         super().__init__(*args, **kwargs)
         
         # Filter trainers only
         self.fields['trainer'].queryset = CustomUser.objects.filter(role='trainer')
         
-        # Filter active courses
+        # Filter active courses; the choices come from the course outline
+        # snapshots (courses/outline.py), the querysets only validate
         self.fields['course'].queryset = Course.objects.all()
+        self.fields['course'].choices = [('', self.fields['course'].empty_label)] + [
+            (cid, f'{cid} - {title}') for cid, title in outline.index()['courses']
+        ]
         
         # Initially empty modules and sessions (single-select)
         self.fields['modules'].queryset = Module.objects.none()
@@ -61,12 +83,11 @@ class ClassroomForm(forms.ModelForm):
             try:
                 course_id = self.data.get('course')
                 if course_id:
-                    self.fields['modules'].queryset = Module.objects.filter(course_id=course_id)
-                    self.fields['sessions'].queryset = Session.objects.filter(course_id=course_id)
+                    self.use_course_outline(course_id)
             except Exception:
                 pass
         elif self.instance.pk:
-            self.fields['modules'].queryset = self.instance.course.modules.all()
+            self.use_course_outline(self.instance.course_id, sessions=False)
             # If the classroom already has modules/sessions, preselect the first
             existing_modules = self.instance.modules.all()
             if existing_modules.exists():
@@ -75,7 +96,28 @@ class ClassroomForm(forms.ModelForm):
             if existing_sessions.exists():
                 self.initial['sessions'] = existing_sessions.first()
             else:
-                self.fields['sessions'].queryset = Session.objects.filter(course=self.instance.course)
+                self.use_course_outline(self.instance.course_id, modules=False)
+    
+    def use_course_outline(self, course_id, modules=True, sessions=True):
+        course = outline.course_outline(course_id)
+        course_modules = course['modules'] if course else []
+        if modules:
+            field = self.fields['modules']
+            field.queryset = Module.objects.filter(course_id=course_id)
+            field.choices = [('', field.empty_label)] + [
+                (module['mid'], f"{module['mid']} - {module['m_title']}") for module in course_modules
+            ]
+        if sessions:
+            field = self.fields['sessions']
+            field.queryset = Session.objects.filter(course_id=course_id)
+            course_sessions = sorted(
+                (session for module in course_modules for session in module['sessions']),
+                key=lambda session: (session['session_number'], session['sid']),
+            )
+            field.choices = [('', field.empty_label)] + [
+                (session['sid'], f"Session {session['session_number']}: {session['topics'][:50]}...")
+                for session in course_sessions
+            ]
     
     class Meta:
         model = Classroom
@@ -101,6 +143,16 @@ class ClassroomForm(forms.ModelForm):
             'sessions': forms.SelectMultiple(attrs={'class': 'form-control', 'size': 8}),
         }
     
+    def clean(self):
+        cleaned_data = super().clean()
+        schedule_days = cleaned_data.get('schedule_days')
+        if cleaned_data.get('generate_schedule') and schedule_days and not parse_weekdays(schedule_days):
+            self.add_error('schedule_days', 'Enter the class days, e.g. Mon, Wed, Fri, to generate a schedule.')
+        start_date, end_date = cleaned_data.get('start_date'), cleaned_data.get('end_date')
+        if cleaned_data.get('generate_schedule') and start_date and end_date and end_date < start_date:
+            self.add_error('end_date', 'The end date is before the start date.')
+        return cleaned_data
+    
     def save(self, commit=True):
         instance = super().save(commit=False)
         if self.user:
@@ -140,6 +192,11 @@ class ClassroomForm(forms.ModelForm):
                 # don't automatically delete existing ClassroomSession entries
                 pass
 
+            if self.cleaned_data.get('generate_schedule'):
+                self.schedule_result = schedule_classroom(
+                    instance, calendar=self.cleaned_data.get('add_to_calendar'), user=self.user,
+                )
+
         return instance
 
 class ClassroomEnrollmentForm(forms.ModelForm):
@@ -150,6 +207,9 @@ class ClassroomEnrollmentForm(forms.ModelForm):
         if self.classroom:
             # Get students not already enrolled in this classroom
             enrolled_students = self.classroom.students.all()
+            if self.instance.pk:
+                # Editing: the enrolled student stays selectable
+                enrolled_students = enrolled_students.exclude(pk=self.instance.student_id)
             available_students = CustomUser.objects.filter(
                 role='student'
             ).exclude(
@@ -172,17 +232,67 @@ class ClassroomEnrollmentForm(forms.ModelForm):
         student = cleaned_data.get('student')
         
         if self.classroom and student:
-            # Check if classroom is full
-            if self.classroom.is_full:
+            # Early, friendly check only; the seat is reserved atomically by
+            # enrollment.enroll_student when the form is saved
+            if not self.instance.pk and self.classroom.is_full:
                 raise forms.ValidationError("This classroom is already full.")
             
             # Check if student is already enrolled
-            if ClassroomEnrollment.objects.filter(classroom=self.classroom, student=student).exists():
+            enrolled = ClassroomEnrollment.objects.filter(classroom=self.classroom, student=student)
+            if enrolled.exclude(pk=self.instance.pk).exists():
                 raise forms.ValidationError("This student is already enrolled in this classroom.")
         
         return cleaned_data
 
+class BulkEnrollmentForm(forms.Form):
+    students = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 8,
+                                     'placeholder': 'One student id, username or email per line'}),
+    )
+    csv_file = forms.FileField(
+        required=False,
+        help_text="CSV with an id, username or email column",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'}),
+    )
+    status = forms.ChoiceField(
+        choices=ClassroomEnrollment.STATUS_CHOICES, initial='enrolled',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    partial = forms.BooleanField(
+        required=False, label="Enroll as many as fit when seats run out",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        identifiers = [value for value in re.split(r'[\s,;]+', cleaned_data.get('students', '')) if value]
+        if cleaned_data.get('csv_file'):
+            try:
+                identifiers += identifiers_from_csv(cleaned_data['csv_file'])
+            except EnrollmentError as error:
+                raise forms.ValidationError({'csv_file': str(error)})
+        if not identifiers:
+            raise forms.ValidationError("List some students or upload a CSV.")
+        cleaned_data['identifiers'] = identifiers
+        return cleaned_data
+
 class ClassroomSessionForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        self.classroom = kwargs.pop('classroom', None)
+        super().__init__(*args, **kwargs)
+        if self.classroom is None and self.instance.classroom_id:
+            self.classroom = self.instance.classroom
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.classroom and not self.errors:
+            # The trainer must be free at the new time
+            session = construct_instance(self, self.instance)
+            session.classroom = self.classroom
+            conflicts.check_session(session)
+        return cleaned_data
+    
     class Meta:
         model = ClassroomSession
         fields = ['session', 'scheduled_date', 'scheduled_time', 'duration_minutes', 'is_completed', 'completed_date', 'notes']
@@ -0,0 +1,151 @@
+# classroom/management/commands/_benchutils.py
+"""Shared helpers for the classroom benchmark commands."""
+import os
+import statistics
+import tempfile
+from contextlib import contextmanager
+from datetime import date, time, timedelta
+
+from channels.layers import channel_layers
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from courses.models import Course
+from classroom.models import Batch, Classroom, ClassroomEnrollment, VirtualClassroom
+
+CustomUser = get_user_model()
+
+
+@contextmanager
+def benchmark_database(on_disk=True):
+    """
+    Run against a throwaway test database so benchmarks never touch the
+    real one. SQLite defaults to an on-disk file because that is what the
+    site runs on; in-memory hides lock contention.
+    """
+    connection = connections['default']
+    old_name = connection.settings_dict['NAME']
+    old_test_name = connection.settings_dict['TEST'].get('NAME')
+    tmpdir = None
+    if on_disk and connection.vendor == 'sqlite':
+        tmpdir = tempfile.mkdtemp(prefix='vidyasagar-bench-')
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        connection.settings_dict['TEST']['NAME'] = old_test_name
+        if tmpdir:
+            for name in os.listdir(tmpdir):
+                os.remove(os.path.join(tmpdir, name))
+            os.rmdir(tmpdir)
+
+
+@contextmanager
+def in_memory_channel_layer(capacity=100000):
+    # Large capacity: the default of 100 silently drops bursts in group_send
+    layers = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            'CONFIG': {'capacity': capacity},
+        },
+    }
+    with override_settings(CHANNEL_LAYERS=layers):
+        channel_layers.backends = {}
+        yield
+    channel_layers.backends = {}
+
+
+def create_meeting(prefix, students, status='live'):
+    """Create a Batch/Classroom/VirtualClassroom with ``students`` enrolled users."""
+    today = date.today()
+    trainer = CustomUser.objects.create(username=f'{prefix}-trainer', role='trainer')
+    CustomUser.objects.bulk_create([
+        CustomUser(username=f'{prefix}-student-{i}', role='student')
+        for i in range(students)
+    ])
+    users = list(CustomUser.objects.filter(username__startswith=f'{prefix}-student-').order_by('pk'))
+    course, _ = Course.objects.get_or_create(
+        cid='BENCH',
+        defaults={'title': 'Benchmark course', 'duration_days': 30, 'duration_months': 1, 'fees': 0}
+    )
+    batch = Batch.objects.create(
+        batch_id=f'{prefix}-B'[:20], batch_name=prefix,
+        start_date=today, end_date=today + timedelta(days=30)
+    )
+    classroom = Classroom.objects.create(
+        classroom_id=f'{prefix}-C'[:20], classroom_name=prefix, batch=batch,
+        course=course, trainer=trainer, start_date=today,
+        end_date=today + timedelta(days=30), schedule_days='Mon, Wed, Fri',
+        start_time=time(9, 0), end_time=time(10, 0), max_students=max(students, 1)
+    )
+    ClassroomEnrollment.objects.bulk_create([
+        ClassroomEnrollment(classroom=classroom, student=user, status='attending')
+        for user in users
+    ])
+    now = timezone.now()
+    virtual_classroom = VirtualClassroom.objects.create(
+        classroom=classroom, status=status, scheduled_start=now,
+        scheduled_end=now + timedelta(hours=1), actual_start=now
+    )
+    return virtual_classroom, trainer, users
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize_ms(samples):
+    """p50/p99/max/mean of a list of second-valued samples, in milliseconds."""
+    return {
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3) if samples else 0.0,
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def histogram_ms(samples, bounds=HISTOGRAM_BOUNDS_MS):
+    """Count second-valued samples into ``<=bound`` millisecond buckets."""
+    buckets = {f'<={bound}': 0 for bound in bounds}
+    buckets[f'>{bounds[-1]}'] = 0
+    for sample in samples:
+        ms = sample * 1000
+        for bound in bounds:
+            if ms <= bound:
+                buckets[f'<={bound}'] += 1
+                break
+        else:
+            buckets[f'>{bounds[-1]}'] += 1
+    return buckets
+
+
+class QueryCounter:
+    """
+    execute_wrapper that counts queries on the connection it is installed
+    on. Install it from the thread that runs the queries; under asyncio.run
+    database_sync_to_async and AsyncClient share one sync thread.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self):
+        connection.execute_wrappers.append(self)
+
+    def uninstall(self):
+        connection.execute_wrappers.remove(self)
@@ -0,0 +1,128 @@
+# classroom/management/commands/bench_chat.py
+"""
+Chat broadcast latency and insert throughput through ClassroomConsumer.
+
+Drives N WebsocketCommunicator sockets in one meeting, has every socket send
+M messages at once, and measures how long each broadcast takes to reach every
+socket. Runs with write-behind chat on and off so the two can be compared:
+
+    python manage.py bench_chat --sockets 50 --messages 10
+"""
+import asyncio
+import json
+import time
+
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from classroom import chat_journal, presence
+from classroom.models import ChatMessage
+from classroom.routing import websocket_urlpatterns
+
+from ._benchutils import benchmark_database, create_meeting, in_memory_channel_layer, summarize_ms
+
+MODES = {
+    'write-through': False,
+    'write-behind': True,
+}
+
+
+async def open_sockets(application, meeting_id, users):
+    sockets = []
+    for user in users:
+        communicator = WebsocketCommunicator(application, f'/ws/classroom/{meeting_id}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        if not connected:
+            raise RuntimeError('socket was refused')
+        sockets.append(communicator)
+    for communicator, user in zip(sockets, users):
+        await communicator.send_json_to({'type': 'join', 'user_id': user.pk, 'username': user.username})
+    # Everyone sees everyone join; drain those before timing anything
+    for communicator in sockets:
+        for _ in users:
+            await communicator.receive_json_from(timeout=10)
+    return sockets
+
+
+async def run_chat_burst(application, meeting_id, users, messages_per_socket):
+    sockets = await open_sockets(application, meeting_id, users)
+    expected = len(users) * messages_per_socket
+    sent_at = {}
+    latencies = []
+
+    async def receive_all(communicator):
+        for _ in range(expected):
+            payload = await communicator.receive_json_from(timeout=30)
+            latencies.append(time.perf_counter() - sent_at[payload['message']])
+
+    async def send_all(communicator, user):
+        for n in range(messages_per_socket):
+            text = f'{user.pk}:{n}'
+            sent_at[text] = time.perf_counter()
+            await communicator.send_json_to({
+                'type': 'chat_message', 'user_id': user.pk,
+                'username': user.username, 'message': text
+            })
+
+    receivers = [asyncio.ensure_future(receive_all(c)) for c in sockets]
+    started = time.perf_counter()
+    await asyncio.gather(*(send_all(c, u) for c, u in zip(sockets, users)))
+    await asyncio.gather(*receivers)
+    broadcast_seconds = time.perf_counter() - started
+
+    await database_sync_to_async(chat_journal.flush)()
+    persisted_seconds = time.perf_counter() - started
+    stored = await database_sync_to_async(ChatMessage.objects.filter(virtual_classroom__meeting_id=meeting_id).count)()
+
+    for communicator in sockets:
+        await communicator.disconnect()
+
+    return {
+        **summarize_ms(latencies),
+        'deliveries': len(latencies),
+        'broadcast_seconds': round(broadcast_seconds, 4),
+        'stored_messages': stored,
+        'inserts_per_sec': round(stored / persisted_seconds, 1) if persisted_seconds else 0.0,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark classroom chat broadcast latency and inserts/sec, write-through vs write-behind.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=50)
+        parser.add_argument('--messages', type=int, default=10, help='messages sent by each socket')
+        parser.add_argument('--mode', choices=['both', *MODES], default='both')
+        parser.add_argument('--in-memory', action='store_true', help='use an in-memory SQLite test database')
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        modes = list(MODES) if options['mode'] == 'both' else [options['mode']]
+        application = URLRouter(websocket_urlpatterns)
+        results = []
+
+        with benchmark_database(on_disk=not options['in_memory']), in_memory_channel_layer():
+            for index, mode in enumerate(modes):
+                journal = {**chat_journal.journal_settings(), 'WRITE_BEHIND': MODES[mode]}
+                with override_settings(CLASSROOM_CHAT_JOURNAL=journal):
+                    presence.reset_store()
+                    virtual_classroom, _, users = create_meeting(f'chat{index}', options['sockets'])
+                    result = asyncio.run(run_chat_burst(
+                        application, virtual_classroom.meeting_id, users, options['messages']
+                    ))
+                results.append({'mode': mode, 'sockets': options['sockets'],
+                                'messages_per_socket': options['messages'], **result})
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            self.stdout.write(
+                f"{result['mode']:>14}: p50 {result['p50_ms']:.2f} ms  p99 {result['p99_ms']:.2f} ms  "
+                f"{result['inserts_per_sec']:.0f} inserts/s  "
+                f"({result['stored_messages']} stored, {result['deliveries']} deliveries)"
+            )
@@ -0,0 +1,237 @@
+# classroom/management/commands/bench_database.py
+"""
+Chat and attendance write paths under each database profile
+(VidyaSagarLMS/databases.py).
+
+For every profile, on a throwaway database, all threads start together:
+
+    chat         writer threads insert chat messages one INSERT at a time,
+                 as the socket consumer does
+    attendance   one thread per student marks attendance session by session
+                 (Attendance.save(): the row plus its enrollment rollup
+                 UPDATE, in one transaction)
+    poll         reader threads fetch the latest chat page, as the AJAX
+                 poll does, until the writers finish
+
+and reports throughput, latency and failed operations ("database is
+locked") per path:
+
+    python manage.py bench_database
+    python manage.py bench_database --profiles sqlite sqlite-wal --chat-writers 8 --messages 500
+
+PostgreSQL profiles take their server from DB_HOST/DB_NAME/DB_USER/...;
+they are skipped, with the reason, when psycopg (psycopg_pool for
+postgres-pool) is missing or no server answers.
+"""
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, connections
+from django.test.utils import override_settings
+
+from VidyaSagarLMS.databases import PROFILES, database_profile
+from classroom.models import Attendance, ChatMessage, ClassroomSession
+from courses.models import Module, Session
+
+from ._benchutils import benchmark_database, create_meeting, summarize_ms
+
+
+def use_profile(profile):
+    """Point the default alias at ``profile``; threads opened afterwards connect with it."""
+    set_default(connections.configure_settings({'default': database_profile(profile, settings.BASE_DIR)})['default'])
+
+
+def set_default(settings_dict):
+    # close_all() only touches connections already opened: no backend import
+    connections.close_all()
+    connections.settings['default'] = settings_dict
+    if hasattr(connections._connections, 'default'):
+        del connections['default']
+
+
+def missing_driver(profile):
+    if not profile.startswith('postgres'):
+        return None
+    try:
+        import psycopg  # noqa: F401
+        if profile == 'postgres-pool':
+            import psycopg_pool  # noqa: F401
+    except ImportError as error:
+        return f'{error.name} is not installed'
+    return None
+
+
+def unreachable(profile):
+    if not profile.startswith('postgres'):
+        return None
+    try:
+        connection.ensure_connection()
+    except DatabaseError as error:
+        return f'no server: {str(error).strip().splitlines()[0]}'
+    finally:
+        connection.close()
+    return None
+
+
+def create_fixture(students, sessions):
+    virtual_classroom, trainer, users = create_meeting('dbbench', students)
+    classroom = virtual_classroom.classroom
+    module = Module.objects.create(m_title='Benchmark', no_of_sessions=sessions, course=classroom.course)
+    Session.objects.bulk_create([
+        Session(module=module, course=classroom.course, topics=f'Topic {i + 1}', session_number=i + 1)
+        for i in range(sessions)
+    ])
+    ClassroomSession.objects.bulk_create([
+        ClassroomSession(classroom=classroom, session=session, scheduled_date=classroom.start_date,
+                         scheduled_time=classroom.start_time)
+        for session in Session.objects.filter(module=module).order_by('session_number')
+    ])
+    session_ids = list(ClassroomSession.objects.filter(classroom=classroom).values_list('pk', flat=True))
+    return virtual_classroom, [trainer, *users], users, session_ids
+
+
+class Workload:
+    """Writer and reader threads released together; samples per path."""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+        self.writers_done = threading.Event()
+
+    def timed(self, path, operation):
+        started = time.perf_counter()
+        try:
+            operation()
+        except DatabaseError:
+            with self.lock:
+                self.errors[path] = self.errors.get(path, 0) + 1
+            return
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.samples.setdefault(path, []).append(elapsed)
+
+    def run(self, writers, readers):
+        barrier = threading.Barrier(len(writers) + len(readers) + 1)
+
+        def thread(job):
+            try:
+                barrier.wait()
+                job()
+            finally:
+                connection.close()
+
+        writer_threads = [threading.Thread(target=thread, args=(job,)) for job in writers]
+        reader_threads = [threading.Thread(target=thread, args=(job,)) for job in readers]
+        for worker in writer_threads + reader_threads:
+            worker.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for worker in writer_threads:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        self.writers_done.set()
+        for worker in reader_threads:
+            worker.join()
+        return elapsed
+
+
+def run_profile(options):
+    virtual_classroom, chat_users, students, session_ids = create_fixture(options['students'], options['sessions'])
+    room_id = virtual_classroom.pk
+    workload = Workload()
+
+    def chat_writer(user):
+        def job():
+            for index in range(options['messages']):
+                workload.timed('chat', lambda: ChatMessage.objects.create(
+                    virtual_classroom_id=room_id, user_id=user.pk, message=f'message {index}',
+                ))
+        return job
+
+    def attendance_writer(student):
+        def job():
+            for session_id in session_ids:
+                workload.timed('attendance', lambda: Attendance(
+                    classroom_session_id=session_id, student_id=student.pk, status='present',
+                ).save())
+        return job
+
+    def poller():
+        while not workload.writers_done.is_set():
+            workload.timed('poll', lambda: list(
+                ChatMessage.objects.filter(virtual_classroom_id=room_id)
+                .select_related('user').order_by('-id')[:50]
+            ))
+
+    writers = [chat_writer(chat_users[i % len(chat_users)]) for i in range(options['chat_writers'])]
+    writers += [attendance_writer(student) for student in students]
+    readers = [poller for _ in range(options['pollers'])]
+    elapsed = workload.run(writers, readers)
+
+    paths = []
+    for path in ('chat', 'attendance', 'poll'):
+        samples = workload.samples.get(path, [])
+        paths.append({
+            'path': path,
+            'operations': len(samples),
+            'failed': workload.errors.get(path, 0),
+            'per_second': round(len(samples) / elapsed) if elapsed else None,
+            **summarize_ms(samples),
+        })
+    return {'seconds': round(elapsed, 3), 'paths': paths}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the chat and attendance write paths under each database profile.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+        parser.add_argument('--chat-writers', type=int, default=4, help='threads inserting chat messages')
+        parser.add_argument('--messages', type=int, default=200, help='messages per chat writer')
+        parser.add_argument('--students', type=int, default=4, help='one attendance thread per student')
+        parser.add_argument('--sessions', type=int, default=50, help='attendance marks per student')
+        parser.add_argument('--pollers', type=int, default=4, help='threads polling the chat')
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        original = connections.settings['default']
+        results = []
+        try:
+            # DEBUG keeps every query in memory
+            with override_settings(DEBUG=False):
+                for profile in options['profiles']:
+                    reason = missing_driver(profile)
+                    if not reason:
+                        use_profile(profile)
+                        reason = unreachable(profile)
+                    if reason:
+                        results.append({'profile': profile, 'skipped': reason})
+                        continue
+                    with benchmark_database(on_disk=True):
+                        results.append({'profile': profile, **run_profile(options)})
+        finally:
+            set_default(original)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{options['chat_writers']} chat writers x {options['messages']} messages, "
+            f"{options['students']} students x {options['sessions']} attendance marks, {options['pollers']} pollers"
+        )
+        self.stdout.write(
+            f"{'profile':<15}{'path':<12}{'ops':>7}{'failed':>8}{'ops/s':>8}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        )
+        for result in results:
+            if 'skipped' in result:
+                self.stdout.write(f"{result['profile']:<15}skipped: {result['skipped']}")
+                continue
+            for row in result['paths']:
+                self.stdout.write(
+                    f"{result['profile']:<15}{row['path']:<12}{row['operations']:>7}{row['failed']:>8}"
+                    f"{str(row['per_second']):>8}{row['p50_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}"
+                )
@@ -0,0 +1,101 @@
+# classroom/management/commands/bench_encoding.py
+"""
+Serialization cost and frame size of classroom broadcasts.
+
+Compares the old fan-out, where every recipient's consumer ran json.dumps
+on the event it received, with encoding once per broadcast
+(wire.encode_event) and forwarding the ready-made frame:
+
+    python manage.py bench_encoding --rooms 1 10 50 100 200
+"""
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from classroom import wire
+
+from .bench_whiteboard import random_stroke
+
+
+def sample_payloads(rng, points):
+    return {
+        'chat': {
+            'type': 'chat_message', 'sequence': 1234,
+            'message': 'Could you go over the second example again please?',
+            'user_id': 42, 'username': 'student042',
+        },
+        'whiteboard_op': {
+            'type': 'whiteboard_op', 'sequence': 567,
+            'op': random_stroke(rng, points), 'user_id': 7,
+        },
+        'participant_update': {
+            'type': 'participant_update', 'user_id': 42,
+            'is_muted': True, 'raise_hand': False, 'video_enabled': False,
+        },
+    }
+
+
+def time_per_broadcast(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-recipient json.dumps against encode-once broadcasts, and JSON vs msgpack frame sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, nargs='+', default=[1, 10, 50, 100, 200])
+        parser.add_argument('--points', type=int, default=60, help='points per whiteboard stroke')
+        parser.add_argument('--repeat', type=int, default=200, help='broadcasts timed per case')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        payloads = sample_payloads(random.Random(options['seed']), options['points'])
+        repeat = options['repeat']
+
+        results = []
+        for name, payload in payloads.items():
+            frames = wire.encode_event(payload)
+            sizes = {
+                'json_bytes': len(frames['json'].encode()),
+                'msgpack_bytes': len(frames['msgpack']) if 'msgpack' in frames else None,
+            }
+            for room in options['rooms']:
+                def per_recipient():
+                    for _ in range(room):
+                        json.dumps(payload)
+
+                def encode_once():
+                    event = wire.encode_event(payload)
+                    for _ in range(room):
+                        event['json']
+
+                old_us = time_per_broadcast(per_recipient, repeat)
+                new_us = time_per_broadcast(encode_once, repeat)
+                results.append({
+                    'payload': name,
+                    'room_size': room,
+                    'per_recipient_us': round(old_us, 1),
+                    'encode_once_us': round(new_us, 1),
+                    'speedup': round(old_us / new_us, 1) if new_us else None,
+                    **sizes,
+                })
+
+        if options['json']:
+            self.stdout.write(json.dumps({'msgpack': wire.msgpack is not None, 'results': results}, indent=2))
+            return
+        if wire.msgpack is None:
+            self.stdout.write('msgpack not installed: encode-once timings are JSON only')
+        self.stdout.write(f"{'payload':<20}{'room':>6}{'per-recipient µs':>18}{'encode-once µs':>16}"
+                          f"{'x':>7}{'json B':>9}{'msgpack B':>11}")
+        for row in results:
+            self.stdout.write(
+                f"{row['payload']:<20}{row['room_size']:>6}{row['per_recipient_us']:>18}"
+                f"{row['encode_once_us']:>16}{row['speedup']:>7}{row['json_bytes']:>9}"
+                f"{str(row['msgpack_bytes']):>11}"
+            )
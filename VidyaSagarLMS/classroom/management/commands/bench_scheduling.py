@@ -0,0 +1,176 @@
+# classroom/management/commands/bench_scheduling.py
+"""
+Session scheduling throughput (classroom/scheduling.py).
+
+Builds a course of S sessions and C classrooms on it with a few holidays,
+then times, for all C x S ClassroomSession rows in one call:
+
+    generate     first schedule: one bulk_create
+    reschedule   every classroom starts a week later: every row moves
+    no-op        the same schedule again: nothing to write
+
+and the old way of creating rows one save() at a time, on a sample:
+
+    python manage.py bench_scheduling --classrooms 100 --sessions 100
+    python manage.py bench_scheduling --calendar
+"""
+import json
+import time
+from datetime import date, time as clock, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from calendar_app.models import CalendarEvent
+from classroom import scheduling
+from classroom.models import Batch, Classroom, ClassroomEnrollment, ClassroomSession
+from courses.models import Course, Module, Session
+
+from ._benchutils import CustomUser, QueryCounter, benchmark_database
+
+
+def create_fixture(classrooms, sessions, students):
+    start = date(2030, 1, 7)  # a Monday
+    trainer = CustomUser.objects.create(username='bench-trainer', role='trainer')
+    CustomUser.objects.bulk_create([
+        CustomUser(username=f'bench-student-{i}', role='student') for i in range(students)
+    ])
+    student_ids = list(CustomUser.objects.filter(role='student').values_list('pk', flat=True))
+
+    course = Course.objects.create(cid='BENCH', title='Benchmark course', duration_days=365, duration_months=12, fees=0)
+    modules = Module.objects.bulk_create([
+        Module(m_title=f'Module {i}', no_of_sessions=10, course=course) for i in range((sessions + 9) // 10)
+    ])
+    Session.objects.bulk_create([
+        Session(module=modules[i // 10], course=course, topics=f'Topic {i + 1}', session_number=i + 1)
+        for i in range(sessions)
+    ])
+
+    batch = Batch.objects.create(batch_id='BENCH', batch_name='Benchmark', start_date=start,
+                                 end_date=start + timedelta(days=730))
+    Classroom.objects.bulk_create([
+        Classroom(
+            classroom_id=f'BENCH-{i}', classroom_name=f'Benchmark {i}', batch=batch, course=course,
+            trainer=trainer, created_by=trainer, start_date=start, end_date=start + timedelta(days=730),
+            schedule_days=('Mon, Wed, Fri', 'Tue, Thu', 'Mon, Tue, Wed, Thu, Fri')[i % 3],
+            start_time=clock(9, 0), end_time=clock(10, 30), max_students=students or 1,
+        )
+        for i in range(classrooms)
+    ])
+    ClassroomEnrollment.objects.bulk_create([
+        ClassroomEnrollment(classroom_id=f'BENCH-{i}', student_id=student_id, status='attending')
+        for i in range(classrooms) for student_id in student_ids
+    ])
+
+    # A national holiday every year and a two-week break
+    CalendarEvent.objects.create(
+        title='Republic Day', event_type='holiday', start_date=date(2030, 1, 26), created_by=trainer,
+        is_recurring=True, recurrence_pattern='monthly', recurrence_interval=12,
+    )
+    CalendarEvent.objects.create(
+        title='Spring break', event_type='holiday', start_date=date(2030, 4, 1),
+        end_date=date(2030, 4, 14), created_by=trainer,
+    )
+    return trainer
+
+
+def timed(func):
+    counter = QueryCounter()
+    counter.install()
+    started = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        counter.uninstall()
+    return time.perf_counter() - started, counter.count, result
+
+
+def per_row(classroom_ids):
+    """One save() per row, the way the form created sessions before."""
+    day = date(2030, 1, 7)
+    session_ids = list(Session.objects.order_by('session_number').values_list('pk', flat=True))
+    created = 0
+    with transaction.atomic():
+        for classroom_id in classroom_ids:
+            for session_id in session_ids:
+                ClassroomSession.objects.create(
+                    classroom_id=classroom_id, session_id=session_id, scheduled_date=day,
+                    scheduled_time=clock(9, 0), duration_minutes=90,
+                )
+                created += 1
+        transaction.set_rollback(True)
+    return created
+
+
+class Command(BaseCommand):
+    help = 'Benchmark bulk session scheduling against per-row creation.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classrooms', type=int, default=100)
+        parser.add_argument('--sessions', type=int, default=100, help='sessions in the course')
+        parser.add_argument('--students', type=int, default=5, help='students enrolled in each classroom')
+        parser.add_argument('--calendar', action='store_true', help='also write mirror calendar events')
+        parser.add_argument('--baseline-classrooms', type=int, default=5,
+                            help='classrooms timed with per-row saves (rolled back)')
+        parser.add_argument('--in-memory', action='store_true', help='use an in-memory SQLite database')
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        # DEBUG logs every statement with its parameters, 10k-row INSERTs included
+        with override_settings(DEBUG=False), benchmark_database(on_disk=not options['in_memory']):
+            self.run(options)
+
+    def run(self, options):
+        create_fixture(options['classrooms'], options['sessions'], options['students'])
+        calendar = options['calendar']
+        classrooms = lambda: Classroom.objects.select_related('trainer', 'created_by')
+
+        phases = []
+
+        def phase(name, func):
+            seconds, queries, totals = timed(func)
+            rows = totals['created'] + totals['moved'] if isinstance(totals, dict) else totals
+            phases.append({
+                'phase': name, 'seconds': round(seconds, 4), 'queries': queries, 'rows': rows,
+                'rows_per_second': round(rows / seconds) if seconds and rows else None,
+            })
+            return totals
+
+        baseline = options['baseline_classrooms']
+        if baseline:
+            ids = list(Classroom.objects.order_by('pk').values_list('pk', flat=True)[:baseline])
+            phase(f'per-row save ({len(ids)} classrooms)', lambda: per_row(ids))
+
+        phase('generate', lambda: scheduling.schedule_classrooms(classrooms(), calendar=calendar))
+
+        def reschedule():
+            Classroom.objects.update(start_date=date(2030, 1, 14))
+            return scheduling.schedule_classrooms(classrooms(), calendar=calendar)
+        totals = phase('reschedule', reschedule)
+        phase('no-op', lambda: scheduling.schedule_classrooms(classrooms(), calendar=calendar))
+
+        summary = {
+            'vendor': connection.vendor,
+            'classrooms': options['classrooms'],
+            'sessions_per_classroom': options['sessions'],
+            'calendar': calendar,
+            'session_rows': ClassroomSession.objects.count(),
+            'calendar_events': CalendarEvent.objects.filter(event_type='class').count(),
+            'unscheduled': totals['unscheduled'],
+            'phases': phases,
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+        self.stdout.write(
+            f"{summary['classrooms']} classrooms x {summary['sessions_per_classroom']} sessions on {summary['vendor']}"
+            f"{' with calendar events' if calendar else ''}: {summary['session_rows']} rows, "
+            f"{summary['unscheduled']} did not fit"
+        )
+        self.stdout.write(f"{'phase':<32}{'seconds':>10}{'queries':>9}{'rows':>8}{'rows/s':>10}")
+        for row in phases:
+            self.stdout.write(
+                f"{row['phase']:<32}{row['seconds']:>10}{row['queries']:>9}{row['rows']:>8}"
+                f"{str(row['rows_per_second']):>10}"
+            )
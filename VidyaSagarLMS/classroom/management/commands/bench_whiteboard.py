@@ -0,0 +1,115 @@
+# classroom/management/commands/bench_whiteboard.py
+"""
+Whiteboard bandwidth per stroke and join-time payload size.
+
+Appends S simulated pen strokes through the operation log and compares
+against the legacy protocol, where every stroke re-uploaded (and the socket
+re-broadcast) the whole canvas image and late joiners downloaded it. When
+the log asks for a base image the simulated trainer uploads one of
+--canvas-bytes, as the client does; the join payload counts that image:
+
+    python manage.py bench_whiteboard --strokes 1000 --points 60
+"""
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from classroom import whiteboard as whiteboard_log
+from classroom.models import Whiteboard
+
+from ._benchutils import benchmark_database, create_meeting, summarize_ms
+
+
+def random_stroke(rng, points):
+    x, y = rng.randint(0, 1000), rng.randint(0, 800)
+    coords = []
+    for _ in range(points):
+        x = min(1000, max(0, x + rng.randint(-8, 8)))
+        y = min(800, max(0, y + rng.randint(-8, 8)))
+        coords.extend([x, y])
+    return {'t': 'pen', 'c': '#1f2d3d', 'w': 3, 'p': coords}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark whiteboard operation-log bandwidth and join payload against full-canvas uploads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strokes', type=int, default=1000)
+        parser.add_argument('--points', type=int, default=60, help='points per pen stroke')
+        parser.add_argument('--room-size', type=int, default=50)
+        parser.add_argument('--canvas-bytes', type=int, default=300_000,
+                            help='size of one legacy canvas_data PNG data URL')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        strokes = options['strokes']
+
+        with benchmark_database():
+            virtual_classroom, trainer, _ = create_meeting('wb', 1)
+            whiteboard = Whiteboard.objects.create(virtual_classroom=virtual_classroom)
+
+            canvas_data = 'x' * options['canvas_bytes']
+            op_bytes = []
+            append_seconds = []
+            images = 0
+            for _ in range(strokes):
+                op = whiteboard_log.normalize_operation(random_stroke(rng, options['points']))
+                inbound = json.dumps({'type': 'whiteboard_op', 'op': op}, separators=(',', ':'))
+                started = time.perf_counter()
+                sequence, wants_image = whiteboard_log.append_operation(whiteboard.pk, trainer.pk, op)
+                append_seconds.append(time.perf_counter() - started)
+                if wants_image:
+                    whiteboard_log.rebase_on_image(whiteboard.pk, canvas_data, trainer, sequence)
+                    images += 1
+                outbound = json.dumps({'type': 'whiteboard_op', 'sequence': sequence,
+                                       'op': op, 'user_id': trainer.pk}, separators=(',', ':'))
+                op_bytes.append((len(inbound), len(outbound)))
+
+            whiteboard.refresh_from_db()
+            state = whiteboard_log.board_state(whiteboard)
+            join_bytes = len(json.dumps(state, separators=(',', ':'))) + len(whiteboard.canvas_data)
+
+        room = options['room_size']
+        inbound_avg = sum(i for i, _ in op_bytes) / strokes
+        outbound_avg = sum(o for _, o in op_bytes) / strokes
+        result = {
+            'strokes': strokes,
+            'points_per_stroke': options['points'],
+            'room_size': room,
+            'per_stroke': {
+                'oplog_upload_bytes': round(inbound_avg),
+                'oplog_fanout_bytes': round(outbound_avg * room),
+                'legacy_upload_bytes': options['canvas_bytes'],
+                'legacy_fanout_bytes': options['canvas_bytes'] * room,
+            },
+            'join_payload': {
+                'oplog_bytes': join_bytes,
+                'snapshot_ops': len(state['snapshot']),
+                'tail_ops': len(state['operations']),
+                'base_images': images,
+                'legacy_bytes': options['canvas_bytes'],
+            },
+            'append_latency': summarize_ms(append_seconds),
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+        per_stroke = result['per_stroke']
+        join = result['join_payload']
+        self.stdout.write(
+            f"per stroke: upload {per_stroke['oplog_upload_bytes']} B (legacy {per_stroke['legacy_upload_bytes']} B), "
+            f"fan-out to {room}: {per_stroke['oplog_fanout_bytes']} B (legacy {per_stroke['legacy_fanout_bytes']} B)"
+        )
+        self.stdout.write(
+            f"join payload after {strokes} strokes: {join['oplog_bytes']} B "
+            f"({join['snapshot_ops']} snapshot + {join['tail_ops']} tail ops, {join['base_images']} base images "
+            f"uploaded; legacy {join['legacy_bytes']} B)"
+        )
+        self.stdout.write(
+            f"append: p50 {result['append_latency']['p50_ms']:.2f} ms  p99 {result['append_latency']['p99_ms']:.2f} ms"
+        )
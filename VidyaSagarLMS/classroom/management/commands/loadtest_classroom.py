@@ -0,0 +1,292 @@
+# classroom/management/commands/loadtest_classroom.py
+"""
+Load test for the live classroom in a single process.
+
+Creates K rooms with N students each (plus their trainer) in a throwaway
+database, connects every participant to ClassroomConsumer over an in-memory
+channel layer and logs them in to the AJAX endpoints, then has everyone run
+a random mix of actions with a short think time between them:
+
+    students: socket chat, socket participant_update,
+              GET participants/, POST chat/send/
+    trainer:  socket chat, socket whiteboard_op,
+              GET participants/, POST whiteboard/update/
+
+The report is JSON (throughput, latency percentiles and histograms per
+action, DB queries, traced memory per connection, fan-out counters) so runs
+from different commits can be diffed:
+
+    python manage.py loadtest_classroom --rooms 4 --participants 25 --output before.json
+"""
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+
+import django
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from classroom import chat_journal, fanout, presence
+from classroom.models import ClassroomParticipant, Whiteboard
+from classroom.routing import websocket_urlpatterns
+
+from ._benchutils import (
+    QueryCounter, benchmark_database, create_meeting, histogram_ms,
+    in_memory_channel_layer, summarize_ms,
+)
+from .bench_whiteboard import random_stroke
+
+STUDENT_ACTIONS = {
+    'ws_chat': 4,
+    'ws_participant_update': 2,
+    'http_get_participants': 2,
+    'http_send_chat': 2,
+}
+TRAINER_ACTIONS = {
+    'ws_chat': 2,
+    'ws_whiteboard_op': 5,
+    'http_get_participants': 2,
+    'http_update_whiteboard': 1,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def create_rooms(rooms, students):
+    """Fixture rooms whose participants are already marked present, as after JoinVirtualClassroomView."""
+    created = []
+    for index in range(rooms):
+        virtual_classroom, trainer, users = create_meeting(f'load{index}', students)
+        ClassroomParticipant.objects.bulk_create(
+            [ClassroomParticipant(virtual_classroom=virtual_classroom, user=trainer,
+                                  role='host', is_present=True)] +
+            [ClassroomParticipant(virtual_classroom=virtual_classroom, user=user, is_present=True)
+             for user in users]
+        )
+        Whiteboard.objects.create(virtual_classroom=virtual_classroom)
+        created.append((virtual_classroom.meeting_id, trainer, users))
+    return created
+
+
+class Participant:
+    def __init__(self, meeting_id, user, is_trainer, seed):
+        self.meeting_id = meeting_id
+        self.user = user
+        self.is_trainer = is_trainer
+        self.rng = random.Random(seed)
+        self.socket = None
+        self.client = AsyncClient()
+        self.chat_sent = {}
+        self.receiver = None
+
+    async def connect(self, application):
+        self.socket = WebsocketCommunicator(application, f'/ws/classroom/{self.meeting_id}/')
+        self.socket.scope['user'] = self.user
+        connected, _ = await self.socket.connect()
+        if not connected:
+            raise RuntimeError('socket was refused')
+        await self.client.aforce_login(self.user)
+        await self.socket.send_json_to({'type': 'join', 'user_id': self.user.pk, 'username': self.user.username})
+
+
+class LoadTest:
+    def __init__(self, options):
+        self.options = options
+        self.latencies = {}
+        self.counts = {'ws_sent': 0, 'ws_received': 0, 'http_requests': 0, 'http_errors': 0}
+        self.received_types = {}
+
+    def record(self, action, seconds):
+        self.latencies.setdefault(action, []).append(seconds)
+
+    async def receive_loop(self, participant):
+        while True:
+            payload = await participant.socket.receive_json_from(timeout=3600)
+            self.counts['ws_received'] += 1
+            kind = payload.get('type')
+            self.received_types[kind] = self.received_types.get(kind, 0) + 1
+            if kind == 'chat_message':
+                sent_at = participant.chat_sent.pop(payload.get('message'), None)
+                if sent_at is not None:
+                    self.record('ws_chat', time.perf_counter() - sent_at)
+
+    async def send(self, participant, payload):
+        await participant.socket.send_json_to(payload)
+        self.counts['ws_sent'] += 1
+
+    async def request(self, action, method, url, data=None):
+        started = time.perf_counter()
+        response = await method(url, data or {})
+        self.record(action, time.perf_counter() - started)
+        self.counts['http_requests'] += 1
+        if response.status_code != 200:
+            self.counts['http_errors'] += 1
+
+    async def act(self, participant, action, step):
+        user = participant.user
+        meeting_id = participant.meeting_id
+        if action == 'ws_chat':
+            text = f'{user.pk}:{step}'
+            participant.chat_sent[text] = time.perf_counter()
+            await self.send(participant, {'type': 'chat_message', 'user_id': user.pk,
+                                          'username': user.username, 'message': text})
+        elif action == 'ws_participant_update':
+            await self.send(participant, {'type': 'participant_update', 'user_id': user.pk,
+                                          'is_muted': participant.rng.random() < 0.5,
+                                          'raise_hand': participant.rng.random() < 0.2})
+        elif action == 'ws_whiteboard_op':
+            await self.send(participant, {'type': 'whiteboard_op',
+                                          'op': random_stroke(participant.rng, self.options['points'])})
+        elif action == 'http_get_participants':
+            await self.request(action, participant.client.get, reverse('get_participants', args=[meeting_id]))
+        elif action == 'http_send_chat':
+            await self.request(action, participant.client.post, reverse('send_chat_message', args=[meeting_id]),
+                               {'message': f'http {user.pk}:{step}'})
+        elif action == 'http_update_whiteboard':
+            canvas = 'data:image/png;base64,' + 'A' * self.options['canvas_bytes']
+            await self.request(action, participant.client.post, reverse('update_whiteboard', args=[meeting_id]),
+                               {'canvas_data': canvas})
+
+    async def run_participant(self, participant):
+        mix = TRAINER_ACTIONS if participant.is_trainer else STUDENT_ACTIONS
+        names, weights = list(mix), list(mix.values())
+        think = self.options['think_ms'] / 1000
+        # Stagger start so rooms do not move in lockstep
+        await asyncio.sleep(participant.rng.random() * think)
+        for step in range(self.options['actions']):
+            await self.act(participant, participant.rng.choices(names, weights)[0], step)
+            await asyncio.sleep(think)
+
+    async def run(self, rooms):
+        application = URLRouter(websocket_urlpatterns)
+        participants = []
+        for room_index, (meeting_id, trainer, users) in enumerate(rooms):
+            for user in [trainer, *users]:
+                participants.append(Participant(
+                    meeting_id, user, user is trainer,
+                    seed=self.options['seed'] * 1_000_003 + room_index * 10_007 + user.pk
+                ))
+
+        queries = QueryCounter()
+        await database_sync_to_async(queries.install)()
+
+        # Connect phase: traced memory and queries per connection
+        tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        for participant in participants:
+            await participant.connect(application)
+        connect_seconds = time.perf_counter() - started
+        memory_after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        connect_queries = queries.count
+
+        for participant in participants:
+            participant.receiver = asyncio.ensure_future(self.receive_loop(participant))
+        # Let join notifications settle before the timed phase
+        await asyncio.sleep(0.2)
+        self.counts['ws_received'] = 0
+        self.received_types = {}
+        fanout.reset_stats()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(self.run_participant(p) for p in participants))
+        load_seconds = time.perf_counter() - started
+        # Give the last broadcasts and coalesced ticks time to arrive
+        await asyncio.sleep(self.options['drain_ms'] / 1000)
+        await database_sync_to_async(chat_journal.flush)()
+        await database_sync_to_async(presence.flush_all)()
+        load_queries = queries.count - connect_queries
+
+        for participant in participants:
+            participant.receiver.cancel()
+        await asyncio.gather(*(p.receiver for p in participants), return_exceptions=True)
+        for participant in participants:
+            await participant.socket.disconnect()
+        await database_sync_to_async(queries.uninstall)()
+
+        connections = len(participants)
+        actions = connections * self.options['actions']
+        lost_chats = sum(len(p.chat_sent) for p in participants)
+        return {
+            'connections': connections,
+            'connect': {
+                'seconds': round(connect_seconds, 3),
+                'queries': connect_queries,
+                'queries_per_connection': round(connect_queries / connections, 2),
+                'traced_bytes_per_connection': round((memory_after - memory_before) / connections),
+            },
+            'load': {
+                'seconds': round(load_seconds, 3),
+                'actions': actions,
+                'actions_per_sec': round(actions / load_seconds, 1),
+                'ws_sent_per_sec': round(self.counts['ws_sent'] / load_seconds, 1),
+                'ws_delivered_per_sec': round(self.counts['ws_received'] / load_seconds, 1),
+                'http_requests_per_sec': round(self.counts['http_requests'] / load_seconds, 1),
+                'queries': load_queries,
+                'queries_per_action': round(load_queries / actions, 2) if actions else 0.0,
+            },
+            'counts': {**self.counts, 'ws_chat_unacknowledged': lost_chats},
+            'delivered_by_type': self.received_types,
+            'fanout': fanout.stats(),
+            'latency': {
+                action: {**summarize_ms(samples), 'count': len(samples), 'histogram_ms': histogram_ms(samples)}
+                for action, samples in sorted(self.latencies.items())
+            },
+        }
+
+
+class Command(BaseCommand):
+    help = 'Load-test live classrooms (sockets and AJAX endpoints) and report throughput, latency, queries and memory as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=2)
+        parser.add_argument('--participants', type=int, default=20, help='students per room (plus one trainer)')
+        parser.add_argument('--actions', type=int, default=20, help='actions per participant')
+        parser.add_argument('--think-ms', type=float, default=100, help='pause between a participant\'s actions')
+        parser.add_argument('--drain-ms', type=float, default=500, help='wait for in-flight broadcasts at the end')
+        parser.add_argument('--points', type=int, default=60, help='points per whiteboard stroke')
+        parser.add_argument('--canvas-bytes', type=int, default=50_000, help='size of an update_whiteboard image')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--in-memory', action='store_true', help='use an in-memory SQLite test database')
+        parser.add_argument('--output', help='also write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        with benchmark_database(on_disk=not options['in_memory']) as connection, in_memory_channel_layer(), \
+                override_settings(ALLOWED_HOSTS=['testserver']):
+            presence.reset_store()
+            rooms = create_rooms(options['rooms'], options['participants'])
+            result = asyncio.run(LoadTest(options).run(rooms))
+            vendor = connection.vendor
+
+        report = {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': vendor,
+            'config': {key: options[key] for key in (
+                'rooms', 'participants', 'actions', 'think_ms', 'points', 'canvas_bytes', 'seed', 'in_memory'
+            )},
+            **result,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+        self.stdout.write(output)
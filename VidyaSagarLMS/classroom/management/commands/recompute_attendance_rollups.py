@@ -0,0 +1,38 @@
+"""
+Rebuild the per-enrollment attendance rollups from Attendance rows.
+
+Signals keep the counters current for normal saves; run this once after
+migrating, and after any bulk import or queryset.update() that bypasses them:
+
+    python manage.py recompute_attendance_rollups
+    python manage.py recompute_attendance_rollups --classroom CL001 --classroom CL002
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from classroom.models import Classroom
+from classroom.rollups import classrooms_with_held_sessions, recompute_classroom
+from dashboard.fragments import invalidate_all
+
+
+class Command(BaseCommand):
+    help = 'Recompute ClassroomEnrollment attendance counters and percentages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classroom', action='append', dest='classrooms', metavar='CLASSROOM_ID',
+                            help='limit to these classrooms (repeatable)')
+
+    def handle(self, *args, **options):
+        classrooms = Classroom.objects.all()
+        if options['classrooms']:
+            classrooms = classrooms.filter(pk__in=options['classrooms'])
+
+        count = enrollments = 0
+        # Held-session counts for every classroom come from the one query
+        for classroom in classrooms_with_held_sessions(classrooms).iterator(chunk_size=200):
+            with transaction.atomic():
+                enrollments += recompute_classroom(classroom, held=classroom.held)
+            count += 1
+        # Cached dashboard tiles show these percentages
+        invalidate_all()
+        self.stdout.write(f'Recomputed attendance for {enrollments} enrollments in {count} classrooms.')
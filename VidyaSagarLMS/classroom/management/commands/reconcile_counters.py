@@ -0,0 +1,40 @@
+"""
+Check the denormalized classroom and batch counters against the rows they
+count, and fix any that drifted:
+
+    python manage.py reconcile_counters
+    python manage.py reconcile_counters --dry-run
+
+Run once after migrating, after bulk imports, and periodically (e.g. nightly)
+to catch the rare concurrent batch recount that lost a race.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from classroom.counters import drifted_batches, drifted_classrooms, recount_batches, recount_classrooms
+from classroom.models import Batch, Classroom
+
+
+class Command(BaseCommand):
+    help = 'Reconcile Classroom.enrolled_count/session_count and Batch.student_count.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='report drift without fixing it')
+        parser.add_argument('--verbose-ids', action='store_true', help='list the drifted classrooms and batches')
+
+    def handle(self, *args, **options):
+        classroom_ids = list(drifted_classrooms().values_list('pk', flat=True))
+        batch_ids = list(drifted_batches().values_list('pk', flat=True))
+        self.stdout.write(f'{len(classroom_ids)} classrooms and {len(batch_ids)} batches have drifted counters.')
+        if options['verbose_ids']:
+            for pk in classroom_ids:
+                self.stdout.write(f'  classroom {pk}')
+            for pk in batch_ids:
+                self.stdout.write(f'  batch {pk}')
+        if options['dry_run'] or not (classroom_ids or batch_ids):
+            return
+
+        with transaction.atomic():
+            fixed_classrooms = recount_classrooms(Classroom.objects.filter(pk__in=classroom_ids))
+            fixed_batches = recount_batches(Batch.objects.filter(pk__in=batch_ids))
+        self.stdout.write(f'Fixed {fixed_classrooms} classrooms and {fixed_batches} batches.')
@@ -0,0 +1,50 @@
+"""
+Generate or reschedule classroom sessions from each classroom's schedule
+(classroom/scheduling.py):
+
+    python manage.py schedule_sessions --classroom CLS001 CLS002
+    python manage.py schedule_sessions --status planned ongoing --calendar
+
+Completed sessions and sessions with attendance stay where they are; every
+other session moves to the next free class day. Everything selected is
+written in one transaction.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from classroom.models import Classroom
+from classroom.scheduling import SchedulingError, schedule_classrooms
+
+CustomUser = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Create or move ClassroomSession rows to follow each classroom's class days and holidays."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classroom', nargs='+', default=[], help='classroom ids (default: all selected by --status)')
+        parser.add_argument('--status', nargs='+', default=['planned', 'ongoing'])
+        parser.add_argument('--calendar', action='store_true', help='also create or move mirror calendar events')
+        parser.add_argument('--created-by', help='username recorded on new calendar events')
+
+    def handle(self, *args, **options):
+        classrooms = Classroom.objects.select_related('trainer', 'created_by')
+        if options['classroom']:
+            classrooms = classrooms.filter(classroom_id__in=options['classroom'])
+        else:
+            classrooms = classrooms.filter(status__in=options['status'])
+
+        user = None
+        if options['created_by']:
+            user = CustomUser.objects.filter(username=options['created_by']).first()
+            if user is None:
+                raise CommandError(f"No user {options['created_by']!r}.")
+
+        try:
+            totals = schedule_classrooms(classrooms, calendar=options['calendar'], user=user)
+        except SchedulingError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(
+            f"{totals['created']} sessions created, {totals['moved']} moved, "
+            f"{totals['kept']} kept, {totals['unscheduled']} did not fit."
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0002_virtualclassroom_screenrecording_chatmessage_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='chatmessage',
+            options={'ordering': ['timestamp', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['virtual_classroom', 'id'], name='chat_room_id_idx'),
+        ),
+    ]
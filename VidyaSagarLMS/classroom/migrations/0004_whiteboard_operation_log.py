@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0003_chatmessage_timeline_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='whiteboard',
+            name='last_sequence',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='whiteboard',
+            name='snapshot',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='whiteboard',
+            name='snapshot_sequence',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='WhiteboardOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('data', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('whiteboard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='operations', to='classroom.whiteboard')),
+            ],
+            options={
+                'ordering': ['sequence'],
+                'unique_together': {('whiteboard', 'sequence')},
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:06
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+STATUS_FIELDS = {
+    'present': 'present_count',
+    'late': 'late_count',
+    'absent': 'absent_count',
+    'excused': 'excused_count',
+}
+
+
+def count_existing_attendance(apps, schema_editor):
+    # The rules of classroom/rollups.py, on the historical models
+    Classroom = apps.get_model('classroom', 'Classroom')
+    ClassroomEnrollment = apps.get_model('classroom', 'ClassroomEnrollment')
+    Attendance = apps.get_model('classroom', 'Attendance')
+
+    held = dict(Classroom.objects.annotate(
+        held=Count('classroom_sessions', filter=Q(classroom_sessions__is_completed=True)),
+    ).values_list('pk', 'held'))
+    marks = {}
+    for classroom_id, student_id, status, n in Attendance.objects.filter(status__in=STATUS_FIELDS).values_list(
+        'classroom_session__classroom_id', 'student_id', 'status',
+    ).annotate(n=Count('pk')).order_by():
+        marks.setdefault((classroom_id, student_id), {})[STATUS_FIELDS[status]] = n
+
+    enrollments = list(ClassroomEnrollment.objects.all())
+    for enrollment in enrollments:
+        counts = marks.get((enrollment.classroom_id, enrollment.student_id), {})
+        enrollment.sessions_held = held.get(enrollment.classroom_id, 0)
+        for field in STATUS_FIELDS.values():
+            setattr(enrollment, field, counts.get(field, 0))
+        attended = enrollment.present_count + enrollment.late_count
+        counted = max(enrollment.sessions_held - enrollment.excused_count, attended + enrollment.absent_count)
+        enrollment.attendance_percentage = (
+            (Decimal(attended) * 100 / counted).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            if counted > 0 else Decimal('0.00')
+        )
+    ClassroomEnrollment.objects.bulk_update(
+        enrollments, ['sessions_held', *STATUS_FIELDS.values(), 'attendance_percentage'], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0004_whiteboard_operation_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classroomenrollment',
+            name='absent_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='classroomenrollment',
+            name='excused_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='classroomenrollment',
+            name='late_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='classroomenrollment',
+            name='present_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='classroomenrollment',
+            name='sessions_held',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_existing_attendance, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:10
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_existing_rows(apps, schema_editor):
+    Batch = apps.get_model('classroom', 'Batch')
+    Classroom = apps.get_model('classroom', 'Classroom')
+    ClassroomEnrollment = apps.get_model('classroom', 'ClassroomEnrollment')
+    ClassroomSession = apps.get_model('classroom', 'ClassroomSession')
+
+    def count(queryset, group_field, field='pk', distinct=False):
+        counted = queryset.order_by().values(group_field).annotate(n=Count(field, distinct=distinct)).values('n')
+        return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+    Classroom.objects.update(
+        enrolled_count=count(ClassroomEnrollment.objects.filter(classroom=OuterRef('pk')), 'classroom'),
+        session_count=count(ClassroomSession.objects.filter(classroom=OuterRef('pk')), 'classroom'),
+    )
+    Batch.objects.update(student_count=count(
+        ClassroomEnrollment.objects.filter(classroom__batch=OuterRef('pk')), 'classroom__batch', 'student', True,
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0005_attendance_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='student_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='classroom',
+            name='enrolled_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='classroom',
+            name='session_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_existing_rows, migrations.RunPython.noop),
+    ]
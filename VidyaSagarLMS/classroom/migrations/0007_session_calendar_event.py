@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_app', '0003_recurrence_rules_and_occurrences'),
+        ('classroom', '0006_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classroomsession',
+            name='calendar_event',
+            field=models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='classroom_session', to='calendar_app.calendarevent'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0007_session_calendar_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgendaEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('source_type', models.CharField(choices=[('session', 'Classroom Session'), ('event', 'Calendar Event')], max_length=10)),
+                ('source_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=200)),
+                ('classroom', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='classroom.classroom')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agenda_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['start'],
+                'indexes': [models.Index(fields=['user', 'start'], name='agenda_user_start_idx'), models.Index(fields=['source_type', 'source_id'], name='agenda_source_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0008_agenda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='sequence',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from courses.models import Course, Module, Session
 import uuid
@@ -6,6 +6,21 @@ from accounts.models import StudentProfile
 
 CustomUser = get_user_model()
 
+
+def without_counters(instance, counter_fields, kwargs):
+    """
+    Save kwargs that leave ``counter_fields`` out of an UPDATE of a loaded
+    row. The counters only move through F() updates (counters.py,
+    enrollment.py); writing back the value loaded earlier would undo any
+    that ran since.
+    """
+    if instance._state.adding or kwargs.get('force_insert') or kwargs.get('update_fields') is not None:
+        return kwargs
+    return {**kwargs, 'update_fields': [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in counter_fields
+    ]}
+
 class Batch(models.Model):
     batch_id = models.CharField(max_length=20, unique=True, primary_key=True)
     batch_name = models.CharField(max_length=200)
@@ -16,6 +31,9 @@ class Batch(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, related_name='created_batches')
     
+    # Distinct students enrolled in any of the batch's classrooms (counters.py)
+    student_count = models.PositiveIntegerField(default=0, editable=False)
+    
     class Meta:
         verbose_name_plural = "Batches"
         ordering = ['-start_date']
@@ -23,16 +41,16 @@ class Batch(models.Model):
     def __str__(self):
         return f"{self.batch_id} - {self.batch_name}"
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **without_counters(self, ['student_count'], kwargs))
+    
     @property
     def total_classrooms(self):
         return self.classrooms.count()
     
     @property
     def total_students(self):
-        from django.db.models import Count
-        return StudentProfile.objects.filter(
-            user__classroomenrollment__classroom__batch=self
-        ).distinct().count()
+        return self.student_count
 
 class Classroom(models.Model):
     STATUS_CHOICES = [
@@ -67,6 +85,10 @@ class Classroom(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='planned')
     max_students = models.IntegerField(default=30)
     
+    # Maintained counters (counters.py); reconcile with `manage.py reconcile_counters`
+    enrolled_count = models.PositiveIntegerField(default=0, editable=False)
+    session_count = models.PositiveIntegerField(default=0, editable=False)
+    
     # Manager info
     created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, 
                                  related_name='created_classrooms',
@@ -80,9 +102,12 @@ class Classroom(models.Model):
     def __str__(self):
         return f"{self.classroom_id} - {self.classroom_name}"
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **without_counters(self, ['enrolled_count', 'session_count'], kwargs))
+    
     @property
     def current_students(self):
-        return self.students.count()
+        return self.enrolled_count
     
     @property
     def available_seats(self):
@@ -100,7 +125,7 @@ class Classroom(models.Model):
     
     @property
     def total_sessions(self):
-        return self.sessions.count()
+        return self.session_count
     
     def get_trainer_profile(self):
         try:
@@ -128,6 +153,13 @@ class ClassroomEnrollment(models.Model):
     grade = models.CharField(max_length=5, blank=True, null=True)
     attendance_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
     comments = models.TextField(blank=True)
+
+    # Attendance rollup (classroom/rollups.py), kept current by signals
+    sessions_held = models.PositiveIntegerField(default=0, editable=False)
+    present_count = models.PositiveIntegerField(default=0, editable=False)
+    late_count = models.PositiveIntegerField(default=0, editable=False)
+    absent_count = models.PositiveIntegerField(default=0, editable=False)
+    excused_count = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         unique_together = ['classroom', 'student']
@@ -136,6 +168,11 @@ class ClassroomEnrollment(models.Model):
     def __str__(self):
         return f"{self.student.username} in {self.classroom.classroom_name}"
     
+    def save(self, *args, **kwargs):
+        # Counter and rollup signals run inside the same transaction as the row
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+    
     @property
     def student_profile(self):
         try:
@@ -153,6 +190,9 @@ class ClassroomSession(models.Model):
     completed_date = models.DateField(null=True, blank=True)
     notes = models.TextField(blank=True)
     attendance_taken = models.BooleanField(default=False)
+    # Mirror event created by scheduling.py, moved along with the session
+    calendar_event = models.OneToOneField('calendar_app.CalendarEvent', on_delete=models.SET_NULL,
+                                          null=True, blank=True, editable=False, related_name='classroom_session')
     
     class Meta:
         unique_together = ['classroom', 'session']
@@ -160,6 +200,10 @@ class ClassroomSession(models.Model):
     
     def __str__(self):
         return f"{self.session} in {self.classroom} on {self.scheduled_date}"
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
 
 class Attendance(models.Model):
     classroom_session = models.ForeignKey(ClassroomSession, on_delete=models.CASCADE, related_name='attendance_records')
@@ -182,6 +226,10 @@ class Attendance(models.Model):
     
     def __str__(self):
         return f"{self.student.username} - {self.status} - {self.classroom_session}"
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
 
 
 CustomUser = get_user_model()
@@ -258,9 +306,29 @@ class Whiteboard(models.Model):
     last_modified = models.DateTimeField(auto_now=True)
     last_modified_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True)
     
+    # Operation log state (see whiteboard.py): operations up to snapshot_sequence
+    # are folded into snapshot, later ones live in WhiteboardOperation
+    snapshot = models.TextField(blank=True)  # JSON list of operations
+    snapshot_sequence = models.PositiveIntegerField(default=0)
+    last_sequence = models.PositiveIntegerField(default=0)
+    
     def __str__(self):
         return f"Whiteboard for {self.virtual_classroom}"
 
+class WhiteboardOperation(models.Model):
+    whiteboard = models.ForeignKey(Whiteboard, on_delete=models.CASCADE, related_name='operations')
+    sequence = models.PositiveIntegerField()
+    user = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True)
+    data = models.TextField()  # compact JSON of one operation
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['whiteboard', 'sequence']
+        ordering = ['sequence']
+    
+    def __str__(self):
+        return f"Op {self.sequence} on {self.whiteboard}"
+
 class ChatMessage(models.Model):
     virtual_classroom = models.ForeignKey(VirtualClassroom, on_delete=models.CASCADE, related_name='messages')
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
@@ -268,9 +336,15 @@ class ChatMessage(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     is_system = models.BooleanField(default=False)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    # Per-meeting send order from the socket (chat_journal.py); None for other sources
+    sequence = models.PositiveIntegerField(null=True, blank=True, editable=False)
     
     class Meta:
-        ordering = ['timestamp']
+        ordering = ['timestamp', 'id']
+        indexes = [
+            # Cursor reads of a room's history, in id order (see views.get_chat_messages)
+            models.Index(fields=['virtual_classroom', 'id'], name='chat_room_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username}: {self.message[:50]}"
@@ -297,4 +371,34 @@ class BreakoutRoom(models.Model):
     ended_at = models.DateTimeField(null=True, blank=True)
     
     def __str__(self):
-        return f"{self.room_name} in {self.virtual_classroom}"
\ No newline at end of file
+        return f"{self.room_name} in {self.virtual_classroom}"
+
+class AgendaEntry(models.Model):
+    """
+    One upcoming classroom session or calendar event occurrence for one
+    trainer or student (agenda.py). Indexed on (user, start) so "what is
+    next for me" is a single range scan.
+    """
+    SOURCE_CHOICES = [
+        ('session', 'Classroom Session'),
+        ('event', 'Calendar Event'),
+    ]
+    
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='agenda_entries')
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    source_type = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    source_id = models.BigIntegerField()
+    # Set for sessions, so a classroom's entries need no join
+    classroom = models.ForeignKey(Classroom, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    title = models.CharField(max_length=200)
+    
+    class Meta:
+        ordering = ['start']
+        indexes = [
+            models.Index(fields=['user', 'start'], name='agenda_user_start_idx'),
+            models.Index(fields=['source_type', 'source_id'], name='agenda_source_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.title} at {self.start}"
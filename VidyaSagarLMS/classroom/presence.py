@@ -0,0 +1,427 @@
+# classroom/presence.py
+"""
+Live participant roster for virtual classrooms.
+
+The socket consumer records joins, leaves and mute/hand/video toggles here
+instead of writing ClassroomParticipant on every event. Changed entries are
+marked dirty and written back with bulk_update by a background flusher and
+when a meeting ends.
+"""
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .background import start_periodic
+from .models import VirtualClassroom, ClassroomParticipant
+
+DEFAULT_PRESENCE = {
+    'BACKEND': 'classroom.presence.InMemoryPresenceStore',
+    'CACHE_ALIAS': 'default',
+    'FLUSH_INTERVAL': 5,
+}
+
+# Fields the roster owns and writes back to ClassroomParticipant
+FLUSH_FIELDS = ['role', 'is_present', 'raise_hand', 'is_muted', 'video_enabled', 'join_time', 'leave_time']
+TOGGLE_FIELDS = ['raise_hand', 'is_muted', 'video_enabled']
+
+
+def _meta(room):
+    return {k: v for k, v in room.items() if k not in ('participants', 'dirty')}
+
+
+def presence_settings():
+    return {**DEFAULT_PRESENCE, **getattr(settings, 'CLASSROOM_PRESENCE', {})}
+
+
+class PresenceStore:
+    """
+    Roster storage. Subclasses decide where a room dict lives and how a
+    room is locked for a read-modify-write.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    def _locked(self, meeting_id):
+        return self._lock
+
+    def _reading(self, meeting_id):
+        # Held while copying out of a room that another thread may be changing
+        return self._lock
+
+    def _read(self, meeting_id):
+        raise NotImplementedError
+
+    def _write(self, meeting_id, room):
+        raise NotImplementedError
+
+    def _delete(self, meeting_id):
+        raise NotImplementedError
+
+    def meeting_ids(self):
+        raise NotImplementedError
+
+    def has_room(self, meeting_id):
+        return self._read(meeting_id) is not None
+
+    def room_meta(self, meeting_id):
+        room = self._read(meeting_id)
+        if room is None:
+            return None
+        return _meta(room)
+
+    def load_room(self, meeting_id, meta, participants):
+        with self._locked(meeting_id):
+            if self._read(meeting_id) is not None:
+                return
+            room = dict(meta)
+            room['participants'] = {p['user_id']: p for p in participants}
+            room['dirty'] = set()
+            self._write(meeting_id, room)
+
+    def upsert(self, meeting_id, user_id, fields, mark_dirty=True):
+        with self._locked(meeting_id):
+            room = self._read(meeting_id)
+            if room is None:
+                return None
+            state = room['participants'].setdefault(user_id, {'id': None, 'user_id': user_id})
+            state.update(fields)
+            if mark_dirty:
+                room['dirty'].add(user_id)
+            self._write(meeting_id, room)
+            return dict(state)
+
+    def get(self, meeting_id, user_id):
+        with self._reading(meeting_id):
+            room = self._read(meeting_id)
+            if room is None or user_id not in room['participants']:
+                return None
+            return dict(room['participants'][user_id])
+
+    def participants(self, meeting_id):
+        with self._reading(meeting_id):
+            room = self._read(meeting_id)
+            if room is None:
+                return None
+            return [dict(p) for p in room['participants'].values()]
+
+    def pop_dirty(self, meeting_id):
+        """The room's meta and its dirty entries, taken together under the lock."""
+        with self._locked(meeting_id):
+            room = self._read(meeting_id)
+            if room is None or not room['dirty']:
+                return None, []
+            meta = _meta(room)
+            states = [dict(room['participants'][uid]) for uid in room['dirty']]
+            room['dirty'] = set()
+            self._write(meeting_id, room)
+            return meta, states
+
+    def mark_dirty(self, meeting_id, user_ids):
+        with self._locked(meeting_id):
+            room = self._read(meeting_id)
+            if room is None:
+                return
+            room['dirty'].update(user_ids)
+            self._write(meeting_id, room)
+
+    def set_ids(self, meeting_id, ids_by_user):
+        with self._locked(meeting_id):
+            room = self._read(meeting_id)
+            if room is None:
+                return
+            for user_id, pk in ids_by_user.items():
+                if user_id in room['participants']:
+                    room['participants'][user_id]['id'] = pk
+            self._write(meeting_id, room)
+
+    def drop_room(self, meeting_id):
+        with self._locked(meeting_id):
+            self._delete(meeting_id)
+
+    def drop_if_idle(self, meeting_id):
+        # Forget rooms nobody is in any more once everything has been flushed
+        with self._locked(meeting_id):
+            room = self._read(meeting_id)
+            if room is None or room['dirty']:
+                return False
+            if any(p.get('is_present') for p in room['participants'].values()):
+                return False
+            self._delete(meeting_id)
+            return True
+
+
+class InMemoryPresenceStore(PresenceStore):
+    """Process-local roster; enough for a single ASGI worker."""
+
+    def __init__(self):
+        super().__init__()
+        self._rooms = {}
+
+    def _read(self, meeting_id):
+        return self._rooms.get(str(meeting_id))
+
+    def _write(self, meeting_id, room):
+        self._rooms[str(meeting_id)] = room
+
+    def _delete(self, meeting_id):
+        self._rooms.pop(str(meeting_id), None)
+
+    def meeting_ids(self):
+        with self._lock:
+            return list(self._rooms)
+
+
+class CachePresenceStore(PresenceStore):
+    """
+    Roster kept in a Django cache alias so several workers can share it.
+    Point CLASSROOM_PRESENCE['CACHE_ALIAS'] at a local Redis (or any shared
+    cache). Each read-modify-write of a room, and of the room index, holds a
+    lock key taken with cache.add(), which is atomic across processes on
+    shared backends; a lock whose holder died expires after LOCK_TIMEOUT.
+    """
+    key_prefix = 'classroom:presence:'
+    index_key = 'classroom:presence:rooms'
+    LOCK_TIMEOUT = 5
+    LOCK_POLL = 0.005
+
+    def __init__(self):
+        super().__init__()
+        self.cache = caches[presence_settings()['CACHE_ALIAS']]
+
+    @contextmanager
+    def _cache_lock(self, key):
+        token = uuid.uuid4().hex
+        while not self.cache.add(key, token, self.LOCK_TIMEOUT):
+            time.sleep(self.LOCK_POLL)
+        try:
+            yield
+        finally:
+            # Not ours any more if it expired and someone else took it
+            if self.cache.get(key) == token:
+                self.cache.delete(key)
+
+    def _locked(self, meeting_id):
+        return self._cache_lock(f'{self.key_prefix}lock:{meeting_id}')
+
+    def _reading(self, meeting_id):
+        # Every read is a fresh copy from the cache
+        return nullcontext()
+
+    def _read(self, meeting_id):
+        return self.cache.get(self.key_prefix + str(meeting_id))
+
+    def _write(self, meeting_id, room):
+        self.cache.set(self.key_prefix + str(meeting_id), room, None)
+        if str(meeting_id) not in self.meeting_ids():
+            with self._cache_lock(self.index_key + ':lock'):
+                rooms = set(self.cache.get(self.index_key, []))
+                rooms.add(str(meeting_id))
+                self.cache.set(self.index_key, list(rooms), None)
+
+    def _delete(self, meeting_id):
+        self.cache.delete(self.key_prefix + str(meeting_id))
+        with self._cache_lock(self.index_key + ':lock'):
+            rooms = set(self.cache.get(self.index_key, []))
+            rooms.discard(str(meeting_id))
+            self.cache.set(self.index_key, list(rooms), None)
+
+    def meeting_ids(self):
+        return list(self.cache.get(self.index_key, []))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = import_string(presence_settings()['BACKEND'])()
+    return _store
+
+
+def reset_store():
+    global _store
+    _store = None
+
+
+def participant_state(participant, user=None):
+    user = user or participant.user
+    return {
+        'id': participant.pk,
+        'user_id': user.pk,
+        'username': user.username,
+        'full_name': user.get_full_name() or user.username,
+        'user_role': user.role,
+        'role': participant.role,
+        'is_present': participant.is_present,
+        'raise_hand': participant.raise_hand,
+        'is_muted': participant.is_muted,
+        'video_enabled': participant.video_enabled,
+        'join_time': participant.join_time,
+        'leave_time': participant.leave_time,
+    }
+
+
+def ensure_room(meeting_id, meeting=None):
+    """
+    Load a meeting's roster from the database the first time it is used.
+    ``meeting`` is the consumer's connection state and saves the meeting lookup.
+    """
+    store = get_store()
+    if store.has_room(meeting_id):
+        return True
+    if meeting is None:
+        try:
+            virtual_classroom = VirtualClassroom.objects.select_related('classroom').get(meeting_id=meeting_id)
+        except (VirtualClassroom.DoesNotExist, ValidationError):
+            return False
+        meeting = {
+            'virtual_classroom_id': virtual_classroom.pk,
+            'trainer_id': virtual_classroom.classroom.trainer_id,
+        }
+    participants = ClassroomParticipant.objects.filter(
+        virtual_classroom_id=meeting['virtual_classroom_id']
+    ).select_related('user')
+    store.load_room(
+        meeting_id,
+        {
+            'virtual_classroom_id': meeting['virtual_classroom_id'],
+            'trainer_id': meeting['trainer_id'],
+        },
+        [participant_state(p) for p in participants],
+    )
+    return True
+
+
+def join(meeting_id, user, meeting=None):
+    """Mark a user present. Hits the database only when the room is not loaded yet."""
+    if not ensure_room(meeting_id, meeting):
+        return None
+    store = get_store()
+    fields = {'is_present': True, 'join_time': timezone.now(), 'leave_time': None}
+    if store.get(meeting_id, user.pk) is None:
+        meta = store.room_meta(meeting_id)
+        fields.update({
+            'username': user.username,
+            'full_name': user.get_full_name() or user.username,
+            'user_role': user.role,
+            'role': 'host' if user.pk == meta['trainer_id'] else 'participant',
+            'raise_hand': False,
+            'is_muted': False,
+            'video_enabled': False,
+        })
+    return store.upsert(meeting_id, user.pk, fields)
+
+
+def leave(meeting_id, user_id):
+    store = get_store()
+    if store.get(meeting_id, user_id) is None:
+        return None
+    return store.upsert(meeting_id, user_id, {
+        'is_present': False,
+        'raise_hand': False,
+        'leave_time': timezone.now(),
+    })
+
+
+def update(meeting_id, user_id, data):
+    """Apply mute/hand/video toggles from a socket message."""
+    store = get_store()
+    if store.get(meeting_id, user_id) is None:
+        return None
+    changes = {field: bool(data[field]) for field in TOGGLE_FIELDS if field in data}
+    if not changes:
+        return store.get(meeting_id, user_id)
+    return store.upsert(meeting_id, user_id, changes)
+
+
+def sync_participant(participant):
+    """Mirror a row saved by an HTTP view into a loaded roster without re-flushing it."""
+    meeting_id = participant.virtual_classroom.meeting_id
+    store = get_store()
+    if store.has_room(meeting_id):
+        store.upsert(meeting_id, participant.user_id, participant_state(participant), mark_dirty=False)
+
+
+def get_participants(meeting_id):
+    """Present participants from memory, or None when the roster is not loaded."""
+    participants = get_store().participants(meeting_id)
+    if participants is None:
+        return None
+    return [p for p in participants if p.get('is_present')]
+
+
+def flush(meeting_id):
+    """Write dirty roster entries back with one bulk_update (plus bulk_create for new rows)."""
+    store = get_store()
+    meta, states = store.pop_dirty(meeting_id)
+    if not states:
+        return 0
+    try:
+        existing = {
+            p.user_id: p for p in ClassroomParticipant.objects.filter(
+                virtual_classroom_id=meta['virtual_classroom_id'],
+                user_id__in=[s['user_id'] for s in states]
+            )
+        }
+        to_update = []
+        to_create = []
+        for state in states:
+            participant = existing.get(state['user_id'])
+            if participant is None:
+                participant = ClassroomParticipant(
+                    virtual_classroom_id=meta['virtual_classroom_id'],
+                    user_id=state['user_id']
+                )
+                to_create.append(participant)
+            else:
+                to_update.append(participant)
+            for field in FLUSH_FIELDS:
+                if field in state:
+                    setattr(participant, field, state[field])
+
+        if to_update:
+            ClassroomParticipant.objects.bulk_update(to_update, FLUSH_FIELDS)
+        if to_create:
+            ClassroomParticipant.objects.bulk_create(to_create, ignore_conflicts=True)
+            created = ClassroomParticipant.objects.filter(
+                virtual_classroom_id=meta['virtual_classroom_id'],
+                user_id__in=[p.user_id for p in to_create]
+            ).values_list('user_id', 'id')
+            store.set_ids(meeting_id, dict(created))
+    except Exception:
+        # Keep the changes so the next flush retries them
+        store.mark_dirty(meeting_id, [s['user_id'] for s in states])
+        raise
+    return len(states)
+
+
+def flush_all():
+    total = 0
+    store = get_store()
+    for meeting_id in store.meeting_ids():
+        total += flush(meeting_id)
+        store.drop_if_idle(meeting_id)
+    return total
+
+
+def end_meeting(meeting_id):
+    """Flush and forget a meeting's roster; called when the host ends it."""
+    flush(meeting_id)
+    get_store().drop_room(meeting_id)
+
+
+def start_flusher():
+    """Start the background roster flush loop for the running event loop."""
+    start_periodic('presence', presence_settings()['FLUSH_INTERVAL'], flush_all)
@@ -0,0 +1,185 @@
+# classroom/rollups.py
+"""
+Per-enrollment attendance rollups.
+
+Each ClassroomEnrollment carries how many of its classroom's sessions have
+been held and how many times the student was present, late, absent or
+excused. Signals keep them current one row at a time: saving or deleting an
+Attendance moves one counter, and completing (or un-completing) a
+ClassroomSession moves sessions_held for the whole classroom. Every change is
+a single UPDATE with F() expressions, attendance_percentage included, so
+concurrent writers never lose an increment.
+
+Held sessions with no Attendance row count as absences; excused sessions
+are left out of the denominator.
+
+Writes that bypass signals (bulk_create, queryset.update(), raw SQL) leave
+the counters stale until `manage.py recompute_attendance_rollups` runs.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, FloatField, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest
+from django.db.models.lookups import GreaterThan
+
+from .models import Attendance, Classroom, ClassroomEnrollment, ClassroomSession
+
+# Attendance.status -> counter column
+STATUS_FIELDS = {
+    'present': 'present_count',
+    'late': 'late_count',
+    'absent': 'absent_count',
+    'excused': 'excused_count',
+}
+ROLLUP_FIELDS = ['sessions_held', *STATUS_FIELDS.values(), 'attendance_percentage']
+
+PERCENT = DecimalField(max_digits=5, decimal_places=2)
+
+
+def _int(expression):
+    # Counters are PositiveIntegerFields; arithmetic with literals mixes in IntegerField
+    return ExpressionWrapper(expression, output_field=IntegerField())
+
+
+def attended_expression(values=None):
+    values = values or {}
+    return _int(values.get('present_count', F('present_count')) + values.get('late_count', F('late_count')))
+
+
+def counted_expression(values=None):
+    """Sessions the percentage is taken over: held sessions minus excused ones."""
+    values = values or {}
+    recorded = (
+        values.get('present_count', F('present_count')) + values.get('late_count', F('late_count'))
+        + values.get('absent_count', F('absent_count'))
+    )
+    held = values.get('sessions_held', F('sessions_held')) - values.get('excused_count', F('excused_count'))
+    # Attendance can be taken before a session is marked completed
+    return Greatest(_int(held), _int(recorded), output_field=IntegerField())
+
+
+def percentage_expression(values=None):
+    """attendance_percentage computed from the (possibly just updated) counters."""
+    counted = counted_expression(values)
+    # Float arithmetic: integer division would truncate on SQLite
+    return Case(
+        When(GreaterThan(counted, 0), then=ExpressionWrapper(
+            Cast(attended_expression(values), FloatField()) * 100 / counted, output_field=PERCENT,
+        )),
+        default=Value(Decimal('0')),
+        output_field=PERCENT,
+    )
+
+
+def percentage(attended, counted):
+    if counted <= 0:
+        return Decimal('0.00')
+    return (Decimal(attended) * 100 / counted).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def apply_deltas(enrollments, deltas):
+    """
+    Add ``{counter: delta}`` to the enrollments and refresh their percentage,
+    in one UPDATE. Counters stop at 0: one that is already stale (a bulk
+    write that skipped signals) must not fail the delete that lowers it.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    values = {
+        field: _int(Greatest(F(field) + delta, Value(0), output_field=IntegerField())) if delta < 0
+        else _int(F(field) + delta)
+        for field, delta in deltas.items()
+    }
+    return enrollments.update(**values, attendance_percentage=percentage_expression(values))
+
+
+def attendance_changed(classroom_id, student_id, old_status=None, new_status=None):
+    """Move one attendance mark between counters (None means no mark)."""
+    if old_status == new_status:
+        return 0
+    deltas = {}
+    if old_status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[old_status]] = -1
+    if new_status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[new_status]] = deltas.get(STATUS_FIELDS[new_status], 0) + 1
+    enrollments = ClassroomEnrollment.objects.filter(classroom_id=classroom_id, student_id=student_id)
+    return apply_deltas(enrollments, deltas)
+
+
+def sessions_held_changed(classroom_id, delta):
+    """A session of the classroom was completed (+1) or un-completed/removed (-1)."""
+    return apply_deltas(ClassroomEnrollment.objects.filter(classroom_id=classroom_id), {'sessions_held': delta})
+
+
+def held_sessions(classroom_id):
+    return ClassroomSession.objects.filter(classroom_id=classroom_id, is_completed=True).count()
+
+
+def seed_enrollments(classroom_id, enrollments):
+    """
+    Fill new (unsaved) enrollments of one classroom from the rows it already
+    has: one query for held sessions and one grouped Attendance query,
+    however many enrollments.
+    """
+    held = held_sessions(classroom_id)
+    marks = Attendance.objects.filter(
+        classroom_session__classroom_id=classroom_id,
+        student_id__in=[enrollment.student_id for enrollment in enrollments],
+    ).values('student_id', 'status').annotate(n=Count('pk')).order_by()
+    by_student = {}
+    for mark in marks:
+        if mark['status'] in STATUS_FIELDS:
+            by_student.setdefault(mark['student_id'], {})[STATUS_FIELDS[mark['status']]] = mark['n']
+    for enrollment in enrollments:
+        _set_counts(enrollment, held, by_student.get(enrollment.student_id, {}))
+
+
+def seed_enrollment(enrollment):
+    seed_enrollments(enrollment.classroom_id, [enrollment])
+
+
+def _set_counts(enrollment, held, counts):
+    enrollment.sessions_held = held
+    for field in STATUS_FIELDS.values():
+        setattr(enrollment, field, counts.get(field, 0))
+    attended = enrollment.present_count + enrollment.late_count
+    recorded = attended + enrollment.absent_count
+    enrollment.attendance_percentage = percentage(attended, max(held - enrollment.excused_count, recorded))
+
+
+def recompute_classroom(classroom, held=None):
+    """
+    Rebuild every enrollment's rollup in the classroom from the raw rows: one
+    grouped query over Attendance and one bulk_update. ``held`` may be passed
+    in when the caller already annotated it.
+    """
+    if held is None:
+        held = held_sessions(classroom.pk)
+    marks = Attendance.objects.filter(classroom_session__classroom=classroom).values(
+        'student_id', 'status'
+    ).annotate(n=Count('pk')).order_by()
+    by_student = {}
+    for mark in marks:
+        if mark['status'] in STATUS_FIELDS:
+            by_student.setdefault(mark['student_id'], {})[STATUS_FIELDS[mark['status']]] = mark['n']
+
+    enrollments = list(ClassroomEnrollment.objects.filter(classroom=classroom))
+    for enrollment in enrollments:
+        _set_counts(enrollment, held, by_student.get(enrollment.student_id, {}))
+    ClassroomEnrollment.objects.bulk_update(enrollments, ROLLUP_FIELDS, batch_size=500)
+    return len(enrollments)
+
+
+def classrooms_with_held_sessions(classrooms=None):
+    classrooms = Classroom.objects.all() if classrooms is None else classrooms
+    return classrooms.annotate(held=Count('classroom_sessions', filter=Q(classroom_sessions__is_completed=True)))
+
+
+def attendance_rate(enrollments):
+    """Overall attendance % across the enrollments, read from the rollup in one query."""
+    totals = enrollments.aggregate(
+        attended=Coalesce(Sum(attended_expression()), 0),
+        counted=Coalesce(Sum(counted_expression()), 0),
+    )
+    return percentage(totals['attended'], totals['counted'])
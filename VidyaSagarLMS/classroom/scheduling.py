@@ -0,0 +1,251 @@
+# classroom/scheduling.py
+"""
+Generate a classroom's ClassroomSession rows from its schedule.
+
+schedule_classrooms() walks each classroom's start_date..end_date on its
+``schedule_days`` (parsed like recurring calendar events), skipping days
+covered by active 'holiday' CalendarEvents, recurring ones included, and
+gives the course's Sessions one class day each in session_number order.
+
+Sessions already held (completed, or with attendance recorded) keep their
+date and their day stays taken; everything else is (re)placed. Rescheduling
+after a change to the dates or days therefore just moves pending sessions.
+
+Every classroom is planned and written in one transaction: new rows with
+bulk_create, moved rows with bulk_update and, with ``calendar=True``, the
+same for mirror CalendarEvents (type 'class', for the trainer and the
+enrolled students). bulk_* sends no signals, so the counters, agendas,
+dashboard fragments and calendar feed are refreshed here instead.
+"""
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from calendar_app.feed import bump_version
+from calendar_app.models import CalendarEvent, EventOccurrence
+from calendar_app.recurrence import occurrences_between, parse_weekdays
+from courses.models import Session
+from dashboard import fragments
+from . import agenda, counters
+from .models import Attendance, Classroom, ClassroomEnrollment, ClassroomSession
+
+BATCH_SIZE = 1000
+DEFAULT_DURATION = 60  # minutes, when end_time is not after start_time
+
+ROW_FIELDS = ('scheduled_date', 'scheduled_time', 'duration_minutes')
+EVENT_FIELDS = ('start_date', 'end_date', 'start_time', 'end_time', 'occurrences_until')
+
+
+class SchedulingError(Exception):
+    pass
+
+
+def update_rows(model, rows, fields):
+    """
+    Save ``fields`` of already-saved ``rows`` (anything with an ``id`` and
+    the fields' attnames) with bulk_update.
+    """
+    instances = [model(pk=row.id, **{field: getattr(row, field) for field in fields}) for row in rows]
+    model.objects.bulk_update(instances, fields, batch_size=BATCH_SIZE)
+
+
+def holiday_dates(start, end):
+    """Every day in [start, end] covered by an active holiday."""
+    holidays = CalendarEvent.objects.filter(event_type='holiday', is_active=True)
+    days = set()
+    for occurrence in occurrences_between(holidays, start, end, values=()):
+        day = max(occurrence.start_date, start)
+        while day <= min(occurrence.end_date, end):
+            days.add(day)
+            day += timedelta(days=1)
+    return days
+
+
+def class_days(classroom, blocked=()):
+    """The classroom's class days in order, skipping ``blocked`` dates."""
+    weekdays = parse_weekdays(classroom.schedule_days)
+    if not weekdays:
+        raise SchedulingError(f'{classroom}: no weekdays in schedule_days {classroom.schedule_days!r}.')
+    day = classroom.start_date
+    while day <= classroom.end_date:
+        if day.weekday() in weekdays and day not in blocked:
+            yield day
+        day += timedelta(days=1)
+
+
+def duration_of(classroom):
+    minutes = (
+        datetime.combine(date.min, classroom.end_time) - datetime.combine(date.min, classroom.start_time)
+    ).seconds // 60 if classroom.end_time > classroom.start_time else 0
+    return minutes or DEFAULT_DURATION
+
+
+def mirror_event(classroom, row, number, user):
+    return CalendarEvent(
+        title=f'{classroom.classroom_name}: Session {number}',
+        event_type='class',
+        start_date=row.scheduled_date,
+        end_date=row.scheduled_date,
+        start_time=classroom.start_time,
+        end_time=classroom.end_time,
+        created_by=user or classroom.created_by or classroom.trainer,
+    )
+
+
+def plan(classroom, sessions, rows, holidays, mirror=False):
+    """
+    ``sessions``: [(session_id, session_number)] in order; ``rows``: the
+    classroom's existing ClassroomSession rows as loaded by load_rows().
+    Returns (rows to create, rows to move, unmoved rows still without a
+    calendar event when ``mirror``, counts); rows are (row, session number).
+    """
+    by_session = {row.session_id: row for row in rows}
+    held = {row.session_id for row in rows if row.is_completed or row.has_attendance}
+    taken = {by_session[session_id].scheduled_date for session_id in held}
+    days = class_days(classroom, holidays | taken)
+    duration = duration_of(classroom)
+
+    to_create, to_move, unlinked = [], [], []
+    counts = {'created': 0, 'moved': 0, 'kept': len(held), 'unscheduled': 0}
+    for session_id, number in sessions:
+        if session_id in held:
+            continue
+        day = next(days, None)
+        if day is None:
+            counts['unscheduled'] += 1
+            continue
+        row = by_session.get(session_id)
+        if row is None:
+            row = ClassroomSession(
+                classroom=classroom, session_id=session_id, scheduled_date=day,
+                scheduled_time=classroom.start_time, duration_minutes=duration,
+            )
+            to_create.append((row, number))
+            counts['created'] += 1
+        elif (row.scheduled_date, row.scheduled_time, row.duration_minutes) != (day, classroom.start_time, duration):
+            row.scheduled_date, row.scheduled_time, row.duration_minutes = day, classroom.start_time, duration
+            to_move.append((row, number))
+            counts['moved'] += 1
+        elif mirror and row.calendar_event_id is None:
+            unlinked.append((row, number))
+    return to_create, to_move, unlinked, counts
+
+
+def load_rows(classrooms):
+    """
+    The classrooms' ClassroomSession rows by classroom id, as plain rows:
+    thousands of model instances (and their post_init receivers) would
+    cost more than the rest of the scheduling.
+    """
+    rows = {}
+    for row in ClassroomSession.objects.filter(classroom__in=classrooms).annotate(
+        has_attendance=Exists(Attendance.objects.filter(classroom_session=OuterRef('pk'))),
+    ).values('id', 'classroom_id', 'session_id', *ROW_FIELDS, 'is_completed', 'calendar_event_id', 'has_attendance'):
+        rows.setdefault(row['classroom_id'], []).append(SimpleNamespace(**row))
+    return rows
+
+
+def schedule_classrooms(classrooms, calendar=False, user=None):
+    """
+    (Re)schedule the sessions of ``classrooms`` (instances or a queryset) in
+    one transaction. Returns totals: created, moved, kept, unscheduled.
+    """
+    classrooms = list(classrooms)
+    totals = {'created': 0, 'moved': 0, 'kept': 0, 'unscheduled': 0}
+    if not classrooms:
+        return totals
+
+    with transaction.atomic():
+        holidays = holiday_dates(min(c.start_date for c in classrooms), max(c.end_date for c in classrooms))
+        sessions = {}
+        for course_id, session_id, number in Session.objects.filter(
+            course_id__in={classroom.course_id for classroom in classrooms},
+        ).order_by('course_id', 'session_number', 'sid').values_list('course_id', 'sid', 'session_number'):
+            sessions.setdefault(course_id, []).append((session_id, number))
+
+        rows = load_rows(classrooms)
+
+        to_create, to_move, mirrors = [], [], []
+        for classroom in classrooms:
+            created, moved, unlinked, counts = plan(
+                classroom, sessions.get(classroom.course_id, []), rows.get(classroom.pk, []), holidays, calendar,
+            )
+            to_create.extend(created)
+            to_move.extend(moved)
+            for name, count in counts.items():
+                totals[name] += count
+            if calendar:
+                mirrors.extend((classroom, row, number) for row, number in created + moved + unlinked)
+
+        if calendar:
+            update_rows(ClassroomSession, write_mirrors(mirrors, user), ['calendar_event_id'])
+        update_rows(ClassroomSession, [row for row, _ in to_move], ROW_FIELDS)
+        ClassroomSession.objects.bulk_create([row for row, _ in to_create], batch_size=BATCH_SIZE)
+
+        classroom_ids = [classroom.pk for classroom in classrooms]
+        counters.recount_classrooms(Classroom.objects.filter(pk__in=classroom_ids))
+        agenda.sync_sessions([row.id for row, _ in to_create + to_move])
+        students = {}
+        for classroom_id, student_id in ClassroomEnrollment.objects.filter(
+            classroom_id__in=classroom_ids,
+        ).values_list('classroom_id', 'student_id'):
+            students.setdefault(classroom_id, []).append(student_id)
+        fragments.touch_on_commit([
+            scope for classroom in classrooms
+            for scope in fragments.classroom_scopes(classroom.trainer_id, students.get(classroom.pk, []))
+        ])
+        if calendar:
+            transaction.on_commit(bump_version)
+    return totals
+
+
+def write_mirrors(mirrors, user):
+    """
+    Create or move the CalendarEvent mirroring each (classroom, row, session
+    number). Returns the saved rows that were given a new event.
+    """
+    new, moved = [], []
+    now = timezone.now()
+    for classroom, row, number in mirrors:
+        if row.calendar_event_id is None:
+            new.append((classroom, row, mirror_event(classroom, row, number, user)))
+        else:
+            moved.append(SimpleNamespace(
+                id=row.calendar_event_id, start_date=row.scheduled_date, end_date=row.scheduled_date,
+                start_time=classroom.start_time, end_time=classroom.end_time, occurrences_until=None,
+                # auto_now is only applied by save()
+                updated_at=now,
+            ))
+
+    # Dropped occurrence rows are rebuilt on the next save; until then the event is expanded on read
+    for index in range(0, len(moved), BATCH_SIZE):
+        EventOccurrence.objects.filter(event_id__in=[event.id for event in moved[index:index + BATCH_SIZE]]).delete()
+    update_rows(CalendarEvent, moved, [*EVENT_FIELDS, 'updated_at'])
+    if not new:
+        return []
+
+    CalendarEvent.objects.bulk_create([event for _, _, event in new], batch_size=BATCH_SIZE)
+    for _, row, event in new:
+        row.calendar_event_id = event.pk
+    students = {}
+    for classroom_id, student_id in ClassroomEnrollment.objects.filter(
+        classroom_id__in={classroom.pk for classroom, _, _ in new},
+    ).values_list('classroom_id', 'student_id'):
+        students.setdefault(classroom_id, []).append(student_id)
+    # Participants: one through row per trainer and per student of each session
+    Trainers, Students = CalendarEvent.trainers.through, CalendarEvent.students.through
+    Trainers.objects.bulk_create([
+        Trainers(calendarevent_id=event.pk, customuser_id=classroom.trainer_id) for classroom, _, event in new
+    ], batch_size=BATCH_SIZE)
+    Students.objects.bulk_create([
+        Students(calendarevent_id=event.pk, customuser_id=student_id)
+        for classroom, _, event in new for student_id in students.get(classroom.pk, [])
+    ], batch_size=BATCH_SIZE)
+    return [row for _, row, _ in new if row.id is not None]
+
+
+def schedule_classroom(classroom, calendar=False, user=None):
+    return schedule_classrooms([classroom], calendar=calendar, user=user)
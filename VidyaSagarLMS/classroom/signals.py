@@ -0,0 +1,271 @@
+# classroom/signals.py
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import connections, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from calendar_app.models import CalendarEvent
+from . import agenda, chat_journal, counters, rollups
+from .models import AgendaEntry, Attendance, Batch, ChatMessage, Classroom, ClassroomEnrollment, ClassroomSession, VirtualClassroom
+
+
+def broadcast_meeting_changed(meeting_id):
+    """Tell connected sockets to reload their cached meeting state."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    
+    def send():
+        async_to_sync(channel_layer.group_send)(
+            f'classroom_{meeting_id}',
+            {'type': 'meeting_changed'}
+        )
+    
+    # Consumers re-read the row, so only notify once it is committed
+    transaction.on_commit(send)
+
+
+@receiver(post_save, sender=VirtualClassroom)
+@receiver(post_delete, sender=VirtualClassroom)
+def virtual_classroom_changed(sender, instance, **kwargs):
+    broadcast_meeting_changed(instance.meeting_id)
+
+
+@receiver(post_save, sender=Classroom)
+def classroom_changed(sender, instance, created, **kwargs):
+    # A trainer change alters who hosts the meeting
+    if created:
+        return
+    meeting_ids = VirtualClassroom.objects.filter(classroom=instance).values_list('meeting_id', flat=True)
+    for meeting_id in meeting_ids:
+        broadcast_meeting_changed(meeting_id)
+
+
+@receiver(post_save, sender=ChatMessage)
+def chat_message_saved(sender, instance, created, **kwargs):
+    # Wake the room's long-polls (chat_journal.watch) once the row is visible
+    if created:
+        room = instance.virtual_classroom_id
+        transaction.on_commit(lambda: chat_journal.notify(room))
+
+
+# Attendance rollups (rollups.py). post_init remembers what each row looked
+# like when loaded so a save can move exactly one counter.
+
+def _classroom_of(session_id):
+    return ClassroomSession.objects.filter(pk=session_id).values_list('classroom_id', flat=True).first()
+
+
+def _attendance_mark(instance):
+    # __dict__, not attribute access: a deferred field would cost a query per row
+    values = instance.__dict__
+    if instance.pk is None or 'status' not in values or 'classroom_session_id' not in values:
+        return None
+    return (values['classroom_session_id'], values['student_id'], values['status'])
+
+
+@receiver(post_init, sender=Attendance)
+def remember_attendance(sender, instance, **kwargs):
+    instance._rollup_mark = _attendance_mark(instance)
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_saved(sender, instance, created, **kwargs):
+    old = None if created else instance._rollup_mark
+    new = (instance.classroom_session_id, instance.student_id, instance.status)
+    instance._rollup_mark = new
+    if old == new:
+        return
+    if not created and old is None:
+        # Loaded without the fields we track: rebuild the classroom instead
+        rollups.recompute_classroom(Classroom(pk=_classroom_of(new[0])))
+        return
+    if old and old[:2] != new[:2]:
+        rollups.attendance_changed(_classroom_of(old[0]), old[1], old[2], None)
+        rollups.attendance_changed(_classroom_of(new[0]), new[1], None, new[2])
+    else:
+        rollups.attendance_changed(_classroom_of(new[0]), new[1], old[2] if old else None, new[2])
+
+
+@receiver(post_delete, sender=Attendance)
+def attendance_deleted(sender, instance, **kwargs):
+    old = instance._rollup_mark
+    if old:
+        rollups.attendance_changed(_classroom_of(old[0]), old[1], old[2], None)
+
+
+@receiver(post_init, sender=ClassroomSession)
+def remember_session(sender, instance, **kwargs):
+    values = instance.__dict__
+    if instance.pk is None or 'is_completed' not in values:
+        instance._rollup_held = None
+    else:
+        instance._rollup_held = values.get('classroom_id') if values['is_completed'] else None
+
+
+@receiver(post_save, sender=ClassroomSession)
+def session_saved(sender, instance, **kwargs):
+    old = instance._rollup_held
+    new = instance.classroom_id if instance.is_completed else None
+    instance._rollup_held = new
+    if old == new:
+        return
+    if old is not None:
+        rollups.sessions_held_changed(old, -1)
+    if new is not None:
+        rollups.sessions_held_changed(new, 1)
+
+
+@receiver(post_delete, sender=ClassroomSession)
+def session_deleted(sender, instance, **kwargs):
+    if instance._rollup_held is not None:
+        rollups.sessions_held_changed(instance._rollup_held, -1)
+
+
+@receiver(post_delete, sender=ClassroomSession)
+def session_mirror_deleted(sender, instance, **kwargs):
+    # The calendar event scheduling.py made for the session goes with it
+    if instance.__dict__.get('calendar_event_id'):
+        CalendarEvent.objects.filter(pk=instance.calendar_event_id).delete()
+
+
+@receiver(pre_save, sender=ClassroomEnrollment)
+def enrollment_starts_rollup(sender, instance, **kwargs):
+    # A new enrollment starts from what its classroom has already recorded
+    if instance._state.adding:
+        rollups.seed_enrollment(instance)
+
+
+# Denormalized counters (counters.py)
+
+@receiver(post_init, sender=ClassroomEnrollment)
+@receiver(post_init, sender=ClassroomSession)
+def remember_classroom(sender, instance, **kwargs):
+    instance._counted_classroom = instance.__dict__.get('classroom_id') if instance.pk else None
+
+
+@receiver(post_save, sender=ClassroomEnrollment)
+@receiver(post_save, sender=ClassroomSession)
+def counted_row_saved(sender, instance, created, **kwargs):
+    old = None if created else instance._counted_classroom
+    new = instance.classroom_id
+    instance._counted_classroom = new
+    if old == new or (old is None and not created):
+        return
+    changed = counters.enrollment_changed if sender is ClassroomEnrollment else counters.session_changed
+    if old is not None:
+        changed(old, -1)
+    if getattr(instance, '_seat_reserved', False):
+        # enrollment.enroll_student already took the seat
+        instance._seat_reserved = False
+        counters.recount_batch_of([new])
+    else:
+        changed(new, 1)
+
+
+@receiver(post_delete, sender=ClassroomEnrollment)
+@receiver(post_delete, sender=ClassroomSession)
+def counted_row_deleted(sender, instance, **kwargs):
+    changed = counters.enrollment_changed if sender is ClassroomEnrollment else counters.session_changed
+    changed(instance.classroom_id, -1)
+
+
+@receiver(m2m_changed, sender=Classroom.students.through)
+@receiver(m2m_changed, sender=Classroom.sessions.through)
+def through_rows_added(sender, instance, action, reverse, pk_set, **kwargs):
+    # .add() bulk-creates through rows without post_save; removals go
+    # through post_delete above
+    if action != 'post_add' or not pk_set:
+        return
+    classroom_ids = list(pk_set) if reverse else [instance.pk]
+    counters.recount_classrooms(Classroom.objects.filter(pk__in=classroom_ids))
+    if sender is Classroom.students.through:
+        counters.recount_batch_of(classroom_ids)
+
+
+@receiver(post_init, sender=Classroom)
+def remember_batch(sender, instance, **kwargs):
+    instance._counted_batch = instance.__dict__.get('batch_id')
+
+
+@receiver(post_save, sender=Classroom)
+def classroom_batch_changed(sender, instance, created, **kwargs):
+    old, instance._counted_batch = instance._counted_batch, instance.batch_id
+    if not created and old is not None and old != instance.batch_id:
+        counters.recount_batches(Batch.objects.filter(pk__in=[old, instance.batch_id]))
+
+
+# Per-user agenda (agenda.py)
+
+@receiver(post_save, sender=ClassroomSession)
+def session_agenda(sender, instance, raw=False, **kwargs):
+    if not raw:
+        agenda.sync_sessions([instance.pk])
+
+
+@receiver(post_delete, sender=ClassroomSession)
+def session_agenda_deleted(sender, instance, **kwargs):
+    agenda.remove('session', [instance.pk])
+
+
+@receiver(post_save, sender=ClassroomEnrollment)
+@receiver(post_delete, sender=ClassroomEnrollment)
+def enrollment_agenda(sender, instance, raw=False, **kwargs):
+    # The whole student: a changed status or classroom adds or drops sessions
+    if not raw:
+        agenda.sync_student(instance.student_id)
+
+
+@receiver(m2m_changed, sender=Classroom.students.through)
+def students_added_agenda(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add' and pk_set:
+        for student_id in ([instance.pk] if reverse else pk_set):
+            agenda.sync_student(student_id)
+
+
+@receiver(post_init, sender=Classroom)
+def remember_agenda_title(sender, instance, **kwargs):
+    values = instance.__dict__
+    instance._agenda_key = (values.get('trainer_id'), values.get('classroom_name'))
+
+
+@receiver(post_save, sender=Classroom)
+def classroom_agenda(sender, instance, created, **kwargs):
+    # A new trainer or name changes every session entry
+    old, instance._agenda_key = instance._agenda_key, (instance.trainer_id, instance.classroom_name)
+    if not created and old != instance._agenda_key:
+        agenda.sync_classrooms([instance.pk])
+
+
+@receiver(post_save, sender=CalendarEvent)
+def event_agenda(sender, instance, raw=False, **kwargs):
+    if not raw:
+        agenda.sync_events([instance.pk])
+
+
+@receiver(post_delete, sender=CalendarEvent)
+def event_agenda_deleted(sender, instance, **kwargs):
+    agenda.remove('event', [instance.pk])
+
+
+@receiver(m2m_changed, sender=CalendarEvent.trainers.through)
+@receiver(m2m_changed, sender=CalendarEvent.students.through)
+def event_participants_agenda(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        agenda.sync_events([instance.pk], pk_set)
+    elif pk_set is not None:
+        agenda.sync_events(pk_set, {instance.pk})
+    else:
+        # A user's events cleared: rewrite the ones they had entries for
+        event_ids = instance.agenda_entries.filter(source_type='event').values_list('source_id', flat=True)
+        agenda.sync_events(set(event_ids), {instance.pk})
+
+
+def fill_agenda_after_migrate(using, **kwargs):
+    # A new (or emptied) agenda table is filled once; the signals above keep it current
+    if AgendaEntry._meta.db_table not in connections[using].introspection.table_names():
+        return
+    if not AgendaEntry.objects.using(using).exists():
+        agenda.rebuild()
@@ -1,3 +1,116 @@
-from django.test import TestCase
+import threading
+from datetime import date, time
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase
+
+from courses.models import Course
+from .enrollment import AlreadyEnrolled, ClassroomFull, bulk_enroll, enroll_student
+from .models import Batch, Classroom, ClassroomEnrollment
+
+CustomUser = get_user_model()
+
+
+class ConcurrentEnrollmentTests(TransactionTestCase):
+    """Seat reservation under concurrent enrollment (enrollment.py)."""
+
+    seats = 10
+
+    def setUp(self):
+        trainer = CustomUser.objects.create(username='trainer', role='trainer')
+        course = Course.objects.create(cid='C1', title='Course', duration_days=1, duration_months=1, fees=1)
+        batch = Batch.objects.create(batch_id='B1', batch_name='Batch', start_date=date.today(), end_date=date.today())
+        self.classroom = Classroom.objects.create(
+            classroom_id='CL1', classroom_name='Room', batch=batch, course=course, trainer=trainer,
+            start_date=date.today(), end_date=date.today(), schedule_days='Mon',
+            start_time=time(9), end_time=time(10), max_students=self.seats,
+        )
+        self.students = [CustomUser.objects.create(username=f'student{i}', role='student') for i in range(60)]
+
+    def hammer(self, jobs):
+        """Run the callables from separate threads, released together. Returns outcomes."""
+        barrier = threading.Barrier(len(jobs))
+        outcomes = []
+        lock = threading.Lock()
+
+        def run(job):
+            try:
+                barrier.wait()
+                result = job()
+            except Exception as error:  # collected and asserted on below
+                result = error
+            finally:
+                connection.close()
+            with lock:
+                outcomes.append(result)
+
+        threads = [threading.Thread(target=run, args=(job,)) for job in jobs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def assert_not_overbooked(self):
+        self.classroom.refresh_from_db()
+        enrolled = ClassroomEnrollment.objects.filter(classroom=self.classroom).count()
+        self.assertLessEqual(enrolled, self.seats)
+        self.assertEqual(self.classroom.enrolled_count, enrolled)
+        self.assertEqual(self.classroom.batch.__class__.objects.get().student_count, enrolled)
+        return enrolled
+
+    def test_single_enrollments_never_overbook(self):
+        jobs = [lambda student=student: enroll_student(self.classroom, student) for student in self.students[:40]]
+        outcomes = self.hammer(jobs)
+
+        unexpected = [o for o in outcomes if isinstance(o, Exception) and not isinstance(o, ClassroomFull)]
+        self.assertEqual(unexpected, [])
+        enrolled = self.assert_not_overbooked()
+        self.assertEqual(enrolled, self.seats)
+        self.assertEqual(sum(isinstance(o, ClassroomFull) for o in outcomes), 40 - self.seats)
+
+    def test_same_student_enrolled_once(self):
+        student = self.students[0]
+        outcomes = self.hammer([lambda: enroll_student(self.classroom, student) for _ in range(8)])
+
+        self.assertEqual(sum(isinstance(o, ClassroomEnrollment) for o in outcomes), 1)
+        self.assertTrue(all(isinstance(o, (ClassroomEnrollment, AlreadyEnrolled)) for o in outcomes))
+        self.assertEqual(self.assert_not_overbooked(), 1)
+
+    def test_bulk_and_single_enrollments_never_overbook(self):
+        groups = [self.students[i:i + 4] for i in range(0, 24, 4)]
+        jobs = [lambda group=group: bulk_enroll(self.classroom, group, partial=True) for group in groups]
+        jobs += [lambda student=student: enroll_student(self.classroom, student) for student in self.students[24:36]]
+        outcomes = self.hammer(jobs)
+
+        unexpected = [o for o in outcomes if isinstance(o, Exception) and not isinstance(o, ClassroomFull)]
+        self.assertEqual(unexpected, [])
+        self.assertEqual(self.assert_not_overbooked(), self.seats)
+
+    def test_bulk_enroll_is_all_or_nothing(self):
+        enroll_student(self.classroom, self.students[0])
+        with self.assertRaises(ClassroomFull):
+            bulk_enroll(self.classroom, self.students[:self.seats + 1])
+        self.assertEqual(self.assert_not_overbooked(), 1)
+
+        result = bulk_enroll(self.classroom, self.students[:self.seats + 1], partial=True)
+        self.assertEqual(len(result['already_enrolled']), 1)
+        self.assertEqual(len(result['enrolled']), self.seats - 1)
+        self.assertEqual(len(result['over_capacity']), 1)
+        self.assertEqual(self.assert_not_overbooked(), self.seats)
+
+    def test_editing_a_classroom_keeps_reserved_seats(self):
+        # Loaded before the first reservation, as an edit form's instance is
+        edited = Classroom.objects.get(pk=self.classroom.pk)
+        enroll_student(self.classroom, self.students[0])
+        edited.classroom_name = 'Renamed'
+        edited.status = 'ongoing'
+        edited.save()
+        edited.batch.batch_name = 'Renamed batch'
+        edited.batch.save()
+        enroll_student(self.classroom, self.students[1])
+
+        self.classroom.refresh_from_db()
+        self.assertEqual(self.classroom.classroom_name, 'Renamed')
+        self.assertEqual(self.assert_not_overbooked(), 2)
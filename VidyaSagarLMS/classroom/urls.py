@@ -22,10 +22,12 @@ urlpatterns = [
     
     # Enrollment URLs
     path('<str:classroom_id>/enroll/create/', views.EnrollmentCreateView.as_view(), name='enrollment_create'),
+    path('<str:classroom_id>/enroll/bulk/', views.BulkEnrollmentView.as_view(), name='enrollment_bulk'),
     path('enrollment/<int:pk>/update/', views.EnrollmentUpdateView.as_view(), name='enrollment_update'),
     path('enrollment/<int:pk>/delete/', views.EnrollmentDeleteView.as_view(), name='enrollment_delete'),
     
     # AJAX URLs
+    path('ajax/course-outline/', views.get_course_outline, name='ajax_course_outline'),
     path('ajax/get-modules/', views.get_modules_by_course, name='ajax_get_modules'),
     path('ajax/get-sessions-by-course/', views.get_sessions_by_course, name='ajax_get_sessions_by_course'),
     path('ajax/get-sessions-by-module/', views.get_sessions_by_module, name='ajax_get_sessions_by_module'),
@@ -49,5 +51,6 @@ urlpatterns = [
     path('virtual/<uuid:pk>/participant/update/', views.update_participant_status, name='update_participant_status'),
     path('virtual/<uuid:pk>/breakout/create/', views.create_breakout_room, name='create_breakout_room'),
     path('virtual/<uuid:pk>/chat/messages/', views.get_chat_messages, name='get_chat_messages'),
+    path('virtual/<uuid:pk>/chat/wait/', views.wait_chat_messages, name='wait_chat_messages'),
     path('virtual/<uuid:pk>/participants/', views.get_participants, name='get_participants'),
 ]
\ No newline at end of file
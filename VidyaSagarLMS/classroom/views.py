@@ -1,25 +1,36 @@
+import asyncio
+import json
+import time
+from functools import partial
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
 from django.views import View
 from django.urls import reverse_lazy, reverse
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponseForbidden
-from django.views.decorators.http import require_POST
+from django.http import HttpResponse, JsonResponse, HttpResponseForbidden, Http404
+from django.views.decorators.http import require_POST, require_http_methods, condition
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Q, Avg
+from django.db.models import Count, Q, Avg, Max
 from django.core.exceptions import PermissionDenied
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from courses import outline
 from courses.models import Course, Module, Session
+from dashboard.stats import role_counts
 from .models import (
     Batch, Classroom, ClassroomEnrollment, ClassroomSession, Attendance,
     VirtualClassroom, ClassroomParticipant, Whiteboard, ChatMessage, BreakoutRoom
 )
 from .forms import (
-    BatchForm, ClassroomForm, ClassroomEnrollmentForm,
+    BatchForm, BulkEnrollmentForm, ClassroomForm, ClassroomEnrollmentForm,
     ClassroomSessionForm, AttendanceForm, CourseModuleFilterForm,
     VirtualClassroomForm, JoinMeetingForm
 )
+from . import agenda, chat_journal, fanout, presence, whiteboard as whiteboard_log
+from .enrollment import ClassroomFull, EnrollmentError, bulk_enroll, enroll_student, free_seats, resolve_students
 
 # Mixin to check if user is manager/admin
 class ManagerRequiredMixin(UserPassesTestMixin):
@@ -44,10 +55,16 @@ class BatchListView(ManagerRequiredMixin, ListView):
     context_object_name = 'batches'
     ordering = ['-created_at']
     
+    def get_queryset(self):
+        # Students come from the maintained Batch.student_count column
+        return super().get_queryset().annotate(classroom_count=Count('classrooms'))
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['total_batches'] = Batch.objects.count()
-        context['active_batches'] = Batch.objects.filter(is_active=True).count()
+        context.update(Batch.objects.aggregate(
+            total_batches=Count('pk'),
+            active_batches=Count('pk', filter=Q(is_active=True)),
+        ))
         return context
 
 class BatchCreateView(ManagerRequiredMixin, CreateView):
@@ -72,8 +89,8 @@ class BatchDetailView(ManagerRequiredMixin, DetailView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['classrooms'] = self.object.classrooms.all()
-        context['total_students'] = self.object.total_students
+        context['classrooms'] = self.object.classrooms.select_related('course', 'trainer')
+        context['total_students'] = self.object.student_count
         return context
 
 class BatchUpdateView(ManagerRequiredMixin, UpdateView):
@@ -102,23 +119,39 @@ class ClassroomListView(LoginRequiredMixin, ListView):
     
     def get_queryset(self):
         user = self.request.user
+        # Every column the list renders comes from these joins or counter columns
+        classrooms = Classroom.objects.select_related('batch', 'course', 'trainer', 'virtual_classroom')
         
         if user.role in ['manager', 'admin', 'superadmin']:
-            return Classroom.objects.all().order_by('-created_at')
+            return classrooms.order_by('-created_at')
         elif user.role == 'trainer':
-            return Classroom.objects.filter(trainer=user).order_by('-created_at')
+            return classrooms.filter(trainer=user).order_by('-created_at')
         elif user.role == 'student':
-            return Classroom.objects.filter(students=user).order_by('-created_at')
+            return classrooms.filter(students=user).order_by('-created_at')
         
         return Classroom.objects.none()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['total_classrooms'] = Classroom.objects.count()
-        context['ongoing_classrooms'] = Classroom.objects.filter(status='ongoing').count()
-        context['upcoming_classrooms'] = Classroom.objects.filter(status='planned').count()
+        context.update(Classroom.objects.aggregate(
+            total_classrooms=Count('pk'),
+            ongoing_classrooms=Count('pk', filter=Q(status='ongoing')),
+            upcoming_classrooms=Count('pk', filter=Q(status='planned')),
+        ))
         return context
 
+def schedule_message(request, result):
+    if result is None:
+        return
+    messages.info(request, (
+        f"Schedule: {result['created']} sessions added, {result['moved']} moved, "
+        f"{result['kept']} already held kept."
+    ))
+    if result['unscheduled']:
+        messages.warning(request, (
+            f"{result['unscheduled']} sessions did not fit before the end date and were not scheduled."
+        ))
+
 class ClassroomCreateView(ManagerRequiredMixin, CreateView):
     model = Classroom
     form_class = ClassroomForm
@@ -137,7 +170,9 @@ class ClassroomCreateView(ManagerRequiredMixin, CreateView):
     
     def form_valid(self, form):
         messages.success(self.request, 'Classroom created successfully!')
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        schedule_message(self.request, form.schedule_result)
+        return response
 
 class ClassroomDetailView(LoginRequiredMixin, DetailView):
     model = Classroom
@@ -188,6 +223,11 @@ class ClassroomUpdateView(ManagerRequiredMixin, UpdateView):
         kwargs['user'] = self.request.user
         return kwargs
     
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        schedule_message(self.request, form.schedule_result)
+        return response
+    
     def get_success_url(self):
         messages.success(self.request, 'Classroom updated successfully!')
         return reverse('classroom_detail', kwargs={'pk': self.object.classroom_id})
@@ -214,22 +254,98 @@ class EnrollmentCreateView(ManagerRequiredMixin, CreateView):
         kwargs['classroom'] = classroom
         return kwargs
     
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['classroom'] = get_object_or_404(Classroom, classroom_id=self.kwargs.get('classroom_id'))
+        return context
+    
     def form_valid(self, form):
         classroom_id = self.kwargs.get('classroom_id')
         classroom = get_object_or_404(Classroom, classroom_id=classroom_id)
-        form.instance.classroom = classroom
         
-        # Update enrollment status
-        if form.instance.status == 'attending':
-            classroom.students.add(form.instance.student)
+        # Seat reservation and insert happen in one transaction
+        try:
+            self.object = enroll_student(
+                classroom, form.cleaned_data['student'],
+                status=form.cleaned_data['status'],
+                grade=form.cleaned_data['grade'],
+                comments=form.cleaned_data['comments'],
+            )
+        except EnrollmentError as error:
+            form.add_error(None, str(error))
+            return self.form_invalid(form)
         
         messages.success(self.request, 'Student enrolled successfully!')
-        return super().form_valid(form)
+        return redirect(self.get_success_url())
     
     def get_success_url(self):
         classroom_id = self.kwargs.get('classroom_id')
         return reverse('classroom_detail', kwargs={'pk': classroom_id})
 
+class BulkEnrollmentView(ManagerRequiredMixin, View):
+    """
+    Enroll many students at once, in one transaction. Accepts the form
+    (textarea and/or CSV upload) or a JSON body:
+    {"students": [id, "username", "email", ...], "status": "enrolled", "partial": false}
+    """
+    template_name = 'classroom/bulk_enrollment_form.html'
+    
+    def dispatch(self, request, *args, **kwargs):
+        self.classroom = get_object_or_404(Classroom, classroom_id=kwargs.get('classroom_id'))
+        return super().dispatch(request, *args, **kwargs)
+    
+    def get(self, request, *args, **kwargs):
+        return render(request, self.template_name, {'classroom': self.classroom, 'form': BulkEnrollmentForm()})
+    
+    def post(self, request, *args, **kwargs):
+        if request.content_type == 'application/json':
+            return self.post_json(request)
+        
+        form = BulkEnrollmentForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return render(request, self.template_name, {'classroom': self.classroom, 'form': form})
+        
+        students, unknown = resolve_students(form.cleaned_data['identifiers'])
+        try:
+            result = bulk_enroll(self.classroom, students, partial=form.cleaned_data['partial'],
+                                 status=form.cleaned_data['status'])
+        except EnrollmentError as error:
+            form.add_error(None, str(error))
+            return render(request, self.template_name, {'classroom': self.classroom, 'form': form})
+        
+        messages.success(request, f"Enrolled {len(result['enrolled'])} students.")
+        if result['already_enrolled']:
+            messages.info(request, f"{len(result['already_enrolled'])} were already enrolled.")
+        if result['over_capacity']:
+            messages.warning(request, f"{len(result['over_capacity'])} did not fit: the classroom is full.")
+        if unknown:
+            messages.warning(request, f"Not found: {', '.join(unknown[:20])}{'...' if len(unknown) > 20 else ''}")
+        return redirect('classroom_detail', pk=self.classroom.classroom_id)
+    
+    def post_json(self, request):
+        try:
+            data = json.loads(request.body)
+            identifiers = data['students']
+            status = data.get('status', 'enrolled')
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': 'Expected {"students": [...]}'}, status=400)
+        if not isinstance(identifiers, list) or status not in dict(ClassroomEnrollment.STATUS_CHOICES):
+            return JsonResponse({'error': 'Invalid students or status'}, status=400)
+        
+        students, unknown = resolve_students(identifiers)
+        try:
+            result = bulk_enroll(self.classroom, students, partial=bool(data.get('partial')), status=status)
+        except ClassroomFull as error:
+            return JsonResponse({'error': str(error), 'available': error.available}, status=409)
+        except EnrollmentError as error:
+            return JsonResponse({'error': str(error)}, status=409)
+        
+        return JsonResponse({
+            **{key: [student.username for student in users] for key, users in result.items()},
+            'not_found': unknown,
+            'available': free_seats(self.classroom),
+        })
+
 class EnrollmentUpdateView(ManagerRequiredMixin, UpdateView):
     model = ClassroomEnrollment
     form_class = ClassroomEnrollmentForm
@@ -240,6 +356,11 @@ class EnrollmentUpdateView(ManagerRequiredMixin, UpdateView):
         kwargs['classroom'] = self.object.classroom
         return kwargs
     
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['classroom'] = self.object.classroom
+        return context
+    
     def get_success_url(self):
         messages.success(self.request, 'Enrollment updated successfully!')
         return reverse('classroom_detail', kwargs={'pk': self.object.classroom.classroom_id})
@@ -263,23 +384,61 @@ class EnrollmentDeleteView(ManagerRequiredMixin, DeleteView):
         return reverse('classroom_detail', kwargs={'pk': classroom.classroom_id})
 
 # AJAX Views for dynamic filtering
-@require_POST
+# Answered from the course outline snapshots (courses/outline.py), with ETags
+def outline_param(request, name):
+    return request.POST.get(name, request.GET.get(name))
+
+def course_param_etag(request):
+    course_id = outline_param(request, 'course_id')
+    return outline.outline_etag(course_id) if course_id else None
+
+def module_param_etag(request):
+    course_id = outline.module_course(outline_param(request, 'module_id'))
+    return outline.outline_etag(course_id) if course_id else None
+
+@require_http_methods(['GET', 'HEAD'])
+@condition(etag_func=course_param_etag)
+def get_course_outline(request):
+    """
+    The course's modules with their nested sessions, in one response: the
+    snapshot JSON as stored, so it is never re-serialized.
+    """
+    course_id = request.GET.get('course_id')
+    data = outline.outline_json(course_id) if course_id else None
+    if data is None:
+        raise Http404('No such course.')
+    response = HttpResponse(data, content_type='application/json')
+    patch_cache_control(response, private=True, max_age=outline.outline_settings()['MAX_AGE'])
+    return response
+
+@require_http_methods(['GET', 'POST'])
+@condition(etag_func=course_param_etag)
 def get_modules_by_course(request):
-    course_id = request.POST.get('course_id')
-    modules = Module.objects.filter(course_id=course_id).values('mid', 'm_title')
-    return JsonResponse(list(modules), safe=False)
+    course = outline.course_outline(outline_param(request, 'course_id'))
+    modules = course['modules'] if course else []
+    return JsonResponse([{'mid': module['mid'], 'm_title': module['m_title']} for module in modules], safe=False)
 
-@require_POST
+def outline_sessions(sessions):
+    sessions = sorted(sessions, key=lambda session: (session['session_number'], session['sid']))
+    return JsonResponse(sessions, safe=False)
+
+@require_http_methods(['GET', 'POST'])
+@condition(etag_func=course_param_etag)
 def get_sessions_by_course(request):
-    course_id = request.POST.get('course_id')
-    sessions = Session.objects.filter(course_id=course_id).values('sid', 'session_number', 'topics')
-    return JsonResponse(list(sessions), safe=False)
+    course = outline.course_outline(outline_param(request, 'course_id'))
+    modules = course['modules'] if course else []
+    return outline_sessions(session for module in modules for session in module['sessions'])
 
-@require_POST
+@require_http_methods(['GET', 'POST'])
+@condition(etag_func=module_param_etag)
 def get_sessions_by_module(request):
-    module_id = request.POST.get('module_id')
-    sessions = Session.objects.filter(module_id=module_id).values('sid', 'session_number', 'topics')
-    return JsonResponse(list(sessions), safe=False)
+    module_id = outline_param(request, 'module_id')
+    course_id = outline.module_course(module_id)
+    course = outline.course_outline(course_id) if course_id else None
+    modules = course['modules'] if course else []
+    return outline_sessions(
+        session for module in modules if str(module['mid']) == str(module_id) for session in module['sessions']
+    )
 
 # Dashboard Views
 class ClassroomDashboardView(LoginRequiredMixin, TemplateView):
@@ -288,41 +447,53 @@ class ClassroomDashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
+        # Counted only when the cached {% dashboard_fragment %} misses
+        context['totals'] = partial(self.get_totals, user)
         
+        if user.role in ['trainer', 'student']:
+            # Materialized per user (agenda.py): one index range scan
+            context['upcoming_sessions'] = agenda.upcoming(user, source_type='session')
+            
+        if user.role == 'student':
+            context['recent_attendance'] = Attendance.objects.filter(
+                student=user
+            ).order_by('-classroom_session__scheduled_date')[:10]
+        
+        return context
+    
+    def get_totals(self, user):
         if user.role in ['manager', 'admin', 'superadmin']:
             # Manager dashboard
-            context['total_classrooms'] = Classroom.objects.count()
-            context['ongoing_classrooms'] = Classroom.objects.filter(status='ongoing').count()
-            context['total_batches'] = Batch.objects.count()
-            context['total_trainers'] = user.__class__.objects.filter(role='trainer').count()
-            context['total_students'] = user.__class__.objects.filter(role='student').count()
-            context['recent_classrooms'] = Classroom.objects.all().order_by('-created_at')[:5]
+            totals = Classroom.objects.aggregate(
+                total_classrooms=Count('pk'),
+                ongoing_classrooms=Count('pk', filter=Q(status='ongoing')),
+            )
+            totals['total_batches'] = Batch.objects.count()
+            counts = role_counts()
+            totals['total_trainers'] = counts['trainer']
+            totals['total_students'] = counts['student']
+            totals['recent_classrooms'] = Classroom.objects.all().order_by('-created_at')[:5]
+            return totals
             
         elif user.role == 'trainer':
             # Trainer dashboard
-            context['my_classrooms'] = Classroom.objects.filter(trainer=user).count()
-            context['ongoing_classes'] = Classroom.objects.filter(trainer=user, status='ongoing').count()
-            context['total_students'] = ClassroomEnrollment.objects.filter(
+            totals = Classroom.objects.filter(trainer=user).aggregate(
+                my_classrooms=Count('pk'),
+                ongoing_classes=Count('pk', filter=Q(status='ongoing')),
+            )
+            totals['total_students'] = ClassroomEnrollment.objects.filter(
                 classroom__trainer=user
             ).values('student').distinct().count()
-            context['upcoming_sessions'] = ClassroomSession.objects.filter(
-                classroom__trainer=user,
-                is_completed=False
-            ).order_by('scheduled_date')[:5]
+            return totals
             
         elif user.role == 'student':
             # Student dashboard
-            context['my_classrooms'] = Classroom.objects.filter(students=user).count()
-            context['active_classes'] = Classroom.objects.filter(students=user, status='ongoing').count()
-            context['upcoming_sessions'] = ClassroomSession.objects.filter(
-                classroom__students=user,
-                is_completed=False
-            ).order_by('scheduled_date')[:5]
-            context['recent_attendance'] = Attendance.objects.filter(
-                student=user
-            ).order_by('-classroom_session__scheduled_date')[:10]
+            return Classroom.objects.filter(students=user).aggregate(
+                my_classrooms=Count('pk'),
+                active_classes=Count('pk', filter=Q(status='ongoing')),
+            )
         
-        return context
+        return {}
 
 # Trainer specific views
 class TrainerClassroomListView(TrainerOrManagerRequiredMixin, ListView):
@@ -494,6 +665,7 @@ class JoinVirtualClassroomView(LoginRequiredMixin, View):
         participant.join_time = timezone.now()
         participant.is_present = True
         participant.save()
+        presence.sync_participant(participant)
         
         # Start meeting if not already live
         if virtual_classroom.status == 'scheduled':
@@ -569,6 +741,7 @@ class LiveClassroomView(LoginRequiredMixin, TemplateView):
             'virtual_classroom': self.virtual_classroom,
             'participant': self.participant,
             'whiteboard': whiteboard,
+            'whiteboard_board': whiteboard_log.board_state(whiteboard),
             'chat_messages': chat_messages_qs,
             'participants': participants,
             'breakout_rooms': breakout_rooms,
@@ -583,17 +756,18 @@ class LiveClassroomView(LoginRequiredMixin, TemplateView):
     
     def get_current_session(self):
         """Get the current classroom session if any"""
-        now = timezone.now()
-        today = now.date()
+        user = self.request.user
+        classroom = self.virtual_classroom.classroom
+        if user.role in ['trainer', 'student']:
+            # From the user's agenda (agenda.py)
+            return agenda.current_session(user, classroom)
         
-        try:
-            return self.virtual_classroom.classroom.classroom_sessions.filter(
-                scheduled_date=today,
-                scheduled_time__lte=now.time(),
-                is_completed=False
-            ).first()
-        except:
-            return None
+        now = timezone.localtime()
+        return classroom.classroom_sessions.filter(
+            scheduled_date=now.date(),
+            scheduled_time__lte=now.time(),
+            is_completed=False
+        ).first()
 
 class EndMeetingView(LoginRequiredMixin, View):
     def post(self, request, pk):
@@ -610,6 +784,11 @@ class EndMeetingView(LoginRequiredMixin, View):
             messages.error(request, "Only host can end the meeting.")
             return redirect('virtual_classroom_live', pk=pk)
         
+        # Write back pending roster changes and chat before closing everyone out
+        presence.end_meeting(virtual_classroom.meeting_id)
+        chat_journal.end_meeting(virtual_classroom.meeting_id)
+        fanout.end_meeting(virtual_classroom.meeting_id)
+        
         # Update all participants
         ClassroomParticipant.objects.filter(
             virtual_classroom=virtual_classroom,
@@ -658,9 +837,12 @@ def update_whiteboard(request, pk):
     # Update whiteboard data
     canvas_data = request.POST.get('canvas_data', '')
     if canvas_data:
-        whiteboard.canvas_data = canvas_data
-        whiteboard.last_modified_by = request.user
-        whiteboard.save()
+        # The image contains every operation up to the client's last sequence
+        try:
+            covers = int(request.POST['covers']) if request.POST.get('covers') else None
+        except ValueError:
+            return JsonResponse({'error': 'Invalid covers'}, status=400)
+        whiteboard_log.rebase_on_image(whiteboard.pk, canvas_data, request.user, covers)
     
     return JsonResponse({'status': 'success'})
 
@@ -711,6 +893,7 @@ def update_participant_status(request, pk):
     participant.is_muted = is_muted
     participant.video_enabled = video_enabled
     participant.save()
+    presence.sync_participant(participant)
     
     return JsonResponse({'status': 'success'})
 
@@ -747,16 +930,55 @@ def create_breakout_room(request, pk):
     
     return JsonResponse({'error': 'Room name required'}, status=400)
 
-@login_required
-def get_chat_messages(request, pk):
-    virtual_classroom = get_object_or_404(VirtualClassroom, meeting_id=pk)
-    
-    chat_msgs = ChatMessage.objects.filter(
+CHAT_PAGE_SIZE = 100
+CHAT_MAX_PAGE_SIZE = 200
+CHAT_LONG_POLL_TIMEOUT = 25
+# Waiters are woken by this process's writes (chat_journal.notify); the
+# recheck picks up messages written by other worker processes
+CHAT_LONG_POLL_RECHECK = 5
+
+
+def _int_param(request, name, default=None):
+    try:
+        return int(request.GET[name])
+    except (KeyError, ValueError, TypeError):
+        return default
+
+
+def _latest_chat_id(meeting_id):
+    return ChatMessage.objects.filter(
+        virtual_classroom__meeting_id=meeting_id
+    ).aggregate(last_id=Max('id'))['last_id'] or 0
+
+
+def _chat_etag(request, pk):
+    # Unchanged room + same cursor = same payload
+    return f"{_latest_chat_id(pk)}-{request.GET.urlencode()}"
+
+
+def _chat_page(virtual_classroom, after_id=None, before_id=None, limit=CHAT_PAGE_SIZE):
+    """
+    One page of a room's chat, oldest first. ``after_id`` pages forward,
+    ``before_id`` pages back; with neither the latest ``limit`` messages
+    are returned. Pages are in id order, the order the cursors follow.
+    """
+    qs = ChatMessage.objects.filter(
         virtual_classroom=virtual_classroom
-    ).order_by('timestamp')[:100]
+    ).select_related('user')
+    
+    if after_id is not None:
+        msgs = list(qs.filter(id__gt=after_id).order_by('id')[:limit + 1])
+        has_more = len(msgs) > limit
+        msgs = msgs[:limit]
+    else:
+        if before_id is not None:
+            qs = qs.filter(id__lt=before_id)
+        msgs = list(qs.order_by('-id')[:limit + 1])
+        has_more = len(msgs) > limit
+        msgs = msgs[:limit][::-1]
     
     data = []
-    for msg in chat_msgs:
+    for msg in msgs:
         data.append({
             'id': msg.id,
             'user': {
@@ -766,33 +988,96 @@ def get_chat_messages(request, pk):
             'message': msg.message,
             'timestamp': msg.timestamp.strftime('%H:%M'),
             'is_system': msg.is_system,
+            'sequence': msg.sequence,
         })
     
-    return JsonResponse({'messages': data})
+    return {
+        'messages': data,
+        'first_id': data[0]['id'] if data else before_id,
+        'last_id': data[-1]['id'] if data else after_id,
+        'has_more': has_more,
+    }
+
 
 @login_required
-def get_participants(request, pk):
+@condition(etag_func=_chat_etag)
+def get_chat_messages(request, pk):
     virtual_classroom = get_object_or_404(VirtualClassroom, meeting_id=pk)
     
-    participants = ClassroomParticipant.objects.filter(
-        virtual_classroom=virtual_classroom,
-        is_present=True
-    ).select_related('user')
+    limit = min(max(_int_param(request, 'limit', CHAT_PAGE_SIZE), 1), CHAT_MAX_PAGE_SIZE)
+    page = _chat_page(
+        virtual_classroom,
+        after_id=_int_param(request, 'after_id'),
+        before_id=_int_param(request, 'before_id'),
+        limit=limit
+    )
+    
+    return JsonResponse(page)
+
+
+@login_required
+async def wait_chat_messages(request, pk):
+    """
+    Long-poll: hold the request until the room has messages after
+    ``after_id`` or ``timeout`` seconds pass. Runs as an async view, so
+    waiting clients don't tie up a worker thread under ASGI, and queries
+    only when chat_journal wakes it (or on the cross-process recheck).
+    """
+    virtual_classroom = await VirtualClassroom.objects.filter(meeting_id=pk).afirst()
+    if virtual_classroom is None:
+        raise Http404
+    
+    after_id = _int_param(request, 'after_id', 0)
+    timeout = min(max(_int_param(request, 'timeout', CHAT_LONG_POLL_TIMEOUT), 0), CHAT_LONG_POLL_TIMEOUT)
+    limit = min(max(_int_param(request, 'limit', CHAT_PAGE_SIZE), 1), CHAT_MAX_PAGE_SIZE)
+    
+    deadline = time.monotonic() + timeout
+    with chat_journal.watch(virtual_classroom.pk) as woken:
+        while True:
+            woken.clear()
+            has_new = await ChatMessage.objects.filter(
+                virtual_classroom=virtual_classroom,
+                id__gt=after_id
+            ).aexists()
+            remaining = deadline - time.monotonic()
+            if has_new or remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(woken.wait(), min(remaining, CHAT_LONG_POLL_RECHECK))
+            except asyncio.TimeoutError:
+                pass
+    
+    page = await sync_to_async(_chat_page)(virtual_classroom, after_id=after_id, limit=limit)
+    return JsonResponse(page)
+
+@login_required
+def get_participants(request, pk):
+    # Served from the live roster while the meeting is active
+    roster = presence.get_participants(pk)
+    
+    if roster is None:
+        virtual_classroom = get_object_or_404(VirtualClassroom, meeting_id=pk)
+        
+        participants = ClassroomParticipant.objects.filter(
+            virtual_classroom=virtual_classroom,
+            is_present=True
+        ).select_related('user')
+        roster = [presence.participant_state(participant) for participant in participants]
     
     data = []
-    for participant in participants:
+    for state in roster:
         data.append({
-            'id': participant.id,
+            'id': state['id'],
             'user': {
-                'username': participant.user.username,
-                'full_name': participant.user.get_full_name() or participant.user.username,
-                'role': participant.user.role,
+                'username': state['username'],
+                'full_name': state['full_name'],
+                'role': state['user_role'],
             },
-            'participant_role': participant.role,
-            'raise_hand': participant.raise_hand,
-            'is_muted': participant.is_muted,
-            'video_enabled': participant.video_enabled,
-            'is_host': participant.role in ['host', 'co-host'],
+            'participant_role': state['role'],
+            'raise_hand': state['raise_hand'],
+            'is_muted': state['is_muted'],
+            'video_enabled': state['video_enabled'],
+            'is_host': state['role'] in ['host', 'co-host'],
         })
     
-    return JsonResponse({'participants': data})
\ No newline at end of file
+    return JsonResponse({'participants': data})
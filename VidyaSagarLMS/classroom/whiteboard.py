@@ -0,0 +1,167 @@
+# classroom/whiteboard.py
+"""
+Whiteboard operation log.
+
+The trainer's client sends one small operation per finished stroke/shape
+instead of re-uploading the whole canvas. Each operation gets the next
+sequence number for the board and is appended to WhiteboardOperation. Every
+SNAPSHOT_EVERY operations the log is folded into Whiteboard.snapshot, so a
+late joiner loads the saved canvas image + snapshot + a short tail.
+
+Folding only drops what a 'clear' wiped out, so the snapshot of a busy
+board keeps growing. Once it passes SNAPSHOT_MAX_BYTES, append_operation()
+asks for a base image: the trainer's client uploads its canvas (which
+already shows every operation it has seen) and rebase_on_image() drops the
+snapshot and the operations the image covers. Until the image arrives the
+oversized snapshot is left alone and the tail keeps growing, rather than
+being decoded and re-encoded on every compaction.
+
+Operation format (compact keys, integer coordinates):
+
+    {'t': 'pen', 'c': '#000000', 'w': 2, 'p': [x0, y0, x1, y1, ...]}
+    {'t': 'text', 'c': '#000000', 'w': 2, 'p': [x, y], 's': 'hello'}
+    {'t': 'clear'}
+
+Pen and eraser carry every point; line/rectangle/circle/arrow carry start
+and end. A 'clear' makes everything before it irrelevant, which is what
+compaction drops.
+"""
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Whiteboard, WhiteboardOperation
+
+TOOLS = {'pen', 'eraser', 'line', 'rectangle', 'circle', 'arrow', 'text', 'clear'}
+MAX_POINTS = 4000
+MAX_TEXT = 500
+
+
+def snapshot_every():
+    return getattr(settings, 'WHITEBOARD_SNAPSHOT_EVERY', 200)
+
+
+def snapshot_max_bytes():
+    return getattr(settings, 'WHITEBOARD_SNAPSHOT_MAX_BYTES', 64 * 1024)
+
+
+def encode(ops):
+    return json.dumps(ops, separators=(',', ':'))
+
+
+def normalize_operation(op):
+    """Validate a client operation and reduce it to the compact form; None if invalid."""
+    if not isinstance(op, dict) or op.get('t') not in TOOLS:
+        return None
+    if op['t'] == 'clear':
+        return {'t': 'clear'}
+
+    try:
+        points = [int(round(float(v))) for v in op.get('p', [])][:MAX_POINTS * 2]
+        width = max(1, min(int(op.get('w', 2)), 100))
+    except (TypeError, ValueError):
+        return None
+    if len(points) < 2 or len(points) % 2:
+        return None
+
+    color = str(op.get('c', '#000000'))[:7]
+    normalized = {'t': op['t'], 'c': color, 'w': width, 'p': points}
+    if op['t'] == 'text':
+        normalized['s'] = str(op.get('s', ''))[:MAX_TEXT]
+    return normalized
+
+
+def fold(ops):
+    """Drop everything a later 'clear' wiped out."""
+    for index in range(len(ops) - 1, -1, -1):
+        if ops[index]['t'] == 'clear':
+            return ops[index:]
+    return ops
+
+
+def append_operation(whiteboard_id, user_id, op):
+    """
+    Store a normalized operation. Returns (sequence number, whether the
+    board needs a base image from the trainer, see rebase_on_image()).
+    """
+    with transaction.atomic():
+        Whiteboard.objects.filter(pk=whiteboard_id).update(last_sequence=F('last_sequence') + 1)
+        sequence, snapshot_sequence = Whiteboard.objects.filter(pk=whiteboard_id).values_list(
+            'last_sequence', 'snapshot_sequence'
+        ).get()
+        WhiteboardOperation.objects.create(
+            whiteboard_id=whiteboard_id,
+            sequence=sequence,
+            user_id=user_id,
+            data=encode(op)
+        )
+        wants_image = False
+        # While an oversized snapshot waits for its image this comes round
+        # again every SNAPSHOT_EVERY operations, not on each one
+        if sequence > snapshot_sequence and (sequence - snapshot_sequence) % snapshot_every() == 0:
+            wants_image = compact(whiteboard_id) is None
+    return sequence, wants_image
+
+
+def compact(whiteboard_id):
+    """
+    Fold the operation tail into the snapshot and delete the folded rows.
+    Returns the new snapshot sequence, or None when the snapshot is over
+    SNAPSHOT_MAX_BYTES and only a base image can shrink it.
+    """
+    with transaction.atomic():
+        whiteboard = Whiteboard.objects.select_for_update().get(pk=whiteboard_id)
+        if len(whiteboard.snapshot) > snapshot_max_bytes():
+            return None
+        tail = list(whiteboard.operations.order_by('sequence').values_list('sequence', 'data'))
+        if not tail:
+            return whiteboard.snapshot_sequence
+        ops = json.loads(whiteboard.snapshot) if whiteboard.snapshot else []
+        ops.extend(json.loads(data) for _, data in tail)
+        whiteboard.snapshot = encode(fold(ops))
+        whiteboard.snapshot_sequence = tail[-1][0]
+        whiteboard.save(update_fields=['snapshot', 'snapshot_sequence'])
+        whiteboard.operations.filter(sequence__lte=whiteboard.snapshot_sequence).delete()
+    if len(whiteboard.snapshot) > snapshot_max_bytes():
+        return None
+    return whiteboard.snapshot_sequence
+
+
+def rebase_on_image(whiteboard_id, canvas_data, user, covers=None):
+    """
+    Store a full canvas image (manual save, undo, or the answer to a base
+    image request). It shows every operation up to ``covers`` (the last
+    sequence the client had drawn; all of them when not given), so the log
+    starts over from there. Later operations stay in the tail.
+    """
+    with transaction.atomic():
+        whiteboard = Whiteboard.objects.select_for_update().get(pk=whiteboard_id)
+        whiteboard.canvas_data = canvas_data
+        whiteboard.last_modified_by = user
+        fields = ['canvas_data', 'last_modified_by', 'last_modified']
+        covers = whiteboard.last_sequence if covers is None else min(covers, whiteboard.last_sequence)
+        # An image older than the snapshot still leaves it valid: replaying
+        # operations the image already shows draws the same pixels again
+        if covers >= whiteboard.snapshot_sequence:
+            whiteboard.snapshot = ''
+            whiteboard.snapshot_sequence = covers
+            fields += ['snapshot', 'snapshot_sequence']
+            whiteboard.operations.filter(sequence__lte=covers).delete()
+        # last_sequence is only ever moved by append_operation()
+        whiteboard.save(update_fields=fields)
+    return whiteboard
+
+
+def board_state(whiteboard):
+    """What a late joiner needs: base image, snapshot ops and the op tail."""
+    tail = whiteboard.operations.filter(
+        sequence__gt=whiteboard.snapshot_sequence
+    ).order_by('sequence').values_list('sequence', 'data')
+    return {
+        'snapshot': json.loads(whiteboard.snapshot) if whiteboard.snapshot else [],
+        'snapshot_sequence': whiteboard.snapshot_sequence,
+        'operations': [{'sequence': sequence, 'op': json.loads(data)} for sequence, data in tail],
+        'last_sequence': whiteboard.last_sequence,
+    }
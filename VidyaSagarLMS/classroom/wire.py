@@ -0,0 +1,58 @@
+# classroom/wire.py
+"""
+Wire encodings for classroom socket broadcasts.
+
+A group event is encoded once by the consumer that sends it and the encoded
+frames travel inside the channel-layer message, so each recipient forwards
+ready-made frames instead of running json.dumps itself.
+
+Clients that request the ``vidyasagar.msgpack`` subprotocol get binary
+MessagePack frames (when the optional msgpack package is installed);
+everyone else, including old clients that request nothing, gets compact
+JSON text. Frame compression is left to the ASGI server's
+permessage-deflate support.
+"""
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_SUBPROTOCOL = 'vidyasagar.json'
+MSGPACK_SUBPROTOCOL = 'vidyasagar.msgpack'
+
+
+def negotiate(requested):
+    """Pick ``(encoding, subprotocol to accept)`` from the client's subprotocols."""
+    requested = requested or []
+    if msgpack is not None and MSGPACK_SUBPROTOCOL in requested:
+        return 'msgpack', MSGPACK_SUBPROTOCOL
+    if JSON_SUBPROTOCOL in requested:
+        return 'json', JSON_SUBPROTOCOL
+    return 'json', None
+
+
+def encode_json(payload):
+    return json.dumps(payload, separators=(',', ':'))
+
+
+def encode_event(payload):
+    """Encode a client payload once for every supported wire format."""
+    frames = {'json': encode_json(payload)}
+    if msgpack is not None:
+        frames['msgpack'] = msgpack.packb(payload, use_bin_type=True)
+    return frames
+
+
+def decode(text_data=None, bytes_data=None):
+    """A client frame as a dict; ValueError for anything else."""
+    if bytes_data is not None:
+        if msgpack is None:
+            raise ValueError('binary frames need msgpack installed')
+        data = msgpack.unpackb(bytes_data, raw=False)
+    else:
+        data = json.loads(text_data)
+    if not isinstance(data, dict):
+        raise ValueError(f'expected an object, got {type(data).__name__}')
+    return data
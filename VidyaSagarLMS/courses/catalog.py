@@ -0,0 +1,63 @@
+"""
+Course catalog loaders.
+
+Course pages render a Course -> Module -> Session tree. These querysets
+fetch it in a fixed number of queries however large the course is: counts
+are annotated as correlated subqueries (no JOIN fan-out), and children come
+from ordered Prefetch()es, one query per level:
+
+    course_list()       courses with module_count                   1 query
+    course_tree()       + modules (session_count) + their sessions  3 queries
+    module_tree()       module with course and its sessions         2 queries
+    session_list()      sessions with module and course             1 query
+
+Templates should read the annotations (``course.module_count``,
+``module.session_count``) and iterate ``.all`` on prefetched relations.
+"""
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Course, Module, Session
+
+MODULE_ORDER = ('mid',)
+SESSION_ORDER = ('session_number', 'sid')
+
+
+def _count(queryset, group_field):
+    counted = queryset.order_by().values(group_field).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def module_count():
+    return _count(Module.objects.filter(course=OuterRef('pk')), 'course')
+
+
+def session_count(group_field):
+    return _count(Session.objects.filter(**{group_field: OuterRef('pk')}), group_field)
+
+
+def ordered_sessions():
+    return Prefetch('sessions', queryset=Session.objects.order_by(*SESSION_ORDER))
+
+
+def course_list():
+    return Course.objects.annotate(module_count=module_count())
+
+
+def course_tree():
+    """Courses with their ordered modules, each with its ordered sessions."""
+    modules = Module.objects.annotate(session_count=session_count('module')).order_by(*MODULE_ORDER)
+    return course_list().annotate(session_count=session_count('course')).prefetch_related(
+        Prefetch('modules', queryset=modules.prefetch_related(ordered_sessions())),
+    )
+
+
+def module_tree():
+    """Modules with their course and ordered sessions."""
+    return Module.objects.select_related('course').annotate(
+        session_count=session_count('module'),
+    ).prefetch_related(ordered_sessions())
+
+
+def session_list():
+    return Session.objects.select_related('module', 'course').order_by(*SESSION_ORDER)
@@ -0,0 +1,23 @@
+"""
+Republish every course outline snapshot (courses/outline.py):
+
+    python manage.py rebuild_course_outlines
+
+Signals keep the snapshots current for normal saves. This runs after every
+migrate; run it by hand after bulk imports, queryset.update() or raw SQL on
+Course/Module/Session, or after clearing the cache or snapshot directory.
+"""
+from django.core.management.base import BaseCommand
+
+from courses.catalog import Course
+from courses.outline import rebuild_all, snapshot_dir
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the cached course outline snapshots.'
+
+    def handle(self, *args, **options):
+        version = rebuild_all()
+        self.stdout.write(
+            f'Published {Course.objects.count()} course outlines as version {version} in {snapshot_dir()}.'
+        )
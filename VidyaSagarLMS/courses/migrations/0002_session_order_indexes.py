@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='session',
+            name='course',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to='courses.course'),
+        ),
+        migrations.AlterField(
+            model_name='session',
+            name='module',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to='courses.module'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['course', 'session_number'], name='session_course_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['module', 'session_number'], name='session_module_number_idx'),
+        ),
+    ]
@@ -23,13 +23,19 @@ class Module(models.Model):
 
 class Session(models.Model):
     sid = models.AutoField(primary_key=True)
-    module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name='sessions')
-    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='sessions')
+    # Indexed by the composite indexes below, which lead with these columns
+    module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name='sessions', db_index=False)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='sessions', db_index=False)
     topics = models.TextField()
     session_number = models.IntegerField()
     
     class Meta:
         ordering = ['session_number']
+        indexes = [
+            # Sessions of a course or module in order, straight from the index
+            models.Index(fields=['course', 'session_number'], name='session_course_number_idx'),
+            models.Index(fields=['module', 'session_number'], name='session_module_number_idx'),
+        ]
     
     def __str__(self):
         return f"Session {self.session_number}: {self.topics[:50]}..."
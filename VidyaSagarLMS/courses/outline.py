@@ -0,0 +1,271 @@
+"""
+Versioned course outline snapshots.
+
+The catalog (Course/Module/Session) changes a few times a term but is read
+on every course page and classroom form. Each write (signals.py) queues its
+course; when the transaction commits, the catalog version is incremented
+and the queued courses' outlines are rebuilt as compact JSON and stored
+both in the cache and on disk (COURSE_OUTLINE['SNAPSHOT_DIR']), together
+with a small index of every course and module. Reads never touch the ORM
+while a snapshot exists; a cold cache falls back to the disk copy, and a
+missing one is rebuilt on demand. Everything is republished after migrate
+and by ``manage.py rebuild_course_outlines``.
+
+Each outline records the version it was built at, which is also its ETag,
+so an unchanged course answers conditional requests with 304.
+
+Course ids arrive straight from query strings. A read answers only for ids
+the index lists, and snapshot files are named from the hex of the id, so no
+id can reach the cache, the ORM or a path outside SNAPSHOT_DIR.
+
+With several workers the cache alias must be shared for the cache copy to
+be current everywhere; the disk copy only needs a shared directory.
+"""
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import catalog
+
+DEFAULT_OUTLINE = {
+    'CACHE_ALIAS': 'default',
+    'SNAPSHOT_DIR': Path(settings.BASE_DIR) / 'var' / 'course_outlines',
+    'MAX_AGE': 0,  # seconds browsers may reuse an outline before revalidating
+}
+
+VERSION_KEY = 'courses:outline:version'
+INDEX_KEY = 'courses:outline:index'
+
+_pending = threading.local()
+
+
+def outline_settings():
+    return {**DEFAULT_OUTLINE, **getattr(settings, 'COURSE_OUTLINE', {})}
+
+
+def outline_cache():
+    return caches[outline_settings()['CACHE_ALIAS']]
+
+
+def outline_key(cid):
+    return f'courses:outline:{cid}'
+
+
+def snapshot_dir():
+    # One directory per database, so the test database never shares snapshots with the real one
+    return Path(outline_settings()['SNAPSHOT_DIR']) / Path(str(connection.settings_dict['NAME'])).stem
+
+
+def snapshot_path(name):
+    return snapshot_dir() / f'{name}.json'
+
+
+def course_file(cid):
+    # Hex keeps any id (separators, dots) a single plain file name
+    return 'course-' + str(cid).encode('utf-8').hex()
+
+
+def file_course(name):
+    try:
+        return bytes.fromhex(name.removeprefix('course-')).decode('utf-8')
+    except ValueError:
+        return None
+
+
+def write_snapshot(name, data):
+    path = snapshot_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write then rename, so readers never see half a file
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.')
+    with os.fdopen(fd, 'w', encoding='utf-8') as file:
+        file.write(data)
+    os.replace(tmp, path)
+
+
+def read_snapshot(name):
+    try:
+        return snapshot_path(name).read_text(encoding='utf-8')
+    except FileNotFoundError:
+        return None
+
+
+def remove_snapshot(name):
+    snapshot_path(name).unlink(missing_ok=True)
+
+
+def dumps(data):
+    return json.dumps(data, separators=(',', ':'), default=str)
+
+
+# Versions
+
+def catalog_version():
+    version = outline_cache().get(VERSION_KEY)
+    if version is None:
+        stored = read_snapshot('VERSION')
+        outline_cache().add(VERSION_KEY, int(stored) if stored else 1, None)
+        version = outline_cache().get(VERSION_KEY, 1)
+    return version
+
+
+def next_version():
+    catalog_version()
+    try:
+        version = outline_cache().incr(VERSION_KEY)
+    except ValueError:
+        version = catalog_version() + 1
+        outline_cache().set(VERSION_KEY, version, None)
+    write_snapshot('VERSION', str(version))
+    return version
+
+
+# Building
+
+def serialize(course, version):
+    return dumps({
+        'cid': course.cid,
+        'title': course.title,
+        'duration_days': course.duration_days,
+        'duration_months': course.duration_months,
+        'fees': course.fees,
+        'created_at': course.created_at.isoformat(),
+        'version': version,
+        'modules': [
+            {
+                'mid': module.mid,
+                'm_title': module.m_title,
+                'no_of_sessions': module.no_of_sessions,
+                'sessions': [
+                    {'sid': session.sid, 'session_number': session.session_number, 'topics': session.topics}
+                    for session in module.sessions.all()
+                ],
+            }
+            for module in course.modules.all()
+        ],
+    })
+
+
+def build_index(version):
+    """Every course and module, for choice lists and module lookups. Two small queries."""
+    return dumps({
+        'version': version,
+        'courses': list(catalog.Course.objects.order_by('cid').values_list('cid', 'title')),
+        'modules': {
+            str(mid): [cid, title]
+            for mid, cid, title in catalog.Module.objects.order_by('mid').values_list('mid', 'course_id', 'm_title')
+        },
+    })
+
+
+def store(key, name, data):
+    outline_cache().set(key, data, None)
+    write_snapshot(name, data)
+
+
+def publish(cids):
+    """Rebuild and store the outlines of ``cids`` and the index under a new version."""
+    cids = set(cids)
+    version = next_version()
+    built = set()
+    for course in catalog.course_tree().filter(cid__in=cids):
+        store(outline_key(course.cid), course_file(course.cid), serialize(course, version))
+        built.add(course.cid)
+    for cid in cids - built:
+        # Deleted courses
+        outline_cache().delete(outline_key(cid))
+        remove_snapshot(course_file(cid))
+    store(INDEX_KEY, 'index', build_index(version))
+    return version
+
+
+def rebuild_all():
+    """Republish every course, and drop snapshots of courses that no longer exist."""
+    stored = {file_course(path.stem) for path in snapshot_dir().glob('course-*.json')} - {None}
+    return publish(stored | set(catalog.Course.objects.values_list('cid', flat=True)))
+
+
+def course_changed(cid):
+    """Queue ``cid`` to be republished when the current transaction commits."""
+    pending = getattr(_pending, 'cids', None)
+    if pending is None:
+        pending = _pending.cids = set()
+    pending.add(cid)
+    # One callback per write, but the first to run publishes everything queued
+    transaction.on_commit(publish_pending)
+
+
+def publish_pending():
+    cids = getattr(_pending, 'cids', None)
+    _pending.cids = None
+    if cids:
+        publish(cids)
+
+
+# Reading
+
+def outline_json(cid):
+    """The course's outline as JSON, or None if there is no such course."""
+    if not is_course(cid):
+        return None
+    data = outline_cache().get(outline_key(cid))
+    if data is None:
+        data = read_snapshot(course_file(cid))
+        if data is None:
+            course = catalog.course_tree().filter(cid=cid).first()
+            if course is None:
+                return None
+            data = serialize(course, catalog_version())
+            write_snapshot(course_file(cid), data)
+        outline_cache().set(outline_key(cid), data, None)
+    return data
+
+
+def course_outline(cid):
+    data = outline_json(cid)
+    if data is None:
+        return None
+    outline = json.loads(data)
+    outline['created_at'] = parse_datetime(outline['created_at'])
+    return outline
+
+
+def index():
+    data = outline_cache().get(INDEX_KEY)
+    if data is None:
+        data = read_snapshot('index')
+        if data is None:
+            data = build_index(catalog_version())
+            write_snapshot('index', data)
+        outline_cache().set(INDEX_KEY, data, None)
+    return json.loads(data)
+
+
+def is_course(cid):
+    """Whether the index lists ``cid``; checked before any lookup keyed by it."""
+    return isinstance(cid, str) and any(cid == known for known, _ in index()['courses'])
+
+
+def module_course(mid):
+    entry = index()['modules'].get(str(mid))
+    return entry[0] if entry else None
+
+
+def outline_etag(cid, user=None):
+    """
+    ETag for the course's outline: the version it was built at, plus the
+    user for pages that also render who is looking.
+    """
+    data = outline_json(cid)
+    if data is None:
+        return None
+    etag = f'{cid}-{json.loads(data)["version"]}'
+    if user is not None:
+        etag += f'-{user.pk or 0}-{getattr(user, "role", "")}'
+    return etag
@@ -0,0 +1,36 @@
+# courses/signals.py
+from django.db import connections
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import outline
+from .models import Course, Module, Session
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_changed(sender, instance, **kwargs):
+    outline.course_changed(instance.cid)
+
+
+@receiver(post_init, sender=Module)
+@receiver(post_init, sender=Session)
+def remember_course(sender, instance, **kwargs):
+    instance._outline_course_id = instance.__dict__.get('course_id')
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+@receiver(post_save, sender=Session)
+@receiver(post_delete, sender=Session)
+def outline_item_changed(sender, instance, **kwargs):
+    outline.course_changed(instance.course_id)
+    # Moved to another course: the old outline loses it
+    if instance._outline_course_id and instance._outline_course_id != instance.course_id:
+        outline.course_changed(instance._outline_course_id)
+    instance._outline_course_id = instance.course_id
+
+
+def republish_after_migrate(using, **kwargs):
+    if 'courses_course' in connections[using].introspection.table_names():
+        outline.rebuild_all()
@@ -5,7 +5,11 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth import authenticate
 from django.views.generic.edit import FormView
 from django.contrib import messages
+from django.http import Http404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from .models import Course, Module, Session
+from . import catalog, outline
 from .forms import ModuleForm, SessionForm
 
 # Course Views (already created)
@@ -30,15 +34,31 @@ class CourseListView(ListView):
     template_name = 'courses/course_list.html'
     context_object_name = 'courses'
     ordering = ['-created_at']
+    
+    def get_queryset(self):
+        # Module counts are annotated (catalog.py): one query for the page
+        return catalog.course_list().order_by(*self.get_ordering())
 
+def course_outline_etag(request, pk):
+    # The page also shows the signed-in user and their role menu
+    return outline.outline_etag(pk, request.user)
+
+@method_decorator(condition(etag_func=course_outline_etag), name='get')
 class CourseDetailView(DetailView):
     model = Course
     template_name = 'courses/course_detail.html'
     context_object_name = 'course'
     
+    def get_object(self, queryset=None):
+        # Served from the versioned outline snapshot (outline.py), not the ORM
+        course = outline.course_outline(self.kwargs['pk'])
+        if course is None:
+            raise Http404('No course found matching the query')
+        return course
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['modules'] = self.object.modules.all().order_by('mid')
+        context['modules'] = self.object['modules']
         return context
 
 class CourseCreateView(LoginRequiredMixin, CoursePermissionMixin, CreateView):
@@ -117,9 +137,10 @@ class ModuleListView(ListView):
     
     def get_queryset(self):
         course_id = self.kwargs.get('cid')
+        modules = Module.objects.select_related('course').order_by('mid')
         if course_id:
-            return Module.objects.filter(course__cid=course_id).order_by('mid')
-        return Module.objects.all().order_by('mid')
+            return modules.filter(course__cid=course_id)
+        return modules
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -133,9 +154,13 @@ class ModuleDetailView(DetailView):
     template_name = 'courses/module_detail.html'
     context_object_name = 'module'
     
+    def get_queryset(self):
+        # Module, course and sessions in two queries (catalog.py)
+        return catalog.module_tree()
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['sessions'] = self.object.sessions.all().order_by('session_number')
+        context['sessions'] = self.object.sessions.all()
         return context
 
 class ModuleCreateView(LoginRequiredMixin, CreateView):
@@ -246,12 +271,13 @@ class SessionListView(ListView):
         course_id = self.kwargs.get('cid')
         module_id = self.kwargs.get('mid')
         
+        sessions = catalog.session_list()
         if module_id:
-            return Session.objects.filter(module__mid=module_id).order_by('session_number')
+            return sessions.filter(module__mid=module_id)
         elif course_id:
-            return Session.objects.filter(course__cid=course_id).order_by('session_number')
+            return sessions.filter(course__cid=course_id)
         
-        return Session.objects.all().order_by('session_number')
+        return sessions
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -260,9 +286,11 @@ class SessionListView(ListView):
         
         if module_id:
             context['module'] = get_object_or_404(Module, mid=module_id)
-            context['course'] = context['module'].course
+            context['course'] = context['module'].course = get_object_or_404(
+                catalog.course_list(), cid=context['module'].course_id,
+            )
         elif course_id:
-            context['course'] = get_object_or_404(Course, cid=course_id)
+            context['course'] = get_object_or_404(catalog.course_list(), cid=course_id)
         
         return context
 
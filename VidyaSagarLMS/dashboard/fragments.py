@@ -0,0 +1,141 @@
+"""
+Per-role dashboard fragment cache.
+
+Templates wrap their expensive blocks in ``{% dashboard_fragment name [vary ...] %}``
+(templatetags/dashboard_cache.py). A fragment is cached per role, and per user
+for trainers and students, under the current versions of the scopes it
+depends on:
+
+    global          every fragment (touched by maintenance commands)
+    staff           superadmin/admin/manager dashboards
+    users           user totals shown on trainer dashboards
+    trainer:<id>    one trainer's dashboards
+    student:<id>    one student's dashboards
+
+Model signals (signals.py) touch only the scopes a change can affect, which
+gives the affected fragments new keys; everyone else keeps their cached
+copy. Replaced entries simply expire after DASHBOARD['TIMEOUT'].
+
+Everything lives in DASHBOARD['CACHE_ALIAS']: locmem is fine for a single
+process, but with several workers point it at a cache they share
+(FileBasedCache or DatabaseCache) so a touch reaches all of them. Hit and
+miss counts per role and fragment are kept in the same cache; see
+fragment_stats() and ``manage.py dashboard_cache_stats``.
+"""
+import hashlib
+from uuid import uuid4
+
+from django.db import transaction
+
+from .stats import ROLES, dashboard_cache, dashboard_settings
+
+# Names accepted by {% dashboard_fragment %}
+FRAGMENTS = ('tiles', 'users', 'trainers', 'students', 'classrooms')
+
+# Stands in for the request's CSRF token inside cached HTML
+CSRF_PLACEHOLDER = 'dashboard-fragment-csrf-token'
+
+
+def user_scopes(user):
+    if user.role == 'trainer':
+        return ['global', 'users', f'trainer:{user.pk}']
+    if user.role == 'student':
+        return ['global', f'student:{user.pk}']
+    return ['global', 'staff']
+
+
+def owner(user):
+    if user.role in ('trainer', 'student'):
+        return f'{user.role}:{user.pk}'
+    return user.role
+
+
+def scope_versions(scopes):
+    cache = dashboard_cache()
+    keys = [f'dashboard:version:{scope}' for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # A fresh token, never 0: an evicted version must not bring back
+            # fragments cached under an older one
+            cache.add(key, uuid4().hex[:12], None)
+            versions[key] = cache.get(key)
+    return [str(versions[key]) for key in keys]
+
+
+def touch(scopes):
+    """Invalidate every fragment that depends on one of ``scopes``."""
+    scopes = set(scopes)
+    if scopes:
+        dashboard_cache().set_many({f'dashboard:version:{scope}': uuid4().hex[:12] for scope in scopes}, None)
+
+
+def touch_on_commit(scopes):
+    # After commit, so a render racing the write cannot re-cache old data under the new version
+    transaction.on_commit(lambda: touch(scopes))
+
+
+def invalidate_all():
+    touch(['global'])
+
+
+def classroom_scopes(trainer_id=None, student_ids=()):
+    scopes = ['staff']
+    if trainer_id:
+        scopes.append(f'trainer:{trainer_id}')
+    scopes.extend(f'student:{student_id}' for student_id in student_ids)
+    return scopes
+
+
+def fragment_key(name, user, vary_on=()):
+    vary = hashlib.md5(':'.join(str(value) for value in vary_on).encode()).hexdigest()
+    versions = '.'.join(scope_versions(user_scopes(user)))
+    return f'dashboard:fragment:{owner(user)}:{name}:{vary}:{versions}'
+
+
+def stats_key(role, name, outcome):
+    return f'dashboard:stats:{role}:{name}:{outcome}'
+
+
+def record(role, name, outcome):
+    cache = dashboard_cache()
+    key = stats_key(role, name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def cached_fragment(name, user, vary_on, render):
+    """The fragment's HTML from the cache, or ``render()`` stored for next time."""
+    cache = dashboard_cache()
+    key = fragment_key(name, user, vary_on)
+    html = cache.get(key)
+    if html is None:
+        record(user.role, name, 'misses')
+        html = render()
+        cache.set(key, html, dashboard_settings()['TIMEOUT'])
+    else:
+        record(user.role, name, 'hits')
+    return html
+
+
+def fragment_stats():
+    """``{role: {fragment: {'hits': n, 'misses': n}}}`` for fragments seen so far."""
+    keys = {
+        stats_key(role, name, outcome): (role, name, outcome)
+        for role in ROLES for name in FRAGMENTS for outcome in ('hits', 'misses')
+    }
+    stats = {}
+    for key, count in dashboard_cache().get_many(list(keys)).items():
+        role, name, outcome = keys[key]
+        stats.setdefault(role, {}).setdefault(name, {'hits': 0, 'misses': 0})[outcome] = count
+    return stats
+
+
+def reset_stats():
+    dashboard_cache().delete_many([
+        stats_key(role, name, outcome)
+        for role in ROLES for name in FRAGMENTS for outcome in ('hits', 'misses')
+    ])
@@ -0,0 +1,44 @@
+"""
+Hit/miss counts for the cached dashboard fragments (dashboard/fragments.py):
+
+    python manage.py dashboard_cache_stats
+    python manage.py dashboard_cache_stats --json
+    python manage.py dashboard_cache_stats --reset
+
+The counts live in DASHBOARD['CACHE_ALIAS'], so with a per-process locmem
+cache this only sees its own process; use a shared alias to monitor workers.
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from dashboard.fragments import fragment_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Show (or reset) dashboard fragment cache hit/miss counts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='print the counts as JSON')
+        parser.add_argument('--reset', action='store_true', help='zero the counts')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            reset_stats()
+            self.stdout.write('Dashboard cache counts reset.')
+            return
+
+        stats = fragment_stats()
+        if options['json']:
+            self.stdout.write(json.dumps(stats, indent=2, sort_keys=True))
+            return
+
+        if not stats:
+            self.stdout.write('No dashboard fragments served yet.')
+            return
+        self.stdout.write(f'{"role":<12}{"fragment":<12}{"hits":>8}{"misses":>8}{"hit rate":>10}')
+        for role, fragments in sorted(stats.items()):
+            for name, counts in sorted(fragments.items()):
+                total = counts['hits'] + counts['misses']
+                rate = counts['hits'] / total * 100 if total else 0
+                self.stdout.write(f'{role:<12}{name:<12}{counts["hits"]:>8}{counts["misses"]:>8}{rate:>9.1f}%')
@@ -0,0 +1,111 @@
+# dashboard/signals.py
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from accounts.models import StudentProfile, TrainerProfile
+from classroom.models import Attendance, Batch, Classroom, ClassroomEnrollment, ClassroomSession
+from . import fragments, stats
+
+CustomUser = get_user_model()
+
+# Columns the dashboard user tables show
+TABLE_FIELDS = ('username', 'email', 'role', 'phone', 'is_active', 'course_access')
+
+
+def table_values(instance):
+    return tuple(instance.__dict__.get(field) for field in TABLE_FIELDS)
+
+
+@receiver(post_init, sender=CustomUser)
+def remember_role(sender, instance, **kwargs):
+    instance._counted_role = instance.__dict__.get('role') if instance.pk else None
+    instance._table_values = table_values(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, created, **kwargs):
+    # Logins save last_login on every request; only role changes matter
+    if created or instance._counted_role != instance.role:
+        stats.invalidate_role_counts()
+        fragments.touch_on_commit(['users', 'staff'])
+    elif instance._table_values != table_values(instance):
+        fragments.touch_on_commit(['staff'])
+    instance._counted_role = instance.role
+    instance._table_values = table_values(instance)
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    stats.invalidate_role_counts()
+    fragments.touch_on_commit(['users', 'staff'])
+
+
+@receiver(post_save, sender=TrainerProfile)
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_delete, sender=TrainerProfile)
+@receiver(post_delete, sender=StudentProfile)
+def profile_changed(sender, instance, **kwargs):
+    # The manager dashboard lists profile columns
+    fragments.touch_on_commit(['staff'])
+
+
+def classroom_students(classroom_id):
+    return ClassroomEnrollment.objects.filter(classroom_id=classroom_id).values_list('student_id', flat=True)
+
+
+def classroom_trainer(classroom_id):
+    return Classroom.objects.filter(pk=classroom_id).values_list('trainer_id', flat=True).first()
+
+
+@receiver(post_save, sender=Batch)
+@receiver(post_delete, sender=Batch)
+def batch_changed(sender, instance, created=False, **kwargs):
+    # Only the staff classroom dashboard counts batches
+    if created or kwargs['signal'] is post_delete:
+        fragments.touch_on_commit(['staff'])
+
+
+@receiver(post_init, sender=Classroom)
+def remember_trainer(sender, instance, **kwargs):
+    instance._dashboard_trainer_id = instance.__dict__.get('trainer_id')
+
+
+@receiver(post_save, sender=Classroom)
+def classroom_saved(sender, instance, created, **kwargs):
+    scopes = fragments.classroom_scopes(instance.trainer_id, [] if created else classroom_students(instance.pk))
+    if instance._dashboard_trainer_id and instance._dashboard_trainer_id != instance.trainer_id:
+        scopes.append(f'trainer:{instance._dashboard_trainer_id}')
+    fragments.touch_on_commit(scopes)
+    instance._dashboard_trainer_id = instance.trainer_id
+
+
+@receiver(post_delete, sender=Classroom)
+def classroom_deleted(sender, instance, **kwargs):
+    # Its enrollments are deleted first and touch their students
+    fragments.touch_on_commit(fragments.classroom_scopes(instance.trainer_id))
+
+
+@receiver(post_save, sender=ClassroomEnrollment)
+@receiver(post_delete, sender=ClassroomEnrollment)
+def enrollment_changed(sender, instance, **kwargs):
+    fragments.touch_on_commit(fragments.classroom_scopes(
+        classroom_trainer(instance.classroom_id), [instance.student_id],
+    ))
+
+
+@receiver(post_save, sender=ClassroomSession)
+@receiver(post_delete, sender=ClassroomSession)
+def session_changed(sender, instance, **kwargs):
+    fragments.touch_on_commit(fragments.classroom_scopes(
+        classroom_trainer(instance.classroom_id), classroom_students(instance.classroom_id),
+    ))
+
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+def attendance_changed(sender, instance, **kwargs):
+    trainer_id = ClassroomSession.objects.filter(
+        pk=instance.classroom_session_id,
+    ).values_list('classroom__trainer_id', flat=True).first()
+    fragments.touch_on_commit(fragments.classroom_scopes(trainer_id, [instance.student_id]))
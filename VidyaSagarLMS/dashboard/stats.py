@@ -0,0 +1,89 @@
+"""
+Dashboard numbers and user tables.
+
+Role counts come from one grouped query and are cached until a user is
+created, deleted or changes role (signals.py). User tables are searched and
+paginated in the database; without a search the page count reuses the cached
+role counts, so a page of a 100k-user table is a single LIMIT query.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.paginator import Paginator
+from django.db.models import Count, Q
+
+CustomUser = get_user_model()
+
+DEFAULT_DASHBOARD = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,  # seconds
+    'PAGE_SIZE': 25,
+}
+
+ROLE_COUNTS_KEY = 'dashboard:role_counts'
+ROLES = [role for role, _ in CustomUser.ROLE_CHOICES]
+SEARCH_FIELDS = ['username', 'email', 'first_name', 'last_name']
+
+
+def dashboard_settings():
+    return {**DEFAULT_DASHBOARD, **getattr(settings, 'DASHBOARD', {})}
+
+
+def dashboard_cache():
+    return caches[dashboard_settings()['CACHE_ALIAS']]
+
+
+def role_counts():
+    """{role: count, ..., 'total': count} from one GROUP BY query, cached."""
+    cache = dashboard_cache()
+    counts = cache.get(ROLE_COUNTS_KEY)
+    if counts is None:
+        counts = dict.fromkeys(ROLES, 0)
+        counts.update(CustomUser.objects.values_list('role').annotate(n=Count('pk')).order_by())
+        counts['total'] = sum(counts[role] for role in ROLES)
+        cache.set(ROLE_COUNTS_KEY, counts, dashboard_settings()['TIMEOUT'])
+    return counts
+
+
+def invalidate_role_counts():
+    dashboard_cache().delete(ROLE_COUNTS_KEY)
+
+
+class CountedPaginator(Paginator):
+    """Paginator that trusts a count it is given instead of running COUNT(*)."""
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            # Paginator.count is a cached_property; prime its cache
+            self.__dict__['count'] = count
+
+
+def user_page(request, users, roles, prefix=''):
+    """
+    One page of ``users`` (restricted to ``roles``), filtered by the ``q`` and
+    ``role`` query parameters. ``prefix`` namespaces the parameters when a
+    dashboard shows several tables.
+    """
+    query = request.GET.get(f'{prefix}q', '').strip()
+    role = request.GET.get(f'{prefix}role', '')
+    if role in roles:
+        roles = [role]
+        users = users.filter(role=role)
+
+    count = None
+    if query:
+        search = Q()
+        for field in SEARCH_FIELDS:
+            search |= Q(**{f'{field}__icontains': query})
+        users = users.filter(search)
+    else:
+        counts = role_counts()
+        count = sum(counts[r] for r in roles)
+
+    paginator = CountedPaginator(users.order_by('-date_joined', '-pk'), dashboard_settings()['PAGE_SIZE'], count=count)
+    return {
+        'page': paginator.get_page(request.GET.get(f'{prefix}page')),
+        'query': query,
+        'role': role,
+    }
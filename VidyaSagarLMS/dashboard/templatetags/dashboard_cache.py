@@ -0,0 +1,47 @@
+from django import template
+
+from dashboard.fragments import CSRF_PLACEHOLDER, FRAGMENTS, cached_fragment
+
+register = template.Library()
+
+
+class DashboardFragmentNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        request = context.get('request')
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return self.nodelist.render(context)
+
+        def render():
+            # Cache a placeholder, never this user's CSRF token
+            with context.push(csrf_token=CSRF_PLACEHOLDER):
+                return self.nodelist.render(context)
+
+        vary_on = [value.resolve(context) for value in self.vary_on]
+        html = cached_fragment(self.name, user, vary_on, render)
+        if CSRF_PLACEHOLDER in html:
+            html = html.replace(CSRF_PLACEHOLDER, str(context.get('csrf_token', '')))
+        return html
+
+
+@register.tag('dashboard_fragment')
+def do_dashboard_fragment(parser, token):
+    """
+    Cache the enclosed block per role (and per user for trainers and
+    students) until a change it depends on (dashboard/fragments.py):
+
+        {% dashboard_fragment users request.GET.urlencode %} ... {% enddashboard_fragment %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2 or bits[1] not in FRAGMENTS:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' needs a fragment name, one of: {', '.join(FRAGMENTS)}."
+        )
+    nodelist = parser.parse(('enddashboard_fragment',))
+    parser.delete_first_token()
+    return DashboardFragmentNode(nodelist, bits[1], [parser.compile_filter(bit) for bit in bits[2:]])
@@ -4,4 +4,5 @@ from . import views
 urlpatterns = [
     path('', views.dashboard_view, name='dashboard'),
     path('grant-access/<int:user_id>/', views.grant_user_course_access, name='dashboard_grant_access'),
+    path('cache-stats/', views.dashboard_cache_stats, name='dashboard_cache_stats'),
 ]
\ No newline at end of file
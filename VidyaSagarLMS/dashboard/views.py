@@ -1,67 +1,89 @@
+from functools import partial
+
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from accounts.models import CustomUser, StudentProfile, TrainerProfile
 from django.contrib import messages
 from django.shortcuts import get_object_or_404
+from classroom import agenda
+from classroom.models import ClassroomEnrollment
+from classroom.rollups import attendance_rate
+from . import fragments, stats
 
 @login_required
 def dashboard_view(request):
     user = request.user
+    # Expensive values are passed as callables: templates only call them when
+    # a {% dashboard_fragment %} misses (fragments.py)
+    # All role counts in one cached GROUP BY query (stats.py)
+    counts = stats.role_counts()
     
     if user.role == 'superadmin':
         # Super Admin can see all users
-        users = CustomUser.objects.all()
+        users = stats.user_page(request, CustomUser.objects.all(), stats.ROLES)
         return render(request, 'dashboard/superadmin_dashboard.html', {
             'user': user,
-            'users': users,
-            'total_users': users.count(),
-            'student_count': CustomUser.objects.filter(role='student').count(),
-            'trainer_count': CustomUser.objects.filter(role='trainer').count(),
-            'manager_count': CustomUser.objects.filter(role='manager').count(),
-            'admin_count': CustomUser.objects.filter(role='admin').count(),
-            'superadmin_count': CustomUser.objects.filter(role='superadmin').count(),
+            'users': users['page'],
+            'search': users,
+            'role_choices': CustomUser.ROLE_CHOICES,
+            'total_users': counts['total'],
+            'student_count': counts['student'],
+            'trainer_count': counts['trainer'],
+            'manager_count': counts['manager'],
+            'admin_count': counts['admin'],
+            'superadmin_count': counts['superadmin'],
         })
     
     elif user.role == 'admin':
         # Admin can see all users except superadmins
-        users = CustomUser.objects.exclude(role='superadmin')
+        roles = [role for role in stats.ROLES if role != 'superadmin']
+        users = stats.user_page(request, CustomUser.objects.exclude(role='superadmin'), roles)
         return render(request, 'dashboard/admin_dashboard.html', {
             'user': user,
-            'users': users,
-            'total_users': users.count(),
-            'student_count': CustomUser.objects.filter(role='student').count(),
-            'trainer_count': CustomUser.objects.filter(role='trainer').count(),
-            'manager_count': CustomUser.objects.filter(role='manager').count(),
-            'admin_count': CustomUser.objects.filter(role='admin').count(),
+            'users': users['page'],
+            'search': users,
+            'role_choices': [choice for choice in CustomUser.ROLE_CHOICES if choice[0] != 'superadmin'],
+            'total_users': counts['total'] - counts['superadmin'],
+            'student_count': counts['student'],
+            'trainer_count': counts['trainer'],
+            'manager_count': counts['manager'],
+            'admin_count': counts['admin'],
         })
     
     elif user.role == 'manager':
         # Managers can see trainers and students
-        trainers = CustomUser.objects.filter(role='trainer')
-        students = CustomUser.objects.filter(role='student')
+        trainers = stats.user_page(
+            request, CustomUser.objects.filter(role='trainer').select_related('trainerprofile'), ['trainer'],
+            prefix='trainer_',
+        )
+        students = CustomUser.objects.filter(role='student').select_related('studentprofile')
         
         return render(request, 'dashboard/manager_dashboard.html', {
             'user': user,
-            'trainers': trainers,
-            'students': students,
-            'trainer_count': trainers.count(),
-            'student_count': students.count(),
+            'trainers': trainers['page'],
+            'trainer_search': trainers,
+            'students': students.order_by('-date_joined')[:5],
+            'trainer_count': counts['trainer'],
+            'student_count': counts['student'],
+            'attendance_rate': partial(attendance_rate, ClassroomEnrollment.objects.all()),
         })
     
     elif user.role == 'trainer':
-        # Trainers can see their students
-        students = CustomUser.objects.filter(role='student')
-        
         return render(request, 'dashboard/trainer_dashboard.html', {
             'user': user,
-            'students': students,
-            'student_count': students.count(),
+            'student_count': counts['student'],
+            'attendance_rate': partial(attendance_rate, ClassroomEnrollment.objects.filter(classroom__trainer=user)),
+            # Materialized per user (classroom/agenda.py): one index range scan
+            'agenda': agenda.upcoming(user),
         })
     
     elif user.role == 'student':
         # Students see their own dashboard
         return render(request, 'dashboard/student_dashboard.html', {
-            'user': user
+            'user': user,
+            'attendance_rate': partial(attendance_rate, ClassroomEnrollment.objects.filter(student=user)),
+            'agenda': agenda.upcoming(user),
         })
     
     else:
@@ -89,4 +111,11 @@ def grant_user_course_access(request, user_id):
         messages.success(request, f'Course access granted for {target.username}.')
 
     target.save()
-    return redirect('dashboard')
\ No newline at end of file
+    return redirect('dashboard')
+
+@login_required
+def dashboard_cache_stats(request):
+    """Fragment cache hit/miss counts, for monitoring."""
+    if getattr(request.user, 'role', None) not in ('superadmin', 'admin'):
+        return JsonResponse({'error': 'Permission denied.'}, status=403)
+    return JsonResponse({'fragments': fragments.fragment_stats()})